@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Duplicate analysis for every product library in config/libraries.config.json.
+
+Each enabled library with Polar sync enabled is analyzed on its own process
+(the same analysis as analyze-product-duplicates.py), all libraries at once.
+The results are then indexed by name slug (the website ID
+generate-polar-mapping.js derives from a product name) to find products that
+exist in more than one library, and written as one merged report.
+
+Catalog sources, per library (the library id or products.namespace from the
+config picks the file or environment variables):
+    --products-dir DIR      DIR/<id>.snap, DIR/<id>.ndjson or DIR/<id>.json
+    --products ID=PATH      an explicit dump or snapshot for one library
+    --fetch                 the Polar API, with POLAR_API_TOKEN_<NAMESPACE> and
+                            POLAR_ORG_ID_<NAMESPACE> (both required for every
+                            library; the global POLAR_API_TOKEN / POLAR_ORG_ID
+                            are not used, so one organization's catalog is
+                            never analyzed as another library's)
+
+Usage:
+    python3 scripts/analyze-libraries.py --products-dir exports/
+    python3 scripts/analyze-libraries.py --fetch --output-format ndjson -o libraries.ndjson
+    python3 scripts/analyze-libraries.py --products-dir exports/ --library no3d-tools --library no3d-prints
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+from library_catalog import DEFAULT_CONFIG, load_libraries
+from phase_profiler import add_profile_arguments, finish_profiling, phase, start_profiling
+from polar_catalog import iter_catalog_items, product_slug
+from polar_snapshot import CatalogSnapshot, is_snapshot
+from recommendation_writers import COLUMNS, LIBRARY_COLUMNS, open_writer
+from script_loader import load_script
+
+analyzer = load_script('analyze-product-duplicates.py')
+
+# Dump file extensions tried by --products-dir, in order
+SOURCE_EXTENSIONS = ('.snap', '.ndjson', '.json')
+# Product ids listed per library for a cross-library duplicate in the text report
+MAX_LISTED_IDS = 5
+
+
+def select_libraries(libraries, only=None):
+    """Libraries to analyze: the ones named in only, or every library with
+    enabled and polar.enabled set"""
+    if only:
+        known = {library['id']: library for library in libraries}
+        unknown = [library_id for library_id in only if library_id not in known]
+        if unknown:
+            raise ValueError(f"Unknown library: {', '.join(unknown)}")
+        return [known[library_id] for library_id in dict.fromkeys(only)]
+    return [
+        library for library in libraries
+        if library.get('enabled') and (library.get('polar') or {}).get('enabled')
+    ]
+
+
+def env_suffix(library):
+    """NAMESPACE part of the per-library POLAR_*_<NAMESPACE> variables"""
+    namespace = (library.get('products') or {}).get('namespace') or library['id']
+    return namespace.upper().replace('-', '_')
+
+
+def library_source(library, args):
+    """Where to read a library's catalog: ('file', path), ('fetch', env) or None
+
+    Raises ValueError when --fetch is given and the library's own
+    POLAR_API_TOKEN_<NAMESPACE> or POLAR_ORG_ID_<NAMESPACE> is not set.
+    """
+    library_id = library['id']
+    if library_id in args.products:
+        return ('file', args.products[library_id])
+    if args.fetch:
+        suffix = env_suffix(library)
+        names = (f'POLAR_API_TOKEN_{suffix}', f'POLAR_ORG_ID_{suffix}')
+        missing = [name for name in names if not os.environ.get(name)]
+        if missing:
+            raise ValueError(f"{library_id}: missing environment variables: {', '.join(missing)}")
+        token, organization_id = (os.environ[name] for name in names)
+        return ('fetch', {'token': token, 'organization_id': organization_id})
+    if args.products_dir:
+        for extension in SOURCE_EXTENSIONS:
+            path = Path(args.products_dir) / f'{library_id}{extension}'
+            if path.exists():
+                return ('file', str(path))
+    return None
+
+
+def check_fetch_sources(sources):
+    """Raise ValueError if two libraries would fetch with the same token or organization"""
+    seen = {}
+    for library_id, (kind, location) in sources.items():
+        if kind != 'fetch':
+            continue
+        for key, label in (('token', 'API token'), ('organization_id', 'organization')):
+            other = seen.setdefault((key, location[key]), library_id)
+            if other != library_id:
+                raise ValueError(f"{other} and {library_id} use the same Polar {label}")
+
+
+def analyze_library(library_id, source, options):
+    """Analyze one library's catalog (runs in a worker process)
+
+    Returns the library's recommendations, its product count and the time it
+    took. The analyzer's progress output is discarded.
+    """
+    start = time.perf_counter()
+    kind, location = source
+    cache = None
+    if options['cache_dir']:
+        cache = analyzer.ScoreCache(str(Path(options['cache_dir']) / f'{library_id}.sqlite'))
+    similarity = options['similarity']
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if kind == 'fetch':
+            from polar_fetch import POLAR_API_URL, iter_polar_products
+
+            items = iter_polar_products(location['token'], location['organization_id'],
+                                        api_url=options['api_url'] or POLAR_API_URL,
+                                        concurrency=options['concurrency'])
+            recommendations = analyzer.analyze_product_stream(items, similarity, cache)
+        elif is_snapshot(location):
+            with CatalogSnapshot(location) as snapshot:
+                recommendations = analyzer.analyze_products(snapshot, similarity, cache)
+        else:
+            recommendations = analyzer.analyze_product_stream(iter_catalog_items(location), similarity, cache)
+    if cache is not None:
+        cache.close()
+
+    count = (len(recommendations['keep']) + len(recommendations['archive'])
+             + sum(1 + len(item['archive']) for item in recommendations['consolidate']))
+    return recommendations, count, time.perf_counter() - start
+
+
+def analyze_libraries(sources, options, jobs):
+    """Analyze every library on its own process
+
+    sources maps library id -> source (see library_source). Returns
+    {library id: (recommendations, product count, seconds)} for the
+    libraries that succeeded and {library id: error message} for the others,
+    both in the order of sources whichever library finishes first. Progress
+    lines, which carry timings, go to stderr.
+    """
+    # Imported here so startup (and --help) does not pay for it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = {}
+    errors = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(analyze_library, library_id, source, options): library_id
+            for library_id, source in sources.items()
+        }
+        for future in as_completed(futures):
+            library_id = futures[future]
+            try:
+                results[library_id] = future.result()
+            except Exception as e:
+                errors[library_id] = f'{type(e).__name__}: {e}'
+                print(f"   ❌ {library_id}: {errors[library_id]}", file=sys.stderr)
+                continue
+            recommendations, count, seconds = results[library_id]
+            print(f"   ✓ {library_id}: {count:,} products in {seconds:.1f}s", file=sys.stderr)
+    # Completion order varies between runs; the report and slug index must not
+    return ({library_id: results[library_id] for library_id in sources if library_id in results},
+            {library_id: errors[library_id] for library_id in sources if library_id in errors})
+
+
+def library_products(recommendations):
+    """(name, id) of every product in one library's recommendations"""
+    for item in recommendations['keep']:
+        yield item['product'].name, item['product'].id
+    for item in recommendations['consolidate']:
+        yield item['keep'].name, item['keep'].id
+        for product in item['archive']:
+            yield product.name, product.id
+    for product in recommendations['archive']:
+        yield product.name, product.id
+
+
+def build_slug_index(results):
+    """slug -> {library id: [(name, product id), ...]} across all libraries"""
+    index = {}
+    for library_id, (recommendations, _, _) in results.items():
+        for name, product_id in library_products(recommendations):
+            slug = product_slug(name)
+            if slug:
+                index.setdefault(slug, {}).setdefault(library_id, []).append((name, product_id))
+    return index
+
+
+def cross_library_duplicates(index):
+    """The slug index entries found in more than one library, by slug"""
+    return {slug: libraries for slug, libraries in sorted(index.items()) if len(libraries) > 1}
+
+
+def write_merged_report(writer, order, results, duplicates):
+    """Write every library's rows with library/also_in columns filled in"""
+    for library_id in order:
+        if library_id not in results:
+            continue
+
+        def annotate(row):
+            row['library'] = library_id
+            libraries = duplicates.get(product_slug(row['name']), ())
+            row['also_in'] = [other for other in libraries if other != library_id]
+
+        writer.write_recommendations(results[library_id][0], annotate)
+
+
+def display_merged_report(libraries, results, errors, duplicates, out=None):
+    """Text report: each library's recommendations, then the cross-library duplicates"""
+    out = out or sys.stdout
+    for library in libraries:
+        library_id = library['id']
+        if library_id not in results:
+            continue
+        title = f"{library.get('ui', {}).get('tabIcon', '📚')} {library.get('displayName', library_id)} ({library_id})"
+        out.write(f"\n{'#' * 100}\n{title.center(100)}\n{'#' * 100}\n\n")
+        analyzer.display_recommendations(results[library_id][0], out)
+
+    lines = ['=' * 100, 'CROSS-LIBRARY DUPLICATES'.center(100), '=' * 100, '']
+    if duplicates:
+        lines.append(f"🔁 {len(duplicates)} product names exist in more than one library:")
+        for slug, found in duplicates.items():
+            lines.append(f"   • {slug}")
+            for library_id, products in found.items():
+                ids = ', '.join(f'{product_id[:8]}...' for _, product_id in products[:MAX_LISTED_IDS] if product_id)
+                if len(products) > MAX_LISTED_IDS:
+                    ids += f' (+{len(products) - MAX_LISTED_IDS} more)'
+                lines.append(f"       {library_id:<20} {products[0][0]:<45} {ids}")
+    else:
+        lines.append("✓ No product name exists in more than one library")
+    lines.append('')
+
+    lines.append('SUMMARY:')
+    for library in libraries:
+        library_id = library['id']
+        if library_id in errors:
+            lines.append(f"   {library_id:<20} failed: {errors[library_id]}")
+            continue
+        recommendations, count, _ = results[library_id]
+        lines.append(f"   {library_id:<20} {count:>7,} products: {len(recommendations['keep'])} keep, "
+                     f"{len(recommendations['consolidate'])} consolidate, {len(recommendations['archive'])} archive")
+    lines.append(f"   Cross-library duplicate names: {len(duplicates)}")
+    lines.append('=' * 100)
+    out.write('\n'.join(lines) + '\n')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze every configured product library and find cross-library duplicates.')
+    parser.add_argument('--config', default=str(DEFAULT_CONFIG),
+                        help='libraries config (default: config/libraries.config.json)')
+    parser.add_argument('--library', action='append', default=[], metavar='ID',
+                        help='analyze only this library (repeatable; default: every enabled library with Polar enabled)')
+    parser.add_argument('--products-dir', metavar='DIR',
+                        help='read each library from DIR/<id>.snap, .ndjson or .json')
+    parser.add_argument('--products', action='append', default=[], metavar='ID=PATH',
+                        help='dump or snapshot for one library (repeatable)')
+    parser.add_argument('--fetch', action='store_true',
+                        help='fetch each library from the Polar API (POLAR_API_TOKEN_<NAMESPACE>, POLAR_ORG_ID_<NAMESPACE>)')
+    parser.add_argument('--api-url', default=os.environ.get('POLAR_API_URL'),
+                        help='Polar API base URL for --fetch (default: $POLAR_API_URL or https://api.polar.sh)')
+    parser.add_argument('--concurrency', type=int, default=8, metavar='N',
+                        help='concurrent page requests per library for --fetch (default: 8)')
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help='libraries analyzed at once (default: one process per library)')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help='keep a score cache per library in DIR/<id>.sqlite')
+    parser.add_argument('--similar', action='store_true',
+                        help='also group near-duplicate names within each library (MinHash/LSH)')
+    parser.add_argument('--similarity-threshold', type=float, default=analyzer.SIMILARITY_THRESHOLD, metavar='J',
+                        help=f'Jaccard similarity for --similar, 0-1 (default: {analyzer.SIMILARITY_THRESHOLD})')
+    parser.add_argument('--output-format', choices=['text', 'ndjson', 'csv', 'parquet'], default='text',
+                        help='merged report format; ndjson/csv/parquet add library and also_in columns (default: text)')
+    parser.add_argument('--output', '-o', metavar='PATH',
+                        help='write the report to PATH instead of stdout')
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    products = {}
+    for value in args.products:
+        library_id, sep, path = value.partition('=')
+        if not sep or not library_id or not path:
+            parser.error(f'--products expects ID=PATH, got {value!r}')
+        products[library_id] = path
+    args.products = products
+    if not (args.products_dir or args.products or args.fetch):
+        parser.error('pass --products-dir, --products ID=PATH or --fetch')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if not 0 < args.similarity_threshold <= 1:
+        parser.error('--similarity-threshold must be between 0 and 1')
+    if args.output_format == 'parquet' and not args.output:
+        parser.error('--output-format parquet needs --output PATH')
+    return args
+
+
+def main():
+    args = parse_args()
+    profiler = start_profiling(args, 'analyze-libraries.py')
+    report_out = sys.stdout
+    if args.output_format != 'text' and not args.output:
+        # stdout carries the machine-readable report; progress goes to stderr
+        sys.stdout = sys.stderr
+
+    # With only --products, analyze exactly the libraries given
+    only = args.library or (None if args.products_dir or args.fetch else list(args.products))
+    try:
+        libraries = select_libraries(load_libraries(args.config), only)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    sources = {}
+    try:
+        for library in libraries:
+            source = library_source(library, args)
+            if source is None:
+                print(f"⚠️  {library['id']}: no catalog found, skipping")
+            else:
+                sources[library['id']] = source
+        check_fetch_sources(sources)
+        if any(kind == 'fetch' for kind, _ in sources.values()):
+            # Checked here rather than failing in every worker process
+            import polar_fetch
+    except (ValueError, ImportError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    if not sources:
+        print("❌ Error: No library has a catalog to analyze")
+        sys.exit(1)
+
+    jobs = args.jobs or len(sources)
+    print(f"📚 Analyzing {len(sources)} libraries on {min(jobs, len(sources))} processes...")
+    options = {
+        'similarity': args.similarity_threshold if args.similar else None,
+        'cache_dir': args.cache_dir,
+        'api_url': args.api_url,
+        'concurrency': args.concurrency,
+    }
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+
+    if args.output:
+        if args.output_format == 'parquet':
+            report_out = open(args.output, 'wb')
+        else:
+            report_out = open(args.output, 'w', newline='', encoding='utf-8')
+    writer = None
+    if args.output_format != 'text':
+        # Opened before analyzing, so a missing pyarrow is reported up front
+        try:
+            writer = open_writer(args.output_format, report_out, LIBRARY_COLUMNS + COLUMNS)
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    with phase('analyze'):
+        results, errors = analyze_libraries(sources, options, jobs)
+    print(f"   Done in {time.perf_counter() - start:.1f}s\n", file=sys.stderr)
+
+    with phase('index'):
+        duplicates = cross_library_duplicates(build_slug_index(results))
+
+    with phase('write'):
+        if writer is None:
+            analyzed = [library for library in libraries if library['id'] in sources]
+            display_merged_report(analyzed, results, errors, duplicates, report_out)
+        else:
+            write_merged_report(writer, list(sources), results, duplicates)
+            writer.close()
+            counts = writer.counts
+            print(f"✓ Wrote {args.output_format} report to {args.output or 'stdout'}: "
+                  f"{counts['keep']} keep, {counts['consolidate']} consolidate, {counts['archive']} archive, "
+                  f"{len(duplicates)} cross-library duplicate names")
+    if args.output:
+        report_out.close()
+    finish_profiling(profiler, args)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,14 +9,96 @@ This script:
 4. Provides actionable recommendations
 
 Usage:
-    python3 scripts/analyze-product-duplicates.py
+    python3 scripts/analyze-product-duplicates.py products.json
+    python3 scripts/analyze-product-duplicates.py --stream products.json
+    python3 scripts/analyze-product-duplicates.py --stream products.ndjson
+    python3 scripts/analyze-product-duplicates.py catalog.snap
+    python3 scripts/analyze-product-duplicates.py --spill --output-format ndjson history.ndjson > report.ndjson
+    POLAR_API_TOKEN=xxx POLAR_ORG_ID=xxx python3 scripts/analyze-product-duplicates.py --fetch
+    python3 scripts/analyze-product-duplicates.py --output-format ndjson products.json > report.ndjson
+    python3 scripts/analyze-product-duplicates.py --profile profile.json products.json
+    python3 scripts/analyze-product-duplicates.py --image-clusters image-clusters.json products.json
 """
 
+import argparse
+import hashlib
 import json
+import math
+import os
+import random
+import re
+import sqlite3
 import sys
+import time
+import unicodedata
+import zlib
+from array import array
 from collections import defaultdict
 from datetime import datetime
 
+from polar_catalog import (
+    FREE_PRICE,
+    AmountType,
+    CatalogProduct,
+    Clock,
+    PriceKey,
+    as_records,
+    bulk_allocation,
+    format_price,
+    iter_catalog_items,
+    parse_products,
+    parse_timestamp,
+)
+from phase_profiler import add_profile_arguments, finish_profiling, phase, start_profiling
+from polar_snapshot import CatalogSnapshot, is_snapshot
+from product_spill import ProductSpill
+
+# NumPy is imported on first use (see _numpy) so startup does not pay for it
+_np = None
+
+# Products scored together by the batch scorer in streaming mode
+SCORE_BATCH_SIZE = 10000
+# Column sets scored with NumPy from this size on: below it the plain loop is
+# faster than importing NumPy (a full streaming batch means a large catalog)
+NUMPY_MIN_ROWS = SCORE_BATCH_SIZE
+
+# Reason bits used by score_products, in the order score_product reports them
+REASON_ICON = 1 << 0
+REASON_GOOD_DESCRIPTION = 1 << 1
+REASON_BASIC_DESCRIPTION = 1 << 2
+REASON_PAID_PRICE = 1 << 3
+REASON_FREE_PRICE = 1 << 4
+REASON_BENEFITS = 1 << 5
+REASON_RECENT = 1 << 6
+REASON_METADATA = 1 << 7
+REASON_LABELS = (
+    'has icon',
+    'good description',
+    'basic description',
+    'has paid price',
+    'has free price',
+    'has benefits',
+    'recently updated',
+    'has metadata',
+)
+REASONS_BY_MASK = tuple(
+    tuple(label for bit, label in enumerate(REASON_LABELS) if mask & (1 << bit))
+    for mask in range(1 << len(REASON_LABELS))
+)
+RECENT_SECONDS = 30 * 24 * 60 * 60
+
+# MinHash/LSH near-duplicate detection (--similar)
+SIMILARITY_THRESHOLD = 0.5
+SIMILARITY_PERMUTATIONS = 128
+# Description word pairs mixed into a name's shingles, so the name dominates
+SIMILARITY_DESCRIPTION_SHINGLES = 8
+# Names merged into one near-duplicate cluster at most
+SIMILARITY_MAX_CLUSTER = 50
+_MINHASH_PRIME = (1 << 31) - 1
+
+# Bump when scoring or recommendation logic changes to invalidate --cache files
+SCORE_CACHE_VERSION = 2
+
 def score_product(product):
     """Score a product based on completeness and quality"""
     score = 0
@@ -82,198 +164,1107 @@ def score_product(product):
     
     return score, reasons
 
-def format_price(price_obj):
-    """Format price object into readable string"""
-    if not price_obj:
-        return "No price"
-    
-    amount_type = price_obj.get("amount_type", "")
-    if amount_type == "free":
-        return "FREE"
-    elif amount_type == "fixed":
-        amount = price_obj.get("price_amount", 0) / 100
-        currency = price_obj.get("price_currency", "usd").upper()
-        return f"${amount:.2f} {currency}"
+def catalog_columns(products):
+    """Extract the fields score_product looks at into flat typed columns
+    
+    Accepts CatalogProduct records or raw product dicts; each product is
+    walked exactly once. modified_epoch holds the modified/created timestamp
+    as seconds since the epoch (NaN when missing or unparseable).
+    """
+    media_count = array('q')
+    desc_len = array('q')
+    desc_blender = array('b')
+    has_paid = array('b')
+    has_free = array('b')
+    benefit_count = array('q')
+    modified_epoch = array('d')
+    metadata_size = array('q')
+    
+    clock = Clock()
+    timestamps = {}
+    
+    for product in products:
+        if isinstance(product, CatalogProduct):
+            description = product.description
+            paid = free = False
+            for p in product.prices:
+                if not p.is_archived:
+                    if p.amount_type is AmountType.FIXED and p.amount > 0:
+                        paid = True
+                    elif p.amount_type is AmountType.FREE:
+                        free = True
+            media_count.append(product.media_count)
+            benefit_count.append(product.benefit_count)
+            epoch = product.modified_epoch
+            metadata_size.append(product.metadata_size)
+        else:
+            # Raw dicts are read directly rather than parsed into records,
+            # which would cost more than the scoring itself
+            get = product.get
+            description = get('description') or ''
+            paid = free = False
+            for p in get('prices', ()):
+                if p.get('is_archived', False):
+                    continue
+                amount_type = p.get('amount_type')
+                if amount_type == 'fixed' and (p.get('price_amount') or 0) > 0:
+                    paid = True
+                elif amount_type == 'free':
+                    free = True
+            medias = get('medias')
+            media_count.append(len(medias) if medias else 0)
+            benefits = get('benefits')
+            benefit_count.append(len(benefits) if benefits else 0)
+            timestamp = get('modified_at') or get('created_at')
+            if isinstance(timestamp, str):
+                epoch = timestamps.get(timestamp)
+                if epoch is None:
+                    epoch = timestamps[timestamp] = parse_timestamp(timestamp, clock)
+            else:
+                epoch = math.nan
+            metadata = get('metadata')
+            metadata_size.append(len(metadata) if metadata else 0)
+        desc_len.append(len(description))
+        desc_blender.append(description.startswith('Blender asset:'))
+        has_paid.append(paid)
+        has_free.append(free)
+        modified_epoch.append(epoch)
+    
+    return {
+        'media_count': media_count,
+        'desc_len': desc_len,
+        'desc_blender': desc_blender,
+        'has_paid': has_paid,
+        'has_free': has_free,
+        'benefit_count': benefit_count,
+        'modified_epoch': modified_epoch,
+        'metadata_size': metadata_size,
+        'now_epoch': time.time(),
+    }
+
+def _numpy():
+    """The numpy module, imported on first use; None when it is not installed"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _np = numpy
+    return _np or None
+
+def score_columns(columns, now_epoch=None):
+    """Compute scores and reason bitmasks for a whole column set at once
+    
+    Returns two equal-length sequences (scores, reason masks). Uses NumPy
+    when it is installed (for NUMPY_MIN_ROWS rows or more, or once it has
+    been imported) and falls back to a plain loop over the arrays.
+    """
+    if now_epoch is None:
+        now_epoch = columns['now_epoch']
+    
+    np = _numpy() if _np is not None or len(columns['media_count']) >= NUMPY_MIN_ROWS else None
+    if np is not None:
+        media = np.frombuffer(columns['media_count'], dtype=np.int64)
+        desc_len = np.frombuffer(columns['desc_len'], dtype=np.int64)
+        blender = np.frombuffer(columns['desc_blender'], dtype=np.int8).astype(bool)
+        paid = np.frombuffer(columns['has_paid'], dtype=np.int8).astype(bool)
+        free = np.frombuffer(columns['has_free'], dtype=np.int8).astype(bool)
+        benefits = np.frombuffer(columns['benefit_count'], dtype=np.int64)
+        modified = np.frombuffer(columns['modified_epoch'], dtype=np.float64)
+        metadata = np.frombuffer(columns['metadata_size'], dtype=np.int64)
+        
+        icon = media > 0
+        good = (desc_len > 50) & ~blender
+        basic = ~good & (desc_len > 20)
+        has_benefits = benefits > 0
+        with np.errstate(invalid='ignore'):
+            recent = (now_epoch - modified) < RECENT_SECONDS
+        has_metadata = metadata > 0
+        
+        scores = (20 * icon + 15 * good + 5 * basic + 10 * paid + 5 * free
+                  + 10 * has_benefits + 5 * recent + 5 * has_metadata).astype(np.int64)
+        masks = (icon * REASON_ICON
+                 | good * REASON_GOOD_DESCRIPTION
+                 | basic * REASON_BASIC_DESCRIPTION
+                 | paid * REASON_PAID_PRICE
+                 | free * REASON_FREE_PRICE
+                 | has_benefits * REASON_BENEFITS
+                 | recent * REASON_RECENT
+                 | has_metadata * REASON_METADATA).astype(np.int64)
+        return scores.tolist(), masks.tolist()
+    
+    scores = array('q')
+    masks = array('q')
+    for media, desc_len, blender, paid, free, benefits, modified, metadata in zip(
+        columns['media_count'], columns['desc_len'], columns['desc_blender'],
+        columns['has_paid'], columns['has_free'], columns['benefit_count'],
+        columns['modified_epoch'], columns['metadata_size'],
+    ):
+        score = mask = 0
+        if media > 0:
+            score += 20
+            mask |= REASON_ICON
+        if desc_len > 50 and not blender:
+            score += 15
+            mask |= REASON_GOOD_DESCRIPTION
+        elif desc_len > 20:
+            score += 5
+            mask |= REASON_BASIC_DESCRIPTION
+        if paid:
+            score += 10
+            mask |= REASON_PAID_PRICE
+        if free:
+            score += 5
+            mask |= REASON_FREE_PRICE
+        if benefits > 0:
+            score += 10
+            mask |= REASON_BENEFITS
+        # NaN compares False, matching the unparseable-date case
+        if now_epoch - modified < RECENT_SECONDS:
+            score += 5
+            mask |= REASON_RECENT
+        if metadata > 0:
+            score += 5
+            mask |= REASON_METADATA
+        scores.append(score)
+        masks.append(mask)
+    return scores, masks
+
+def score_products(products):
+    """Batch equivalent of score_product for a list of products
+    
+    Returns a list of (score, reasons) tuples in input order, identical to
+    calling score_product on each product. A CatalogSnapshot is scored
+    straight from its mapped columns.
+    """
+    if isinstance(products, CatalogSnapshot):
+        columns = products.score_columns()
     else:
-        return amount_type
+        columns = catalog_columns(products)
+    scores, masks = score_columns(columns)
+    with bulk_allocation():
+        return [(score, list(REASONS_BY_MASK[mask])) for score, mask in zip(scores, masks)]
 
-def analyze_products(products_data):
-    """Analyze products and generate recommendations"""
+def analyze_products(products_data, similarity_threshold=None, cache=None, writer=None, image_clusters=None):
+    """Analyze products and generate recommendations
     
-    products = products_data.get('items', [])
-    print(f"\n📊 Analyzing {len(products)} products...\n")
+    products_data is a polar_products_list response or a CatalogSnapshot
+    (see polar_snapshot.py). With similarity_threshold set, name groups whose names/descriptions are
+    near duplicates (see MinHashIndex) are merged before recommending; with
+    image_clusters (see image_index.py), so are groups whose products share
+    an image. With a ScoreCache, only new/modified products are scored and only the groups
+    they touch are recomputed. With a writer (see recommendation_writers.py),
+    recommendations are written out group by group instead of returned.
+    """
     
-    # Group by name
-    groups = defaultdict(list)
-    for product in products:
-        groups[product['name']].append(product)
+    if isinstance(products_data, CatalogSnapshot):
+        # No JSON to parse: records come from the mapped columns
+        with phase('parse'):
+            products = products_data.records()
+        with phase('score'):
+            scores = cache.score_products(products) if cache is not None else score_products(products_data)
+    else:
+        with phase('parse'):
+            products = parse_products(products_data.get('items', []))
+        scorer = cache.score_products if cache is not None else score_products
+        with phase('score'):
+            scores = scorer(products)
+    print(f"\n📊 Analyzing {len(products)} products...\n")
     
-    # Score each product
-    scored_groups = {}
-    for name, variants in groups.items():
-        scored_groups[name] = []
-        for product in variants:
-            score, reasons = score_product(product)
-            scored_groups[name].append({
+    # Score every product in one batch, then group by name
+    with phase('group'):
+        scored_groups = defaultdict(list)
+        for product, (score, reasons) in zip(products, scores):
+            scored_groups[product.name].append({
                 'product': product,
                 'score': score,
                 'reasons': reasons,
             })
-        # Sort by score descending
-        scored_groups[name].sort(key=lambda x: x['score'], reverse=True)
     
-    # Generate recommendations
+    if similarity_threshold is not None:
+        with phase('similar'):
+            descriptions = {name: variants[0]['product'].description for name, variants in scored_groups.items()}
+            scored_groups = merge_similar_groups(scored_groups, descriptions, similarity_threshold)
+    if image_clusters is not None:
+        with phase('images'):
+            scored_groups = merge_image_groups(scored_groups, image_clusters, lambda sv: sv['product'].id)
+    
+    return build_recommendations(scored_groups, cache, writer)
+
+def analyze_product_stream(products, similarity_threshold=None, cache=None, writer=None, image_clusters=None):
+    """Analyze an iterable of products without holding the raw catalog
+    
+    Products are parsed into compact CatalogProduct records and scored in
+    batches as they arrive; the raw dicts are dropped straight away, so peak
+    memory follows the number of products and names rather than the size of
+    the export.
+    """
+    
+    scorer = cache.score_products if cache is not None else score_products
+    scored_groups = defaultdict(list)
+    descriptions = {}
+    count = 0
+    batch = []
+    
+    def flush():
+        with phase('parse'):
+            records = parse_products(batch)
+        with phase('score'):
+            scores = scorer(records)
+        with phase('group'):
+            for product, (score, reasons) in zip(records, scores):
+                if similarity_threshold is not None and product.name not in descriptions:
+                    descriptions[product.name] = product.description
+                scored_groups[product.name].append({
+                    'product': product,
+                    'score': score,
+                    'reasons': reasons,
+                })
+        batch.clear()
+    
+    for product in products:
+        batch.append(product)
+        count += 1
+        if len(batch) >= SCORE_BATCH_SIZE:
+            flush()
+    flush()
+    
+    print(f"\n📊 Analyzed {count} products (streaming)...\n")
+    if similarity_threshold is not None:
+        with phase('similar'):
+            scored_groups = merge_similar_groups(scored_groups, descriptions, similarity_threshold)
+    if image_clusters is not None:
+        with phase('images'):
+            scored_groups = merge_image_groups(scored_groups, image_clusters, lambda sv: sv['product'].id)
+    return build_recommendations(scored_groups, cache, writer)
+
+def analyze_spilled_products(products, similarity_threshold=None, cache=None, writer=None, spill_dir=None):
+    """Analyze an iterable of products larger than memory
+    
+    Products are spilled to a temporary SQLite table (see product_spill.py)
+    instead of being grouped in a dict, then read back one name group at a
+    time and scored in batches, so memory no longer grows with the catalog.
+    Recommendations are identical to analyze_products; to keep them out of
+    memory too, pass a writer.
+    """
+    
+    scorer = cache.score_products if cache is not None else score_products
     recommendations = {
         'keep': [],
         'consolidate': [],
         'archive': [],
     }
     
-    for name, scored_variants in scored_groups.items():
-        if len(scored_variants) == 1:
-            # Single variant - keep it
-            sv = scored_variants[0]
-            price = sv['product'].get('prices', [{}])[0]
-            recommendations['keep'].append({
-                'name': name,
-                'product': sv['product'],
-                'score': sv['score'],
-                'reasons': sv['reasons'],
-                'price': format_price(price),
-            })
+    with ProductSpill(spill_dir) as spill:
+        for product in products:
+            spill.add(product.get('name'), product)
+        print(f"\n📊 Analyzed {len(spill)} products (spilled to disk)...\n")
+        
+        if similarity_threshold is not None:
+            names = ((name, product.get('description')) for name, product in spill.first_seen())
+            clusters = similar_name_clusters(names, similarity_threshold)
+            groups = (
+                (cluster[0], [product for name in cluster for product in spill.group(name)])
+                for cluster in clusters
+            )
         else:
-            # Multiple variants
-            best = scored_variants[0]
-            others = scored_variants[1:]
-            
-            # Collect all unique prices
+            groups = spill.groups()
+        
+        batch = {}
+        batch_size = 0
+        
+        def flush():
+            # Score a batch of whole groups at once, then recommend group by group
+            records = parse_products([product for variants in batch.values() for product in variants])
+            scores = scorer(records)
+            scored_groups = {}
+            start = 0
+            for name, variants in batch.items():
+                end = start + len(variants)
+                scored_groups[name] = [
+                    {'product': product, 'score': score, 'reasons': reasons}
+                    for product, (score, reasons) in zip(records[start:end], scores[start:end])
+                ]
+                start = end
+            result = build_recommendations(scored_groups, cache, writer)
+            for key in recommendations:
+                recommendations[key].extend(result[key])
+            batch.clear()
+        
+        for name, variants in groups:
+            batch[name] = variants
+            batch_size += len(variants)
+            if batch_size >= SCORE_BATCH_SIZE:
+                flush()
+                batch_size = 0
+        flush()
+    
+    return recommendations
+
+def build_recommendations(scored_groups, cache=None, writer=None):
+    """Turn scored name groups into keep/consolidate/archive recommendations
+    
+    With a writer, each group's recommendations are written as soon as the
+    group is decided and are not kept: the returned lists stay empty and
+    writer.counts holds the totals.
+    """
+    
+    recommendations = {
+        'keep': [],
+        'consolidate': [],
+        'archive': [],
+    }
+    
+    with phase('recommend'):
+        for name, scored_variants in scored_groups.items():
+            if cache is not None:
+                cache.recommend_group(name, scored_variants, recommendations)
+            else:
+                # Sort by score descending
+                with phase('sort', light=True):
+                    scored_variants.sort(key=lambda x: x['score'], reverse=True)
+                recommend_group(name, scored_variants, recommendations)
+            if writer is not None:
+                with phase('write', light=True):
+                    writer.write_recommendations(recommendations)
+    
+    return recommendations
+
+def recommend_group(name, scored_variants, recommendations):
+    """Add the recommendation for one score-sorted name group"""
+    
+    if len(scored_variants) == 1:
+        # Single variant - keep it
+        sv = scored_variants[0]
+        price = sv['product'].first_price
+        entry = {
+            'name': name,
+            'product': sv['product'],
+            'score': sv['score'],
+            'reasons': sv['reasons'],
+            'price': price.key if price else None,
+        }
+        recommendations['keep'].append(entry)
+    else:
+        # Multiple variants
+        best = scored_variants[0]
+        others = scored_variants[1:]
+        
+        # Collect all unique active prices (PriceKeys; formatted only when rendering)
+        with phase('all_prices', light=True):
             all_prices = set()
             for sv in scored_variants:
-                for price in sv['product'].get('prices', []):
-                    if not price.get('is_archived', False):
-                        price_str = format_price(price)
-                        all_prices.add(price_str)
-            
-            # Check if consolidation needed (multiple price types)
-            has_free = any('FREE' in p for p in all_prices)
-            has_paid = any('$' in p for p in all_prices)
-            
-            if has_free and has_paid:
-                # Need to consolidate - keep best, archive others
-                recommendations['consolidate'].append({
-                    'name': name,
-                    'keep': best['product'],
-                    'keep_score': best['score'],
-                    'keep_reasons': best['reasons'],
-                    'archive': [sv['product'] for sv in others],
-                    'all_prices': sorted(all_prices),
-                    'current_prices': [format_price(p) for p in best['product'].get('prices', []) if not p.get('is_archived', False)],
-                })
-            else:
-                # Same price type - just keep best
-                recommendations['keep'].append({
-                    'name': name,
-                    'product': best['product'],
-                    'score': best['score'],
-                    'reasons': best['reasons'],
-                    'price': format_price(best['product'].get('prices', [{}])[0]),
-                })
-                recommendations['archive'].extend([sv['product'] for sv in others])
+                all_prices.update(sv['product'].price_keys())
+        
+        # Check if consolidation needed (FREE and paid, in any currency)
+        has_free = FREE_PRICE in all_prices
+        has_paid = any(key.is_paid for key in all_prices)
+        
+        if has_free and has_paid:
+            # Need to consolidate - keep best, archive others
+            entry = {
+                'name': name,
+                'keep': best['product'],
+                'keep_score': best['score'],
+                'keep_reasons': best['reasons'],
+                'archive': [sv['product'] for sv in others],
+                'all_prices': sorted(all_prices),
+                'current_prices': best['product'].price_keys(),
+            }
+            recommendations['consolidate'].append(entry)
+        else:
+            # Same price type - just keep best
+            price = best['product'].first_price
+            entry = {
+                'name': name,
+                'product': best['product'],
+                'score': best['score'],
+                'reasons': best['reasons'],
+                'price': price.key if price else None,
+            }
+            recommendations['keep'].append(entry)
+            recommendations['archive'].extend([sv['product'] for sv in others])
+        
+        # Near-duplicate clusters span several names; record which ones
+        names = {sv['product'].name for sv in scored_variants}
+        if len(names) > 1:
+            entry['similar_names'] = sorted(names)
+
+def similarity_shingles(name, description=None):
+    """Shingles used to compare products for near duplicates
+    
+    Character 3-grams of the name with case, spaces and punctuation removed
+    (so "Dojo Bolt Gen" and "DojoBoltGen v2" overlap heavily), plus the first
+    few word pairs of the description. Text is NFKC-normalized and casefolded
+    and letters of any script are kept; a name made only of punctuation and
+    without a description has no shingles.
+    """
+    squashed = re.sub(r'[\W_]+', '', unicodedata.normalize('NFKC', name).casefold())
+    shingles = {squashed[i:i + 3] for i in range(max(len(squashed) - 2, 1))} if squashed else set()
+    description = unicodedata.normalize('NFKC', description or '').casefold()
+    words = re.findall(r'[^\W_]+', description)[:SIMILARITY_DESCRIPTION_SHINGLES + 1]
+    shingles.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+    return shingles
+
+class MinHashIndex:
+    """Locality-sensitive hashing index over MinHash signatures
+    
+    Keys whose shingle sets have an estimated Jaccard similarity of at least
+    threshold end up in the same cluster. Signatures are split into bands and
+    only keys sharing a band bucket are compared, so building clusters is
+    roughly linear in the number of keys instead of quadratic. Keys added with
+    no shingles are kept out of the buckets and never match anything.
+    """
+    
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=SIMILARITY_PERMUTATIONS, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = self._rows_for_threshold(threshold, num_perm)
+        self.bands = num_perm // self.rows
+        rng = random.Random(seed)
+        self._a = [rng.randrange(1, _MINHASH_PRIME) for _ in range(num_perm)]
+        self._b = [rng.randrange(0, _MINHASH_PRIME) for _ in range(num_perm)]
+        np = _numpy()
+        if np is not None:
+            self._a_np = np.array(self._a, dtype=np.uint64)[:, None]
+            self._b_np = np.array(self._b, dtype=np.uint64)[:, None]
+        self.keys = []
+        self.signatures = []
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+    
+    @staticmethod
+    def _rows_for_threshold(threshold, num_perm):
+        # The LSH S-curve crosses ~(1/bands)^(1/rows); pick the closest split
+        splits = [rows for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+        return min(splits, key=lambda rows: abs((rows / num_perm) ** (1 / rows) - threshold))
+    
+    def signature(self, shingles):
+        hashes = [zlib.crc32(s.encode('utf-8')) % _MINHASH_PRIME for s in shingles] or [0]
+        np = _numpy()
+        if np is not None:
+            h = np.array(hashes, dtype=np.uint64)[None, :]
+            return tuple(((self._a_np * h + self._b_np) % _MINHASH_PRIME).min(axis=1).tolist())
+        return tuple(
+            min((a * h + b) % _MINHASH_PRIME for h in hashes)
+            for a, b in zip(self._a, self._b)
+        )
+    
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[band * rows:(band + 1) * rows] for band in range(self.bands)]
+    
+    def add(self, key, shingles):
+        index = len(self.keys)
+        signature = self.signature(shingles) if shingles else None
+        self.keys.append(key)
+        self.signatures.append(signature)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            buckets[band_key].append(index)
     
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity between two signatures"""
+        return sum(a == b for a, b in zip(first, second)) / self.num_perm
+    
+    def query(self, shingles):
+        """Keys similar to the given shingles, most similar first"""
+        if not shingles:
+            return []
+        signature = self.signature(shingles)
+        candidates = set()
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(band_key, ()))
+        matches = []
+        for index in candidates:
+            similarity = self.similarity(signature, self.signatures[index])
+            if similarity >= self.threshold:
+                matches.append((similarity, index))
+        matches.sort(key=lambda m: (-m[0], m[1]))
+        return [self.keys[index] for _, index in matches]
+    
+    def clusters(self, max_size=SIMILARITY_MAX_CLUSTER):
+        """Lists of similar keys, in the order keys were added
+        
+        The earliest key not yet in a cluster leads a new one, and a key joins
+        only if it is similar to that leader itself. Chains of keys that are
+        each similar to the next (A~B, B~C but A and C not) are therefore not
+        merged. A cluster stops growing at max_size keys.
+        """
+        cluster_of = [None] * len(self.keys)
+        clusters = []
+        for leader, signature in enumerate(self.signatures):
+            if cluster_of[leader] is not None:
+                continue
+            cluster_of[leader] = leader
+            members = [leader]
+            if signature is not None:
+                candidates = set()
+                for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+                    candidates.update(buckets.get(band_key, ()))
+                # Every earlier key already has a cluster, so these follow the leader
+                for other in sorted(candidates):
+                    if len(members) >= max_size:
+                        break
+                    if cluster_of[other] is None and self.similarity(signature, self.signatures[other]) >= self.threshold:
+                        cluster_of[other] = leader
+                        members.append(other)
+            clusters.append([self.keys[i] for i in members])
+        return clusters
+
+def merge_similar_groups(groups, descriptions, threshold):
+    """Merge name groups whose names/descriptions are near duplicates
+    
+    groups maps product name to its variants; the merged dict is keyed by the
+    first name of each cluster and keeps first-appearance order.
+    """
+    clusters = similar_name_clusters(((name, descriptions.get(name)) for name in groups), threshold)
+    return {
+        cluster[0]: [variant for name in cluster for variant in groups[name]]
+        for cluster in clusters
+    }
+
+def merge_image_groups(groups, image_clusters, product_id, max_size=SIMILARITY_MAX_CLUSTER):
+    """Merge name groups whose products share an image cluster
+    
+    image_clusters maps product id to cluster number (see
+    image_index.load_image_clusters); product_id gets the id from a variant.
+    As in MinHashIndex.clusters, the earliest group not yet merged leads and
+    a group joins only if it shares an image cluster with that leader, up to
+    max_size groups, so groups are not chained through shared clusters.
+    Like merge_similar_groups, the merged dict is keyed by the first name of
+    each cluster and keeps first-appearance order.
+    """
+    names = list(groups)
+    clusters_of = []
+    groups_by_cluster = defaultdict(list)
+    for i, name in enumerate(names):
+        clusters = {image_clusters.get(product_id(variant)) for variant in groups[name]}
+        clusters.discard(None)
+        clusters_of.append(clusters)
+        for cluster in clusters:
+            groups_by_cluster[cluster].append(i)
+    
+    merged_into = [None] * len(names)
+    merged = {}
+    for leader, name in enumerate(names):
+        if merged_into[leader] is not None:
+            continue
+        merged_into[leader] = leader
+        members = [leader]
+        # Every earlier group is already merged, so these follow the leader
+        for other in sorted({i for cluster in clusters_of[leader] for i in groups_by_cluster[cluster]}):
+            if len(members) >= max_size:
+                break
+            if merged_into[other] is None:
+                merged_into[other] = leader
+                members.append(other)
+        merged[name] = [variant for i in members for variant in groups[names[i]]]
+    return merged
+
+def similar_name_clusters(names, threshold):
+    """Clusters of near-duplicate names from (name, description) pairs
+    
+    Each cluster lists names in the order they were given; clusters are
+    ordered by their first name.
+    """
+    index = MinHashIndex(threshold)
+    for name, description in names:
+        index.add(name, similarity_shingles(name, description))
+    return index.clusters()
+
+# Shards handed to forked workers by index instead of being pickled
+_FORK_SHARDS = None
+
+def shard_for_name(name, shard_count):
+    """Stable shard index for a product name (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(name.encode('utf-8')) % shard_count
+
+def analyze_products_parallel(products_data, workers, similarity_threshold=None, writer=None, image_clusters=None):
+    """Analyze products on a process pool, one shard of name groups per worker
+    
+    Name groups are hash-partitioned across workers, each worker scores and
+    recommends its groups, and the results are merged back in the order the
+    groups first appear in the catalog, so the recommendations are identical
+    to analyze_products.
+    """
+    global _FORK_SHARDS
+    
+    products = products_data.get('items', [])
+    print(f"\n📊 Analyzing {len(products)} products...\n")
+    
+    groups = defaultdict(list)
+    for product in products:
+        groups[product['name']].append(product)
+    if similarity_threshold is not None:
+        descriptions = {name: variants[0].get('description') or '' for name, variants in groups.items()}
+        groups = merge_similar_groups(groups, descriptions, similarity_threshold)
+    if image_clusters is not None:
+        groups = merge_image_groups(groups, image_clusters, lambda variant: variant.get('id'))
+    
+    shards = [[] for _ in range(workers)]
+    for order, (name, variants) in enumerate(groups.items()):
+        shards[shard_for_name(name, workers)].append((order, name, variants))
+    
+    # Imported here so runs without --workers do not pay for them at startup
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # With fork the workers inherit the shards, so only indices cross the pipe
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _FORK_SHARDS = shards
+        context = multiprocessing.get_context('fork')
+        tasks = range(workers)
+    else:
+        context = None
+        tasks = shards
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            shard_results = list(pool.map(_analyze_shard, tasks))
+    finally:
+        _FORK_SHARDS = None
+    
+    group_results = [None] * len(groups)
+    for shard, results in zip(shards, shard_results):
+        for order, (records, result) in zip((order for order, _, _ in shard), results):
+            group_results[order] = _indices_to_products(result, records)
+    
+    recommendations = {
+        'keep': [],
+        'consolidate': [],
+        'archive': [],
+    }
+    for result in group_results:
+        if writer is not None:
+            writer.write_recommendations(result)
+            continue
+        for key in recommendations:
+            recommendations[key].extend(result[key])
     return recommendations
 
-def display_recommendations(recommendations):
-    """Display formatted recommendations"""
+def _analyze_shard(shard):
+    """Score and recommend every name group in one shard (runs in a worker)
+    
+    Workers parse their own groups into CatalogProduct records and return
+    them once per group; the recommendations refer to them by index so each
+    record is only pickled once.
+    """
+    if isinstance(shard, int):
+        shard = _FORK_SHARDS[shard]
+    
+    results = []
+    for _, name, variants in shard:
+        variants = parse_products(variants)
+        scored_variants = [
+            {'product': product, 'score': score, 'reasons': reasons}
+            for product, (score, reasons) in zip(variants, score_products(variants))
+        ]
+        scored_variants.sort(key=lambda x: x['score'], reverse=True)
+        result = {'keep': [], 'consolidate': [], 'archive': []}
+        recommend_group(name, scored_variants, result)
+        results.append((variants, _products_to_indices(result, variants)))
+    return results
+
+def _products_to_indices(result, variants):
+    index = {id(product): i for i, product in enumerate(variants)}
+    return _map_products(result, lambda product: index[id(product)])
+
+def _indices_to_products(result, variants):
+    return _map_products(result, variants.__getitem__)
+
+def _map_products(result, convert):
+    """Apply convert to every product reference in one group's recommendations"""
+    return {
+        'keep': [dict(item, product=convert(item['product'])) for item in result['keep']],
+        'consolidate': [
+            dict(item, keep=convert(item['keep']), archive=[convert(p) for p in item['archive']])
+            for item in result['consolidate']
+        ],
+        'archive': [convert(p) for p in result['archive']],
+    }
+
+def _price_keys_from_json(result):
+    """Turn the PriceKeys of a JSON round-tripped result back from lists"""
+    for item in result['keep']:
+        if item['price'] is not None:
+            item['price'] = PriceKey(*item['price'])
+    for item in result['consolidate']:
+        item['all_prices'] = [PriceKey(*key) for key in item['all_prices']]
+        item['current_prices'] = [PriceKey(*key) for key in item['current_prices']]
+    return result
+
+class ScoreCache:
+    """On-disk (SQLite) cache of product scores and group recommendations
+    
+    Scores are stored keyed by (id, modified_at) without the time-based
+    "recently updated" bonus, which is re-applied on every run from the stored
+    timestamp. A group's recommendation is reused while its members are
+    unchanged and none of their "recently updated" bonuses has expired since
+    it was computed.
+    """
     
-    print('=' * 100)
-    print('PRODUCT CONSOLIDATION RECOMMENDATIONS'.center(100))
-    print('=' * 100)
-    print()
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS product_scores (
+            id TEXT PRIMARY KEY,
+            modified_at TEXT,
+            base_score INTEGER NOT NULL,
+            base_mask INTEGER NOT NULL,
+            modified_epoch REAL
+        );
+        CREATE TABLE IF NOT EXISTS group_recommendations (
+            name TEXT PRIMARY KEY,
+            members TEXT NOT NULL,
+            computed_at REAL NOT NULL,
+            valid_until REAL,
+            result TEXT NOT NULL
+        );
+    """
+    LOOKUP_CHUNK = 500
+    
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or int(row[0]) != SCORE_CACHE_VERSION:
+            self.conn.execute("DELETE FROM product_scores")
+            self.conn.execute("DELETE FROM group_recommendations")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(SCORE_CACHE_VERSION),))
+        self.now_epoch = time.time()
+        # epoch at which each currently "recently updated" product loses its bonus
+        self._recent_until = {}
+        self._seen_ids = set()
+        self._seen_groups = set()
+        self.stats = {'scored': 0, 'cached': 0, 'groups_recomputed': 0, 'groups_cached': 0}
+    
+    def _lookup(self, ids):
+        rows = {}
+        ids = list(ids)
+        for start in range(0, len(ids), self.LOOKUP_CHUNK):
+            chunk = ids[start:start + self.LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                f"SELECT id, modified_at, base_score, base_mask, modified_epoch FROM product_scores WHERE id IN ({placeholders})",
+                chunk,
+            ):
+                rows[row[0]] = row[1:]
+        return rows
+    
+    def score_products(self, products):
+        """Drop-in replacement for score_products backed by the cache"""
+        products = as_records(products)
+        cached = self._lookup({p.id for p in products if p.id is not None})
+        
+        base = [None] * len(products)
+        missing = []
+        for i, product in enumerate(products):
+            row = cached.get(product.id)
+            if row is not None and row[0] == product.modified_at:
+                epoch = row[3] if row[3] is not None else float('nan')
+                base[i] = (row[1], row[2], epoch)
+            else:
+                missing.append(i)
+        
+        if missing:
+            # Score without the recency bonus (an infinitely late "now")
+            columns = catalog_columns([products[i] for i in missing])
+            scores, masks = score_columns(columns, now_epoch=math.inf)
+            rows = []
+            for i, score, mask, epoch in zip(missing, scores, masks, columns['modified_epoch']):
+                base[i] = (score, mask, epoch)
+                product_id = products[i].id
+                if product_id is not None:
+                    rows.append((product_id, products[i].modified_at, score, mask,
+                                 None if math.isnan(epoch) else epoch))
+            self.conn.executemany("INSERT OR REPLACE INTO product_scores VALUES (?, ?, ?, ?, ?)", rows)
+        self.stats['scored'] += len(missing)
+        self.stats['cached'] += len(products) - len(missing)
+        
+        results = []
+        for product, (score, mask, epoch) in zip(products, base):
+            self._seen_ids.add(product.id)
+            if self.now_epoch - epoch < RECENT_SECONDS:
+                score += 5
+                mask |= REASON_RECENT
+                self._recent_until[product.id] = epoch + RECENT_SECONDS
+            results.append((score, list(REASONS_BY_MASK[mask])))
+        return results
+    
+    def recommend_group(self, name, scored_variants, recommendations):
+        """recommend_group for one unsorted group, reusing a cached result"""
+        variants = [sv['product'] for sv in scored_variants]
+        members = json.dumps([(p.id, p.modified_at) for p in variants])
+        members = hashlib.sha1(members.encode('utf-8')).hexdigest()
+        self._seen_groups.add(name)
+        
+        row = self.conn.execute(
+            "SELECT members, computed_at, valid_until, result FROM group_recommendations WHERE name = ?", (name,)
+        ).fetchone()
+        if (row is not None and row[0] == members and row[1] <= self.now_epoch
+                and (row[2] is None or self.now_epoch < row[2])):
+            result = _price_keys_from_json(_indices_to_products(json.loads(row[3]), variants))
+            self.stats['groups_cached'] += 1
+        else:
+            scored_variants.sort(key=lambda x: x['score'], reverse=True)
+            result = {'keep': [], 'consolidate': [], 'archive': []}
+            recommend_group(name, scored_variants, result)
+            expiries = [self._recent_until[p.id] for p in variants if p.id in self._recent_until]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO group_recommendations VALUES (?, ?, ?, ?, ?)",
+                (name, members, self.now_epoch, min(expiries) if expiries else None,
+                 json.dumps(_products_to_indices(result, variants))),
+            )
+            self.stats['groups_recomputed'] += 1
+        
+        for key in recommendations:
+            recommendations[key].extend(result[key])
+    
+    def close(self):
+        """Drop rows for products and groups not seen this run, then commit"""
+        self.conn.execute("CREATE TEMP TABLE seen_ids (id TEXT PRIMARY KEY)")
+        self.conn.executemany("INSERT OR IGNORE INTO seen_ids VALUES (?)",
+                              ((i,) for i in self._seen_ids if i is not None))
+        self.conn.execute("DELETE FROM product_scores WHERE id NOT IN (SELECT id FROM seen_ids)")
+        self.conn.execute("CREATE TEMP TABLE seen_groups (name TEXT PRIMARY KEY)")
+        self.conn.executemany("INSERT INTO seen_groups VALUES (?)", ((n,) for n in self._seen_groups))
+        self.conn.execute("DELETE FROM group_recommendations WHERE name NOT IN (SELECT name FROM seen_groups)")
+        self.conn.commit()
+        self.conn.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze Polar products and recommend consolidation.')
+    parser.add_argument('products', nargs='?',
+                        help='polar_products_list JSON dump, NDJSON with --stream, or a polar_snapshot.py snapshot')
+    parser.add_argument('--stream', action='store_true',
+                        help='read items one at a time instead of loading the whole dump')
+    parser.add_argument('--format', choices=['auto', 'json', 'ndjson'], default='auto',
+                        help='input format for --stream/--spill (default: by file extension)')
+    parser.add_argument('--fetch', action='store_true',
+                        help='fetch products from the Polar API (POLAR_API_TOKEN, POLAR_ORG_ID) instead of a file')
+    parser.add_argument('--api-url', default=os.environ.get('POLAR_API_URL'),
+                        help='Polar API base URL for --fetch (default: $POLAR_API_URL or https://api.polar.sh)')
+    parser.add_argument('--concurrency', type=int, default=8, metavar='N',
+                        help='concurrent page requests for --fetch (default: 8)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='analyze name groups on N processes (default: 1)')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='SQLite score cache; reruns only re-score new or modified products')
+    parser.add_argument('--similar', action='store_true',
+                        help='also group near-duplicate names (MinHash/LSH) instead of exact names only')
+    parser.add_argument('--similarity-threshold', type=float, default=SIMILARITY_THRESHOLD, metavar='J',
+                        help=f'Jaccard similarity for --similar, 0-1 (default: {SIMILARITY_THRESHOLD})')
+    parser.add_argument('--image-clusters', metavar='PATH',
+                        help='also group products that share an image (clusters JSON from image_index.py)')
+    parser.add_argument('--spill', action='store_true',
+                        help='group products on disk (SQLite) instead of in memory, for catalogs larger than RAM')
+    parser.add_argument('--spill-dir', metavar='DIR',
+                        help='directory for the --spill database (default: the system temp directory)')
+    parser.add_argument('--output-format', choices=['text', 'ndjson', 'csv', 'parquet'], default='text',
+                        help='report format; ndjson/csv/parquet are written group by group (default: text)')
+    parser.add_argument('--output', '-o', metavar='PATH',
+                        help='write the report to PATH instead of stdout')
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if not 0 < args.similarity_threshold <= 1:
+        parser.error('--similarity-threshold must be between 0 and 1')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.fetch and args.products:
+        parser.error('--fetch does not take a products file')
+    if args.workers > 1 and (args.stream or args.fetch or args.spill):
+        parser.error('--workers cannot be combined with --stream, --fetch or --spill')
+    if args.workers > 1 and args.cache:
+        parser.error('--workers cannot be combined with --cache')
+    if args.products and (args.stream or args.spill or args.workers > 1) and is_snapshot(args.products):
+        parser.error('--stream, --spill and --workers read JSON dumps; open snapshots directly')
+    if args.image_clusters and args.spill:
+        parser.error('--image-clusters cannot be combined with --spill')
+    if args.output_format == 'parquet' and not args.output:
+        parser.error('--output-format parquet needs --output PATH')
+    return args
+
+def display_recommendations(recommendations, out=None):
+    """Display formatted recommendations
+    
+    The report is built in memory and written to out (default: stdout) in a
+    single write instead of one print per line.
+    """
+    
+    lines = []
+    emit = lines.append
+    
+    emit('=' * 100)
+    emit('PRODUCT CONSOLIDATION RECOMMENDATIONS'.center(100))
+    emit('=' * 100)
+    emit('')
     
     # Products to keep as-is
     if recommendations['keep']:
-        print(f"✅ KEEP AS-IS ({len(recommendations['keep'])} products):")
+        emit(f"✅ KEEP AS-IS ({len(recommendations['keep'])} products):")
         for item in sorted(recommendations['keep'], key=lambda x: x['name']):
-            print(f"   • {item['name']:<45} Score: {item['score']:>3} | {item['price']:<20} | {', '.join(item['reasons'])}")
-        print()
+            emit(f"   • {item['name']:<45} Score: {item['score']:>3} | {format_price(item['price']):<20} | {', '.join(item['reasons'])}")
+            if item.get('similar_names'):
+                emit(f"     ↳ similar names: {', '.join(item['similar_names'])}")
+        emit('')
     
     # Products to consolidate
     if recommendations['consolidate']:
-        print(f"🔄 CONSOLIDATE ({len(recommendations['consolidate'])} products):")
-        print("   (Keep best variant, archive others, add missing prices to kept product)")
-        print()
+        emit(f"🔄 CONSOLIDATE ({len(recommendations['consolidate'])} products):")
+        emit("   (Keep best variant, archive others, add missing prices to kept product)")
+        emit('')
         for item in sorted(recommendations['consolidate'], key=lambda x: x['name']):
-            print(f"   📦 {item['name']}:")
-            print(f"      ✅ KEEP: {item['keep']['id'][:8]}... (Score: {item['keep_score']})")
-            print(f"         Reasons: {', '.join(item['keep_reasons'])}")
-            print(f"         Current prices: {', '.join(item['current_prices']) or 'none'}")
-            print(f"         Available prices to add: {', '.join([p for p in item['all_prices'] if p not in item['current_prices']])}")
-            print(f"      🗑️  ARCHIVE ({len(item['archive'])} variants):")
+            emit(f"   📦 {item['name']}:")
+            emit(f"      ✅ KEEP: {item['keep'].id[:8]}... (Score: {item['keep_score']})")
+            if item.get('similar_names'):
+                emit(f"         Similar names: {', '.join(item['similar_names'])}")
+            emit(f"         Reasons: {', '.join(item['keep_reasons'])}")
+            current = item['current_prices']
+            emit(f"         Current prices: {', '.join(map(format_price, current)) or 'none'}")
+            emit(f"         Available prices to add: {', '.join([format_price(p) for p in item['all_prices'] if p not in current])}")
+            emit(f"      🗑️  ARCHIVE ({len(item['archive'])} variants):")
             for p in item['archive']:
-                price = format_price(p.get('prices', [{}])[0])
-                print(f"         • {p['id'][:8]}... | {price}")
-            print()
+                price = format_price(p.first_price)
+                emit(f"         • {p.id[:8]}... | {price}")
+            emit('')
     
     # Products to archive
     if recommendations['archive']:
-        print(f"🗑️  ARCHIVE DUPLICATES ({len(recommendations['archive'])} products):")
-        for product in sorted(recommendations['archive'], key=lambda x: x['name']):
-            price = format_price(product.get('prices', [{}])[0])
-            print(f"   • {product['name']:<45} | {price}")
-        print()
+        emit(f"🗑️  ARCHIVE DUPLICATES ({len(recommendations['archive'])} products):")
+        for product in sorted(recommendations['archive'], key=lambda x: x.name):
+            price = format_price(product.first_price)
+            emit(f"   • {product.name:<45} | {price}")
+        emit('')
     
     # Summary
-    print('=' * 100)
-    print('SUMMARY:')
-    print(f"   Products to keep: {len(recommendations['keep'])}")
-    print(f"   Products to consolidate: {len(recommendations['consolidate'])}")
-    print(f"   Products to archive: {len(recommendations['archive'])}")
+    emit('=' * 100)
+    emit('SUMMARY:')
+    emit(f"   Products to keep: {len(recommendations['keep'])}")
+    emit(f"   Products to consolidate: {len(recommendations['consolidate'])}")
+    emit(f"   Products to archive: {len(recommendations['archive'])}")
     total_active = len(recommendations['keep']) + len(recommendations['consolidate'])
     reduction = len(recommendations['archive']) + len(recommendations['consolidate'])
-    print(f"   Total active products after consolidation: {total_active}")
-    print(f"   Reduction: {reduction} products → {len(recommendations['consolidate'])} products")
-    print('=' * 100)
-    print()
-    
-    print('💡 NEXT STEPS:')
-    print('   1. Review the recommendations above')
-    print('   2. For products marked "CONSOLIDATE":')
-    print('      - Keep the recommended product')
-    print('      - Add missing prices to that product (FREE or paid)')
-    print('      - Archive the duplicate variants')
-    print('   3. Archive all products in the "ARCHIVE DUPLICATES" section')
-    print('   4. Contact Polar support to permanently delete archived products if needed')
-    print()
+    emit(f"   Total active products after consolidation: {total_active}")
+    emit(f"   Reduction: {reduction} products → {len(recommendations['consolidate'])} products")
+    emit('=' * 100)
+    emit('')
+    
+    emit('💡 NEXT STEPS:')
+    emit('   1. Review the recommendations above')
+    emit('   2. For products marked "CONSOLIDATE":')
+    emit('      - Keep the recommended product')
+    emit('      - Add missing prices to that product (FREE or paid)')
+    emit('      - Archive the duplicate variants')
+    emit('   3. Archive all products in the "ARCHIVE DUPLICATES" section')
+    emit('   4. Contact Polar support to permanently delete archived products if needed')
+    emit('')
+    
+    (out or sys.stdout).write('\n'.join(lines) + '\n')
 
 if __name__ == '__main__':
+    args = parse_args()
+    profiler = start_profiling(args, 'analyze-product-duplicates.py')
+    report_out = sys.stdout
+    if args.output_format != 'text' and not args.output:
+        # stdout carries the machine-readable report; progress goes to stderr
+        sys.stdout = sys.stderr
+    
     print("""
     ╔════════════════════════════════════════════════════════════════╗
     ║     Polar Product Consolidation Analysis                      ║
     ╚════════════════════════════════════════════════════════════════╝
     """)
     
-    print("⚠️  This script analyzes products but doesn't make changes.")
-    print("   Use the Polar MCP tool to fetch products, then run this analysis.\n")
-    
-    # For now, we'll need to fetch products via MCP and pass them here
-    # Or we can create a version that uses the MCP tool directly
-    print("To use this script:")
-    print("1. Fetch products using Polar MCP: polar_products_list")
-    print("2. Save the JSON response")
-    print("3. Pass it to this script or modify it to use MCP directly")
-    print()
-    
-    # Example: if products were passed as JSON
-    if len(sys.argv) > 1:
-        with open(sys.argv[1], 'r') as f:
-            products_data = json.load(f)
-        recommendations = analyze_products(products_data)
-        display_recommendations(recommendations)
+    print("⚠️  This script analyzes products but doesn't make changes.\n")
+    
+    if not (args.fetch or args.products):
+        print("To use this script, either:")
+        print("1. Fetch products directly: POLAR_API_TOKEN=xxx POLAR_ORG_ID=xxx python3 scripts/analyze-product-duplicates.py --fetch")
+        print("2. Or pass a saved polar_products_list response: python3 scripts/analyze-product-duplicates.py <products.json>")
+        sys.exit(0)
+    
+    similarity = args.similarity_threshold if args.similar else None
+    image_clusters = None
+    if args.image_clusters:
+        from image_index import load_image_clusters
+        image_clusters = load_image_clusters(args.image_clusters)
+        print(f"🖼️  Loaded image clusters for {len(image_clusters)} products from {args.image_clusters}")
+    if args.output:
+        if args.output_format == 'parquet':
+            report_out = open(args.output, 'wb')
+        else:
+            report_out = open(args.output, 'w', newline='', encoding='utf-8')
+    writer = None
+    if args.output_format != 'text':
+        from recommendation_writers import open_writer
+        try:
+            writer = open_writer(args.output_format, report_out)
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+    
+    cache = ScoreCache(args.cache) if args.cache else None
+    if args.fetch:
+        try:
+            from polar_fetch import POLAR_API_URL, iter_polar_products, mask_token
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        
+        token = os.environ.get('POLAR_API_TOKEN')
+        organization_id = os.environ.get('POLAR_ORG_ID')
+        if not token:
+            print("❌ Error: Missing required environment variables: POLAR_API_TOKEN")
+            print("\nUsage: POLAR_API_TOKEN=xxx POLAR_ORG_ID=xxx python3 scripts/analyze-product-duplicates.py --fetch")
+            sys.exit(1)
+        api_url = args.api_url or POLAR_API_URL
+        print(f"🔑 POLAR_API_TOKEN: {mask_token(token)}")
+        print(f"🌐 Fetching products from {api_url} ({args.concurrency} concurrent requests)...")
+        
+        products = iter_polar_products(token, organization_id, api_url=api_url, concurrency=args.concurrency)
+    elif args.stream or args.spill:
+        products = iter_catalog_items(args.products, args.format)
+    
+    if args.spill:
+        with phase('analyze'):
+            recommendations = analyze_spilled_products(products, similarity, cache, writer, args.spill_dir)
+    elif args.fetch or args.stream:
+        with phase('analyze'):
+            recommendations = analyze_product_stream(products, similarity, cache, writer, image_clusters)
+    elif is_snapshot(args.products):
+        with phase('load'):
+            snapshot = CatalogSnapshot(args.products)
+        with snapshot, phase('analyze'):
+            recommendations = analyze_products(snapshot, similarity, cache, writer, image_clusters)
     else:
-        print("Run with: python3 scripts/analyze-product-duplicates.py <products.json>")
-        print("Or modify the script to fetch products via MCP directly")
-
-
-
-
-
+        with phase('load'):
+            with open(args.products, 'r') as f:
+                products_data = json.load(f)
+        with phase('analyze'):
+            if args.workers > 1:
+                recommendations = analyze_products_parallel(products_data, args.workers, similarity, writer, image_clusters)
+            else:
+                recommendations = analyze_products(products_data, similarity, cache, writer, image_clusters)
+    
+    if cache is not None:
+        cache.close()
+        stats = cache.stats
+        print(f"💾 Cache: {stats['scored']} scored, {stats['cached']} reused, "
+              f"{stats['groups_recomputed']} groups recomputed, {stats['groups_cached']} reused\n")
+    
+    if writer is not None:
+        with phase('write'):
+            writer.close()
+        counts = writer.counts
+        print(f"✓ Wrote {args.output_format} report to {args.output or 'stdout'}: "
+              f"{counts['keep']} keep, {counts['consolidate']} consolidate, {counts['archive']} archive")
+    else:
+        with phase('display'):
+            display_recommendations(recommendations, report_out)
+    if args.output:
+        report_out.close()
+    finish_profiling(profiler, args)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Polar product scripts on seeded synthetic catalogs.
+
+Measures each stage (JSON load, score_product, batch scoring,
+analyze_products, display_recommendations, format_products_summary) at
+several catalog sizes and reports wall time, CPU time, peak RSS and products
+per second. Each stage runs in a forked child process so its peak memory is
+measured on its own. Runs offline; catalogs come from synthetic_catalog.py.
+
+Usage:
+    python3 scripts/benchmark-product-analysis.py
+    python3 scripts/benchmark-product-analysis.py --sizes 1k,100k --output bench.json
+    python3 scripts/benchmark-product-analysis.py --sizes 100k --compare bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from script_loader import load_script
+from synthetic_catalog import generate_catalog, parse_count
+
+STAGES = [
+    'json_load',
+    'score_product',
+    'score_products',
+    'analyze_products',
+    'display_recommendations',
+    'format_products_summary',
+]
+DEFAULT_SIZES = '1k,100k,1M'
+# Wall-time change (in percent) reported as a regression by --compare
+REGRESSION_THRESHOLD = 10.0
+
+
+def _rss_kb(field):
+    """VmRSS/VmHWM of this process in KB (Linux), or None elsewhere"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _prepare(stage, catalog, raw):
+    """Inputs for a stage, built before timing starts"""
+    analyzer = load_script('analyze-product-duplicates.py')
+    if stage == 'display_recommendations':
+        with contextlib.redirect_stdout(io.StringIO()):
+            return analyzer.analyze_products(catalog)
+    return None
+
+
+def _run_stage(stage, catalog, raw, prepared):
+    analyzer = load_script('analyze-product-duplicates.py')
+    formatter = load_script('format-polar-products.py')
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        if stage == 'json_load':
+            json.loads(raw)
+        elif stage == 'score_product':
+            for product in catalog['items']:
+                analyzer.score_product(product)
+        elif stage == 'score_products':
+            analyzer.score_products(catalog['items'])
+        elif stage == 'analyze_products':
+            analyzer.analyze_products(catalog)
+        elif stage == 'display_recommendations':
+            analyzer.display_recommendations(prepared)
+        elif stage == 'format_products_summary':
+            formatter.format_products_summary(catalog)
+    return len(sink.getvalue())
+
+
+def _stage_child(conn, stage, catalog, raw):
+    prepared = _prepare(stage, catalog, raw)
+    rss_start = _rss_kb('VmRSS')
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    output_bytes = _run_stage(stage, catalog, raw, prepared)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    peak = _rss_kb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak //= 1024
+    conn.send({
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'peak_rss_mb': peak / 1024,
+        'rss_delta_mb': (peak - rss_start) / 1024 if rss_start is not None else None,
+        'output_bytes': output_bytes,
+    })
+    conn.close()
+
+
+def measure(stage, catalog, raw, repeat):
+    """Run one stage repeat times in forked children; keep the fastest run"""
+    context = multiprocessing.get_context('fork')
+    best = None
+    for _ in range(repeat):
+        parent, child = context.Pipe(duplex=False)
+        process = context.Process(target=_stage_child, args=(child, stage, catalog, raw))
+        process.start()
+        child.close()
+        result = parent.recv()
+        process.join()
+        if best is None or result['wall_s'] < best['wall_s']:
+            best = result
+    count = len(catalog['items'])
+    best['products_per_s'] = count / best['wall_s'] if best['wall_s'] else None
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, stages, seed, duplicate_ratio, free_ratio, repeat):
+    # Import once here so forked children do not pay (or time) the import
+    load_script('analyze-product-duplicates.py')
+    load_script('format-polar-products.py')
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'duplicate_ratio': duplicate_ratio,
+            'free_ratio': free_ratio,
+            'repeat': repeat,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        print(f"\n📦 Generating {size:,} products (seed {seed})...")
+        catalog = generate_catalog(size, seed=seed, duplicate_ratio=duplicate_ratio,
+                                   free_ratio=free_ratio, currencies=('usd', 'eur'))
+        raw = json.dumps(catalog) if 'json_load' in stages else None
+        results = report['results'][str(size)] = {}
+        for stage in stages:
+            result = results[stage] = measure(stage, catalog, raw, repeat)
+            print(f"   {stage:<26} {result['wall_s']:>9.3f}s wall {result['cpu_s']:>9.3f}s cpu "
+                  f"{result['peak_rss_mb']:>9.1f} MB peak {result['products_per_s']:>13,.0f} products/s")
+        del catalog, raw
+    return report
+
+
+def compare(report, baseline):
+    """Print wall-time changes against a baseline report; return regressions"""
+    regressions = []
+    print(f"\n📊 Compared with baseline {baseline['meta'].get('commit') or ''} ({baseline['meta'].get('date', '?')}):")
+    for size, stages in report['results'].items():
+        for stage, result in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if not base:
+                continue
+            change = (result['wall_s'] - base['wall_s']) / base['wall_s'] * 100 if base['wall_s'] else 0.0
+            flag = '⚠️ ' if change > REGRESSION_THRESHOLD else '  '
+            print(f" {flag}{int(size):>9,} {stage:<26} {base['wall_s']:>9.3f}s → {result['wall_s']:>9.3f}s ({change:+.1f}%)")
+            if change > REGRESSION_THRESHOLD:
+                regressions.append((size, stage, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Polar product analysis scripts.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'catalog sizes (default: {DEFAULT_SIZES})')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5)
+    parser.add_argument('--free-ratio', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage; the fastest is kept')
+    parser.add_argument('--output', help='write the report as JSON (use as a baseline later)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against a saved report')
+    args = parser.parse_args()
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print("Error: the benchmark needs the 'fork' start method (Linux/macOS).")
+        sys.exit(1)
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [parse_count(s) for s in args.sizes.split(',') if s.strip()]
+
+    report = run_benchmarks(sizes, stages, args.seed, args.duplicate_ratio, args.free_ratio, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
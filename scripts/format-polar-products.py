@@ -1,83 +1,126 @@
 #!/usr/bin/env python3
 """
 Format Polar products list into a readable table
+
+Usage:
+    python3 scripts/format-polar-products.py products.json
+    python3 scripts/format-polar-products.py --spill history.ndjson
+    python3 scripts/format-polar-products.py catalog.snap
+    python3 scripts/format-polar-products.py --profile profile.json products.json
 """
 
-def format_price(price_obj):
-    """Format price object into readable string"""
-    if not price_obj:
-        return "No price"
-    
-    amount_type = price_obj.get("amount_type", "")
-    if amount_type == "free":
-        return "FREE"
-    elif amount_type == "fixed":
-        amount = price_obj.get("price_amount", 0) / 100  # Convert cents to dollars
-        currency = price_obj.get("price_currency", "usd").upper()
-        return f"${amount:.2f} {currency}"
-    else:
-        return amount_type
+import argparse
+import json
+
+from phase_profiler import add_profile_arguments, finish_profiling, phase, start_profiling
+from polar_catalog import format_price, iter_catalog_items, parse_products
+from polar_snapshot import CatalogSnapshot, is_snapshot
+from product_spill import ProductSpill
+
+# Products parsed together when spilling to disk
+SPILL_PARSE_BATCH = 10000
 
 def format_products_summary(products_data):
-    """Format products into a summary table"""
+    """Format products into a summary table
+    
+    products_data is a polar_products_list response or a CatalogSnapshot.
+    """
     print("=" * 110)
     print("ACTIVE PRODUCTS IN POLAR".center(110))
     print("=" * 110)
     
-    total_count = products_data.get("pagination", {}).get("total_count", 0)
-    products = products_data.get("items", [])
+    with phase('parse'):
+        if isinstance(products_data, CatalogSnapshot):
+            total_count = products_data.total_count
+            products = products_data.records()
+        else:
+            total_count = products_data.get("pagination", {}).get("total_count", 0)
+            products = parse_products(products_data.get("items", []))
     
     print(f"\nTotal Active Products: {total_count}")
     print(f"Products in this response: {len(products)}")
     
     # Group by product name
-    product_groups = {}
-    for product in products:
-        name = product.get("name", "Unnamed")
-        product_id = product.get("id", "")
-        is_recurring = product.get("is_recurring", False)
+    with phase('group'):
+        product_groups = {}
+        for product in products:
+            name = product.name if product.name is not None else "Unnamed"
+            
+            price_str = format_price(product.active)
+            product_type = "Recurring" if product.is_recurring else "One-time"
+            
+            if name not in product_groups:
+                product_groups[name] = {
+                    "variants": [],
+                    "prices": set(),
+                    "types": set()
+                }
+            
+            product_groups[name]["variants"].append(product)
+            product_groups[name]["prices"].add(price_str)
+            product_groups[name]["types"].add(product_type)
+    
+    # Sort by name
+    with phase('sort'):
+        rows = [
+            (name, len(info["variants"]), info["prices"], info["types"])
+            for name, info in sorted(product_groups.items())
+        ]
+    with phase('table'):
+        print_summary_table(len(product_groups), rows)
+
+def format_spilled_products_summary(products, total_count=None, spill_dir=None):
+    """format_products_summary for an iterable of products larger than memory
+    
+    Each product's name, active price and type are spilled to a temporary
+    SQLite table (see product_spill.py) and read back sorted by name one
+    group at a time, so the table is identical without holding the catalog.
+    total_count defaults to the number of products read.
+    """
+    with ProductSpill(spill_dir) as spill:
+        batch = []
         
-        # Get price info
-        prices = product.get("prices", [])
-        active_price = None
-        for price in prices:
-            if not price.get("is_archived", False):
-                active_price = price
-                break
+        def flush():
+            for product in parse_products(batch):
+                name = product.name if product.name is not None else "Unnamed"
+                product_type = "Recurring" if product.is_recurring else "One-time"
+                spill.add(name, (format_price(product.active), product_type))
+            batch.clear()
         
-        price_str = format_price(active_price)
-        product_type = "Recurring" if is_recurring else "One-time"
+        with phase('spill'):
+            for product in products:
+                batch.append(product)
+                if len(batch) >= SPILL_PARSE_BATCH:
+                    flush()
+            flush()
         
-        if name not in product_groups:
-            product_groups[name] = {
-                "variants": [],
-                "prices": set(),
-                "types": set()
-            }
+        print("=" * 110)
+        print("ACTIVE PRODUCTS IN POLAR".center(110))
+        print("=" * 110)
+        print(f"\nTotal Active Products: {len(spill) if total_count is None else total_count}")
+        print(f"Products in this response: {len(spill)}")
         
-        product_groups[name]["variants"].append({
-            "id": product_id,
-            "price": price_str,
-            "type": product_type
-        })
-        product_groups[name]["prices"].add(price_str)
-        product_groups[name]["types"].add(product_type)
-    
-    print(f"Unique Product Names: {len(product_groups)}")
+        rows = (
+            (name, len(variants), {price for price, _ in variants}, {kind for _, kind in variants})
+            for name, variants in spill.groups(order='name')
+        )
+        with phase('table'):
+            print_summary_table(spill.group_count(), rows)
+
+def print_summary_table(group_count, rows):
+    """Print the per-name table from (name, variant_count, prices, types) rows sorted by name"""
+    print(f"Unique Product Names: {group_count}")
     print("\n" + "=" * 110)
     print(f"{'Product Name':<50} {'Variants':<10} {'Prices':<30} {'Type':<15}")
     print("=" * 110)
     
-    # Sort by name
-    for name in sorted(product_groups.keys()):
-        info = product_groups[name]
-        variant_count = len(info["variants"])
-        prices = sorted(info["prices"])
+    for name, variant_count, prices, types in rows:
+        prices = sorted(prices)
         price_str = ", ".join(prices[:3])
         if len(prices) > 3:
             price_str += f" (+{len(prices)-3} more)"
         
-        types = ", ".join(sorted(info["types"]))
+        types = ", ".join(sorted(types))
         
         print(f"{name[:48]:<50} {variant_count:<10} {price_str[:28]:<30} {types[:13]:<15}")
     
@@ -86,12 +129,36 @@ def format_products_summary(products_data):
     print("Most products are Blender assets available as both FREE and paid versions.")
 
 if __name__ == "__main__":
-    # This would normally read from API response
-    # For now, it's a template
-    print("This script formats Polar product data.")
-    print("Use it with the product data from polar_products_list MCP tool.")
-
-
-
-
-
+    parser = argparse.ArgumentParser(description='Format a Polar products list into a summary table.')
+    parser.add_argument('products', nargs='?', help='polar_products_list JSON dump, NDJSON with --spill, or a snapshot')
+    parser.add_argument('--spill', action='store_true',
+                        help='group products on disk (SQLite) instead of in memory, for catalogs larger than RAM')
+    parser.add_argument('--spill-dir', metavar='DIR', help='directory for the --spill database')
+    parser.add_argument('--total-count', type=int,
+                        help='total product count to report with --spill (default: products read)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = start_profiling(args, 'format-polar-products.py')
+    
+    if args.products and is_snapshot(args.products):
+        with phase('load'):
+            snapshot = CatalogSnapshot(args.products)
+        with snapshot, phase('summary'):
+            format_products_summary(snapshot)
+    elif args.products and args.spill:
+        with phase('summary'):
+            format_spilled_products_summary(iter_catalog_items(args.products), args.total_count, args.spill_dir)
+    elif args.products:
+        with phase('load'):
+            with open(args.products) as f:
+                products_data = json.load(f)
+        with phase('summary'):
+            format_products_summary(products_data)
+    else:
+        # This would normally read from API response
+        # For now, it's a template
+        print("This script formats Polar product data.")
+        print("Use it with the product data from polar_products_list MCP tool,")
+        print("saved to a file: python3 scripts/format-polar-products.py products.json")
+    
+    finish_profiling(profiler, args)
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash index of product renders and media.
+
+Two "different" products that use the same or nearly the same icon or render
+are very likely duplicates, whatever their names say. This module computes
+64-bit perceptual hashes of images and finds images within a small Hamming
+distance of each other:
+
+- dhash: brightness gradients of a 9x8 thumbnail (fast, good for re-encodes
+  and resizes)
+- phash: signs of the low-frequency 8x8 DCT block of a 32x32 thumbnail
+  against their median (also robust to small edits and color shifts)
+
+Hashes are computed on a process pool and cached in SQLite by the sha256 of
+the file's bytes, which is also the checksum_sha256_hex Polar reports for
+uploaded media, so a cached product image is not even downloaded again.
+Neighbor queries go through a BK-tree, so a lookup only visits the part of
+the index that can be within the distance instead of every image.
+
+Image clusters (images linked by chains of near-identical hashes) are written
+as JSON for analyze-product-duplicates.py --image-clusters, which merges the
+name groups of products that share a cluster.
+
+Usage:
+    python3 scripts/image_index.py assets/renders
+    python3 scripts/image_index.py assets/renders --query new-icon.png
+    python3 scripts/image_index.py --catalog products.json --download --clusters-out image-clusters.json
+    python3 scripts/analyze-product-duplicates.py products.json --image-clusters image-clusters.json
+
+Needs Pillow (pip3 install pillow) to hash images; load_image_clusters does not.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import mimetypes
+import os
+import sqlite3
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from polar_catalog import iter_catalog_items
+
+HASH_KINDS = ('phash', 'dhash')
+# Largest Hamming distance (of 64 bits) still treated as the same image
+MAX_DISTANCE = 6
+# Images in one cluster at most (as SIMILARITY_MAX_CLUSTER for --similar)
+MAX_CLUSTER = 50
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.avif')
+CACHE_PATH = 'image-hashes.sqlite'
+MEDIA_DIR = 'product-media'
+CLUSTERS_VERSION = 1
+DOWNLOAD_CONCURRENCY = 8
+DOWNLOAD_TIMEOUT = 60
+_DCT_SIZE = 32
+_DCT_KEEP = 8
+# Grayscale level below which a pixel counts as content when cropping margins
+_MARGIN_WHITE = 245
+# Rows 0-7 of the 32-point DCT-II basis; only the low frequencies are kept
+_DCT_BASIS = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)]
+    for u in range(_DCT_KEEP)
+]
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Error: Pillow is not installed.", file=sys.stderr)
+        print("Install it with: pip3 install pillow", file=sys.stderr)
+        sys.exit(1)
+    return Image
+
+
+def _grayscale(image, size):
+    """image as an 8-bit grayscale thumbnail, transparency flattened onto white
+
+    The near-white margin is cropped first so a render hashes by the object,
+    not by how much empty canvas it was exported with; flattening before the
+    crop makes a transparent PNG and its JPEG copy crop the same way.
+    """
+    Image = _pillow()
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = image.convert('L')
+    bbox = image.point(lambda value: 255 if value < _MARGIN_WHITE else 0).getbbox()
+    if bbox:
+        image = image.crop(bbox)
+    return image.resize(size, Image.LANCZOS)
+
+
+def dhash(image):
+    """64-bit difference hash: is each pixel of a 9x8 thumbnail brighter than its right neighbor"""
+    pixels = _grayscale(image, (9, 8)).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def phash(image):
+    """64-bit DCT hash: low-frequency coefficients of a 32x32 thumbnail above their median"""
+    pixels = _grayscale(image, (_DCT_SIZE, _DCT_SIZE)).tobytes()
+    rows = [pixels[i:i + _DCT_SIZE] for i in range(0, len(pixels), _DCT_SIZE)]
+    # 2D DCT restricted to the 8x8 low-frequency block: B . X . B^T
+    partial = [[sum(b * v for b, v in zip(basis, row)) for basis in _DCT_BASIS] for row in rows]
+    coefficients = [
+        sum(basis[x] * partial[x][v] for x in range(_DCT_SIZE))
+        for basis in _DCT_BASIS for v in range(_DCT_KEEP)
+    ]
+    # The DC term only says how bright the image is; leave it out of the median
+    median = sorted(coefficients[1:])[(len(coefficients) - 1) // 2]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def hamming(first, second):
+    return bin(first ^ second).count('1')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_image_file(path):
+    """(width, height, dhash, phash) of an image file (runs in a worker process)"""
+    Image = _pillow()
+    with Image.open(path) as image:
+        image.load()
+        return image.width, image.height, dhash(image), phash(image)
+
+
+class HashCache:
+    """SQLite cache of image hashes keyed by the sha256 of the file's bytes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS image_hashes (
+            sha256 TEXT PRIMARY KEY,
+            width INTEGER,
+            height INTEGER,
+            dhash TEXT NOT NULL,
+            phash TEXT NOT NULL
+        );
+    """
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path=CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def lookup(self, digests):
+        """{sha256: (width, height, dhash, phash)} for the cached digests"""
+        found = {}
+        digests = list(digests)
+        for start in range(0, len(digests), self.LOOKUP_CHUNK):
+            chunk = digests[start:start + self.LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                f"SELECT sha256, width, height, dhash, phash FROM image_hashes WHERE sha256 IN ({placeholders})",
+                chunk,
+            ):
+                found[row[0]] = (row[1], row[2], int(row[3], 16), int(row[4], 16))
+        return found
+
+    def store(self, rows):
+        """Add (sha256, width, height, dhash, phash) rows"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?, ?)",
+            ((digest, width, height, f'{d:016x}', f'{p:016x}') for digest, width, height, d, p in rows),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance
+
+    Every child edge is labelled with its distance to the parent, so a query
+    for distance <= r only descends into edges labelled d - r .. d + r (d
+    being the query's distance to the node), by the triangle inequality.
+    Identical hashes share a node.
+    """
+
+    def __init__(self):
+        # node: [hash, items, {distance: child node}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value, max_distance):
+        """(distance, item) of every item within max_distance, closest first"""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class ImageIndex:
+    """Perceptual hashes of a set of images, with neighbor queries and clusters"""
+
+    def __init__(self, kind='phash'):
+        if kind not in HASH_KINDS:
+            raise ValueError(f"Unknown hash kind: {kind}")
+        self.kind = kind
+        # key -> {'sha256', 'width', 'height', 'dhash', 'phash', 'products'}
+        self.images = {}
+        self.tree = BKTree()
+
+    def add(self, key, record):
+        self.images[key] = record
+        self.tree.add(record[self.kind], key)
+
+    def neighbors(self, value, max_distance=MAX_DISTANCE):
+        """(distance, key) of indexed images within max_distance of a hash"""
+        return self.tree.query(value, max_distance)
+
+    def clusters(self, max_distance=MAX_DISTANCE, max_size=MAX_CLUSTER):
+        """Lists of keys of images within max_distance of each other
+
+        The first key (in sorted order) not yet in a cluster leads a new one,
+        and an image joins only if it is within max_distance of that leader
+        itself, closest first up to max_size images. Chains of images each
+        close to the next are therefore not merged end to end. Only clusters
+        of two or more images are returned, largest first.
+        """
+        clustered = set()
+        clusters = []
+        for leader in sorted(self.images):
+            if leader in clustered:
+                continue
+            clustered.add(leader)
+            members = [leader]
+            matches = self.tree.query(self.images[leader][self.kind], max_distance)
+            for _, other in sorted(matches):
+                if len(members) >= max_size:
+                    break
+                if other not in clustered:
+                    clustered.add(other)
+                    members.append(other)
+            if len(members) > 1:
+                clusters.append(sorted(members))
+        return sorted(clusters, key=lambda members: (-len(members), members[0]))
+
+
+def hash_files(paths, cache, workers=None, known=None):
+    """Hash records for image files, reusing and filling the cache
+
+    known optionally maps path -> sha256 already known (e.g. from Polar's
+    media checksums); those files are only read if the cache misses, and
+    need not exist otherwise. Returns ({path: record}, {path: error},
+    number of images hashed).
+    """
+    known = known or {}
+    digests = {}
+    errors = {}
+    for path in paths:
+        digest = known.get(path)
+        if digest is None:
+            if not os.path.exists(path):
+                errors[path] = 'file not found'
+                continue
+            digest = file_sha256(path)
+        digests[path] = digest
+    cached = cache.lookup(set(digests.values()))
+
+    path_for = {}
+    for path, digest in digests.items():
+        if digest not in cached and os.path.exists(path):
+            path_for.setdefault(digest, path)
+    for path, digest in digests.items():
+        if digest not in cached and digest not in path_for:
+            errors[path] = 'not downloaded'
+    missing = list(path_for)
+
+    computed = []
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(digest, pool.submit(hash_image_file, path_for[digest])) for digest in missing]
+            for digest, future in futures:
+                try:
+                    computed.append((digest, *future.result()))
+                except Exception as e:
+                    errors[path_for[digest]] = f'{type(e).__name__}: {e}'
+    else:
+        for digest in missing:
+            try:
+                computed.append((digest, *hash_image_file(path_for[digest])))
+            except Exception as e:
+                errors[path_for[digest]] = f'{type(e).__name__}: {e}'
+    cache.store(computed)
+    for digest, *values in computed:
+        cached[digest] = tuple(values)
+
+    records = {}
+    for path, digest in digests.items():
+        if digest in cached:
+            width, height, d, p = cached[digest]
+            records[path] = {'sha256': digest, 'width': width, 'height': height, 'dhash': d, 'phash': p}
+    return records, errors, len(computed)
+
+
+def catalog_media(items):
+    """(product id, product name, media dict) for every image media in a catalog"""
+    for product in items:
+        for media in product.get('medias') or ():
+            mime_type = media.get('mime_type') or ''
+            if media.get('id') and mime_type.startswith('image/'):
+                yield product.get('id'), product.get('name'), media
+
+
+def media_path(media_dir, media):
+    extension = mimetypes.guess_extension(media.get('mime_type') or '') or ''
+    return Path(media_dir) / f"{media['id']}{extension}"
+
+
+def download_media(media_list, media_dir, concurrency=DOWNLOAD_CONCURRENCY):
+    """Download public_url of every media not in media_dir yet; returns {media id: error}"""
+    os.makedirs(media_dir, exist_ok=True)
+    pending = [media for media in media_list
+               if media.get('public_url') and not media_path(media_dir, media).exists()]
+
+    def fetch(media):
+        path = media_path(media_dir, media)
+        with urllib.request.urlopen(media['public_url'], timeout=DOWNLOAD_TIMEOUT) as response:
+            data = response.read()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [(media, pool.submit(fetch, media)) for media in pending]
+        for media, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors[media['id']] = f'{type(e).__name__}: {e}'
+    return errors
+
+
+def write_clusters(path, index, clusters, max_distance):
+    """Write clusters as JSON for analyze-product-duplicates.py --image-clusters"""
+    payload = {
+        'version': CLUSTERS_VERSION,
+        'hash': index.kind,
+        'max_distance': max_distance,
+        'clusters': [
+            {
+                'images': members,
+                'product_ids': sorted({product_id for key in members
+                                       for product_id, _ in index.images[key]['products']}),
+            }
+            for members in clusters
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+        f.write('\n')
+
+
+def load_image_clusters(path):
+    """{product id: cluster number} from an image clusters file
+
+    Only clusters that contain products are kept; a product in several
+    clusters keeps the first.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('version') != CLUSTERS_VERSION:
+        raise ValueError(f"{path}: unsupported image clusters version {payload.get('version')!r}")
+    membership = {}
+    for number, cluster in enumerate(payload['clusters']):
+        for product_id in cluster.get('product_ids', ()):
+            membership.setdefault(product_id, number)
+    return membership
+
+
+def iter_image_files(paths):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for child in sorted(path.rglob('*')):
+                if child.suffix.lower() in IMAGE_EXTENSIONS and child.is_file():
+                    yield child
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find duplicate and near-duplicate product images by perceptual hash.')
+    parser.add_argument('paths', nargs='*', help='image files or directories (e.g. assets/renders)')
+    parser.add_argument('--catalog', metavar='PATH',
+                        help='products dump (JSON/NDJSON); index the images in each product\'s medias')
+    parser.add_argument('--media-dir', default=MEDIA_DIR, metavar='DIR',
+                        help=f'where product media are (or are downloaded to) (default: {MEDIA_DIR})')
+    parser.add_argument('--download', action='store_true',
+                        help='download product media not in --media-dir (and not cached) from their public_url')
+    parser.add_argument('--cache', default=CACHE_PATH, metavar='PATH',
+                        help=f'SQLite hash cache (default: {CACHE_PATH})')
+    parser.add_argument('--hash', choices=HASH_KINDS, default='phash', help='hash to compare (default: phash)')
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE, metavar='N',
+                        help=f'largest Hamming distance (0-64) counted as the same image (default: {MAX_DISTANCE})')
+    parser.add_argument('--workers', type=int, metavar='N', help='hashing processes (default: one per CPU)')
+    parser.add_argument('--query', action='append', default=[], metavar='IMAGE',
+                        help='list the indexed images near IMAGE instead of clustering (repeatable)')
+    parser.add_argument('--clusters-out', metavar='PATH',
+                        help='write the clusters as JSON for analyze-product-duplicates.py --image-clusters')
+    args = parser.parse_args()
+    if not (args.paths or args.catalog):
+        parser.error('pass image paths and/or --catalog')
+    if not 0 <= args.max_distance <= 64:
+        parser.error('--max-distance must be between 0 and 64')
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    start = time.perf_counter()
+    cache = HashCache(args.cache)
+    # path -> [(product id, product name)]
+    products = {str(path): [] for path in iter_image_files(args.paths)}
+    known = {}
+    if args.catalog:
+        media = list(catalog_media(iter_catalog_items(args.catalog)))
+        print(f"🛍️  {len(media)} image media in {args.catalog}")
+        for product_id, name, m in media:
+            path = str(media_path(args.media_dir, m))
+            products.setdefault(path, []).append((product_id, name))
+            if m.get('checksum_sha256_hex'):
+                known[path] = m['checksum_sha256_hex']
+        if args.download:
+            # Media whose checksum is cached are never downloaded
+            cached = cache.lookup(set(known.values()))
+            to_fetch = list({m['id']: m for _, _, m in media
+                             if m.get('checksum_sha256_hex') not in cached}.values())
+            print(f"📥 Downloading up to {len(to_fetch)} product media to {args.media_dir}...")
+            for media_id, error in download_media(to_fetch, args.media_dir).items():
+                print(f"   ⚠️  {media_id}: {error}")
+
+    records, errors, hashed = hash_files(list(products), cache, args.workers, known)
+    index = ImageIndex(args.hash)
+    for path, record in records.items():
+        index.add(path, dict(record, products=products[path]))
+    print(f"🔎 Indexed {len(records)} images ({hashed} hashed, {len(records) - hashed} cached) "
+          f"in {time.perf_counter() - start:.1f}s")
+    for path, error in sorted(errors.items()):
+        print(f"   ✗ {path}: {error}")
+
+    if args.query:
+        for query in args.query:
+            width, height, d, p = hash_image_file(query)
+            matches = index.neighbors(p if args.hash == 'phash' else d, args.max_distance)
+            print(f"\n{query}: {len(matches)} images within distance {args.max_distance}")
+            for distance, key in matches:
+                names = ', '.join(sorted({name for _, name in index.images[key]['products'] if name}))
+                print(f"   {distance:>2}  {key}" + (f"  ({names})" if names else ''))
+        cache.close()
+        return
+
+    clusters = index.clusters(args.max_distance)
+    print(f"\n🖼️  Clusters of near-identical images (distance <= {args.max_distance}): {len(clusters)}")
+    for members in clusters:
+        names = sorted({name for key in members for _, name in index.images[key]['products'] if name})
+        print(f"   • {len(members)} images" + (f", products: {', '.join(names)}" if names else ''))
+        for key in members:
+            print(f"       {key}")
+    if args.clusters_out:
+        write_clusters(args.clusters_out, index, clusters, args.max_distance)
+        print(f"\n✓ Wrote clusters to {args.clusters_out}")
+    cache.close()
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Prebuilt, content-addressed download bundles for the product libraries.
+
+api/v1/library/download.js builds the library zip on request, fetching every
+file through the GitHub contents API and keeping the result only in memory.
+This packages a local checkout ahead of time instead, for the version in
+its catalog.json (see library_catalog.py), so the endpoint only has to hand
+out files:
+
+    <out-dir>/<library id>/
+        bundles.json                    index of everything below
+        library-<version>.zip           the whole library
+        products/<product hash>.zip     one archive per product
+        delta-<from>-<to>.zip           changed/added files since <from>,
+                                        plus DELTA.json listing removed ones
+        manifests/<version>.json        file hashes of each packaged version
+        blobs/                          the artifact cache
+
+Every distinct file (by sha256) is compressed once, on a process pool,
+into the blob store: raw deflate at level 9, or stored as-is for formats
+that are already compressed. Archives are then assembled by copying the
+pre-compressed blobs into zip entries, so identical files across products,
+bundles and versions never get compressed twice, and a product's archive is
+only built when its hash is new. Entries carry a fixed 1980-01-01 timestamp,
+so the same content always gives the same archive bytes.
+
+Delta bundles let a client on an older catalog version fetch only what
+changed: by default from the previously packaged version, or from every
+--delta-from version with a saved manifest.
+
+Usage:
+    python3 scripts/library_catalog.py && python3 scripts/library_bundles.py
+    python3 scripts/library_bundles.py --library no3d-tools --delta-from 6 --delta-from 7
+    python3 scripts/library_bundles.py --library-dir no3d-tools=../no3d-tools-library --out-dir dist/bundles
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+from library_catalog import (
+    CATALOG_FILE,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CONFIG,
+    REPO_DIR,
+    catalog_from_files,
+    hash_library,
+    library_dir,
+    load_catalog,
+    load_libraries,
+    parse_library_dir,
+    save_json,
+    select_libraries,
+)
+
+DEFAULT_OUT_DIR = REPO_DIR / 'build' / 'library-bundles'
+INDEX_FILE = 'bundles.json'
+BLOB_INDEX_FILE = 'index.json'
+DELTA_FILE = 'DELTA.json'
+COMPRESS_LEVEL = 9
+# Already-compressed formats are stored, not deflated again
+STORED_EXTENSIONS = frozenset((
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.mp4', '.mov', '.webm',
+    '.zip', '.gz', '.bz2', '.xz', '.7z', '.zst', '.glb', '.woff2',
+))
+# Deflate output must save at least this much, or the file is stored
+MIN_SAVING = 0.03
+ZIP_STORED, ZIP_DEFLATED = 0, 8
+ZIP_UTF8_FLAG = 0x800
+# DOS time/date of 1980-01-01 00:00:00, the zip epoch
+ZIP_TIME, ZIP_DATE = 0, (1 << 5) | 1
+# Values at or above these limits go in zip64 records, with the marker in the 32/16-bit field
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP32_LIMIT = ZIP64_MARKER
+ZIP16_LIMIT = 0xFFFF
+COPY_CHUNK = 1 << 20
+
+
+def blob_path(blob_dir, sha256):
+    return Path(blob_dir) / sha256[:2] / sha256
+
+
+def compress_blob(job):
+    """Compress one source file into the blob store (runs in a worker process)
+
+    Returns (sha256, [method, crc32, size, compressed size]). The digest is
+    checked while reading, so a file that changed since it was hashed is an
+    error instead of a wrong blob.
+    """
+    sha256, source, target = job
+    digest = hashlib.sha256()
+    crc = size = 0
+    store = Path(source).suffix.lower() in STORED_EXTENSIONS
+    compressor = None if store else zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f'{target}.tmp'
+    with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(COPY_CHUNK), b''):
+            digest.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            dst.write(chunk if compressor is None else compressor.compress(chunk))
+        if compressor is not None:
+            dst.write(compressor.flush())
+    if digest.hexdigest() != sha256:
+        os.remove(tmp_path)
+        raise ValueError(f'{source} changed while packaging')
+    compressed = os.path.getsize(tmp_path)
+    if compressor is not None and compressed > size * (1 - MIN_SAVING):
+        # Not worth inflating on the client: keep the plain bytes
+        shutil.copyfile(source, tmp_path)
+        store, compressed = True, size
+    os.replace(tmp_path, target)
+    return sha256, [ZIP_STORED if store else ZIP_DEFLATED, crc, size, compressed]
+
+
+class BundleWriter:
+    """Zip archive assembled from pre-compressed blobs, without recompressing
+
+    Zip64 records are added only when a size, offset or entry count needs
+    them. The archive is written to a temporary file and moved into place
+    by close().
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        os.makedirs(self.path.parent, exist_ok=True)
+        self.tmp_path = f'{path}.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.entries = []
+
+    def _write_entry(self, name, method, crc, size, compressed, write_data):
+        offset = self.file.tell()
+        name_bytes = name.encode('utf-8')
+        zip64 = size >= ZIP32_LIMIT or compressed >= ZIP32_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, size, compressed) if zip64 else b''
+        self.file.write(struct.pack(
+            '<4sHHHHHIIIHH', b'PK\x03\x04', 45 if zip64 else 20, ZIP_UTF8_FLAG, method, ZIP_TIME, ZIP_DATE,
+            crc, ZIP64_MARKER if zip64 else compressed, ZIP64_MARKER if zip64 else size,
+            len(name_bytes), len(extra),
+        ))
+        self.file.write(name_bytes)
+        self.file.write(extra)
+        write_data()
+        self.entries.append((name_bytes, method, crc, size, compressed, offset))
+
+    def add_blob(self, name, path, blob):
+        """Add the blob at path (blob = [method, crc32, size, compressed size]) as name"""
+        method, crc, size, compressed = blob
+
+        def copy():
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.file, COPY_CHUNK)
+
+        self._write_entry(name, method, crc, size, compressed, copy)
+
+    def add_bytes(self, name, data):
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        self._write_entry(name, ZIP_DEFLATED, zlib.crc32(data), len(data), len(payload),
+                          lambda: self.file.write(payload))
+
+    def close(self):
+        def field(value, limit=ZIP32_LIMIT, marker=ZIP64_MARKER):
+            return marker if value >= limit else value
+
+        directory_offset = self.file.tell()
+        for name_bytes, method, crc, size, compressed, offset in self.entries:
+            # The zip64 extra field holds, in this order, the values too large for their field
+            zip64_fields = [value for value in (size, compressed, offset) if value >= ZIP32_LIMIT]
+            extra = struct.pack(f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b''
+            version = 45 if zip64_fields else 20
+            self.file.write(struct.pack(
+                '<4sHHHHHHIIIHHHHHII', b'PK\x01\x02', version, version, ZIP_UTF8_FLAG, method, ZIP_TIME, ZIP_DATE,
+                crc, field(compressed), field(size), len(name_bytes), len(extra), 0, 0, 0, 0, field(offset),
+            ))
+            self.file.write(name_bytes)
+            self.file.write(extra)
+        directory_end = self.file.tell()
+        directory_size = directory_end - directory_offset
+        count = len(self.entries)
+        if count >= ZIP16_LIMIT or directory_size >= ZIP32_LIMIT or directory_offset >= ZIP32_LIMIT:
+            self.file.write(struct.pack('<4sQHHIIQQQQ', b'PK\x06\x06', 44, 45, 45, 0, 0,
+                                        count, count, directory_size, directory_offset))
+            self.file.write(struct.pack('<4sIQI', b'PK\x06\x07', 0, directory_end, 1))
+        entries = field(count, ZIP16_LIMIT, 0xFFFF)
+        self.file.write(struct.pack('<4sHHHHIIH', b'PK\x05\x06', 0, 0, entries, entries,
+                                    field(directory_size), field(directory_offset), 0))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path.stat().st_size
+
+
+def write_bundle(job):
+    """Assemble one archive from blobs (runs in a worker process)
+
+    job is (path, [(entry name, blob path, blob)], extra {name: bytes});
+    returns the archive size.
+    """
+    path, files, extra = job
+    writer = BundleWriter(path)
+    for name, data in extra.items():
+        writer.add_bytes(name, data)
+    for name, source, blob in files:
+        writer.add_blob(name, source, blob)
+    return writer.close()
+
+
+def run_jobs(function, jobs, workers):
+    """{key: function(job)} for {key: job}, on a process pool when it pays off"""
+    results = {}
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        # Imported here: startup (and single-worker runs) do not pay for it
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(function, job): key for key, job in jobs.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    else:
+        for key, job in jobs.items():
+            results[key] = function(job)
+    return results
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def package_library(root, file_entries, catalog, out_dir, delta_from=None, workers=None):
+    """Bring out_dir up to date with the library version in catalog
+
+    file_entries comes from library_catalog.hash_library. delta_from lists
+    the versions to build deltas from (default: the previously packaged
+    version, or the same deltas again when the content has not changed).
+    Returns (index, stats).
+    """
+    out_dir = Path(out_dir)
+    blob_dir = out_dir / 'blobs'
+    blob_index_path = blob_dir / BLOB_INDEX_FILE
+    blobs = load_json(blob_index_path, {})
+    previous_index = load_json(out_dir / INDEX_FILE, {})
+    version = catalog['version']
+    # Archives named by version are reused only if that version still has the same content
+    same_content = previous_index.get('root_hash') == catalog['root_hash']
+    stats = {'files': 0, 'bytes': 0, 'unique_files': 0, 'unique_bytes': 0,
+             'compressed': 0, 'archives': 0, 'archive_bytes': 0}
+
+    # 1. Compress every distinct file not in the blob store yet
+    sources = {}
+    for folder, entries in file_entries.items():
+        for path, (size, _, sha256) in entries.items():
+            stats['files'] += 1
+            stats['bytes'] += size
+            sources.setdefault(sha256, (os.path.join(root, folder, path), size))
+    stats['unique_files'] = len(sources)
+    stats['unique_bytes'] = sum(size for _, size in sources.values())
+    jobs = {
+        sha256: (sha256, source, str(blob_path(blob_dir, sha256)))
+        for sha256, (source, _) in sources.items()
+        if sha256 not in blobs or not blob_path(blob_dir, sha256).exists()
+    }
+    for sha256, blob in run_jobs(compress_blob, jobs, workers).values():
+        blobs[sha256] = blob
+    stats['compressed'] = len(jobs)
+    save_json(blob_index_path, blobs)
+
+    def entries_for(folder, paths):
+        return [(f'{folder}/{path}', str(blob_path(blob_dir, sha256)), blobs[sha256])
+                for path, sha256 in paths]
+
+    manifest = {
+        'version': version,
+        'root_hash': catalog['root_hash'],
+        'products': {
+            folder: {path: entries[path][2] for path in sorted(entries)}
+            for folder, entries in file_entries.items()
+        },
+    }
+
+    # 2. Archives: products by hash, the whole library by version, deltas by version pair
+    archive_jobs = {}
+    products = {}
+    for folder, files in manifest['products'].items():
+        product_hash = catalog['products'][folder]['hash']
+        path = out_dir / 'products' / f'{product_hash}.zip'
+        products[folder] = {'hash': product_hash, 'file': f'products/{product_hash}.zip'}
+        if not path.exists():
+            archive_jobs[products[folder]['file']] = (str(path), entries_for(folder, files.items()), {})
+    full_name = f'library-{version}.zip'
+    if not (same_content and (out_dir / full_name).exists()):
+        archive_jobs[full_name] = (str(out_dir / full_name), [
+            entry for folder, files in manifest['products'].items() for entry in entries_for(folder, files.items())
+        ], {})
+
+    if delta_from is None:
+        old_version = previous_index.get('version')
+        if same_content:
+            delta_from = [int(old_version) for old_version in previous_index.get('deltas') or {}]
+        else:
+            delta_from = [old_version] if isinstance(old_version, int) else []
+    deltas = {}
+    for old_version in sorted(set(delta_from) - {version}):
+        old = load_json(out_dir / 'manifests' / f'{old_version}.json', None)
+        if old is None:
+            print(f"   ⚠️  No manifest for version {old_version}, no delta from it")
+            continue
+        name = f'delta-{old_version}-{version}.zip'
+        deltas[str(old_version)] = {'file': name}
+        if same_content and (out_dir / name).exists():
+            continue
+        old_files = {f'{folder}/{path}': sha256 for folder, files in old['products'].items()
+                     for path, sha256 in files.items()}
+        changed = []
+        current = set()
+        for folder, files in manifest['products'].items():
+            for path, sha256 in files.items():
+                current.add(f'{folder}/{path}')
+                if old_files.get(f'{folder}/{path}') != sha256:
+                    changed.append((path, sha256, folder))
+        description = {
+            'from_version': old_version,
+            'to_version': version,
+            'from_root_hash': old['root_hash'],
+            'to_root_hash': catalog['root_hash'],
+            'removed': sorted(old_files.keys() - current),
+            'removed_products': sorted(old['products'].keys() - manifest['products'].keys()),
+        }
+        archive_jobs[name] = (
+            str(out_dir / name),
+            [entry for path, sha256, folder in changed for entry in entries_for(folder, [(path, sha256)])],
+            {DELTA_FILE: json.dumps(description, indent=2).encode('utf-8')},
+        )
+
+    for name, size in run_jobs(write_bundle, archive_jobs, workers).items():
+        stats['archives'] += 1
+        stats['archive_bytes'] += size
+
+    save_json(out_dir / 'manifests' / f'{version}.json', manifest)
+    for entry in [*products.values(), *deltas.values()]:
+        entry['bytes'] = (out_dir / entry['file']).stat().st_size
+    index = {
+        'library': catalog.get('library'),
+        'version': version,
+        'root_hash': catalog['root_hash'],
+        'full': {'file': full_name, 'bytes': (out_dir / full_name).stat().st_size},
+        'products': products,
+        'deltas': deltas,
+    }
+    save_json(out_dir / INDEX_FILE, index)
+    return index, stats
+
+
+def format_bytes(value):
+    if value >= 1024 * 1024:
+        return f'{value / (1024 * 1024):,.1f} MB'
+    return f'{value / 1024:,.0f} KB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build prebuilt download bundles for the product libraries.')
+    parser.add_argument('--config', default=str(DEFAULT_CONFIG),
+                        help='libraries config (default: config/libraries.config.json)')
+    parser.add_argument('--library', action='append', default=[], metavar='ID',
+                        help='package only this library (repeatable; default: every enabled library)')
+    parser.add_argument('--library-dir', type=parse_library_dir, action='append', default=[], metavar='ID=PATH',
+                        help="checkout of a library somewhere other than the config's paths.library")
+    parser.add_argument('--out-dir', default=str(DEFAULT_OUT_DIR), metavar='DIR',
+                        help='where to write <id>/ bundles (default: build/library-bundles)')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), metavar='DIR',
+                        help="library_catalog.py's file hash caches (default: .cache/catalog)")
+    parser.add_argument('--delta-from', type=int, action='append', metavar='VERSION',
+                        help='build a delta bundle from this catalog version (repeatable; '
+                             'default: the previously packaged version)')
+    parser.add_argument('--workers', type=int, metavar='N', help='processes (default: one per CPU)')
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    overrides = dict(args.library_dir)
+
+    try:
+        libraries = select_libraries(load_libraries(args.config), args.library or list(overrides) or None)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    failed = False
+    for library in libraries:
+        library_id = library['id']
+        root = library_dir(library, overrides)
+        if not root.is_dir() or not any(root.iterdir()):
+            print(f"⚠️  {library_id}: {root} is missing or not checked out, skipping")
+            continue
+        catalog = load_catalog(root / CATALOG_FILE)
+        prefix = (library.get('products') or {}).get('folderPrefix', '')
+        start = time.perf_counter()
+        file_entries, _ = hash_library(root, prefix, Path(args.cache_dir) / f'{library_id}.json', args.workers)
+        current = catalog_from_files(file_entries, catalog, library_id)
+        if catalog is None or catalog.get('root_hash') != current['root_hash']:
+            # Bundles are named after the version clients get from catalog.json
+            print(f"❌ {library_id}: {root / CATALOG_FILE} is missing or out of date; "
+                  f"run scripts/library_catalog.py first")
+            failed = True
+            continue
+
+        print(f"📦 {library_id}: packaging version {catalog['version']} ({catalog['root_hash'][:12]})")
+        try:
+            index, stats = package_library(root, file_entries, current, Path(args.out_dir) / library_id,
+                                           args.delta_from, args.workers)
+        except (OSError, ValueError) as e:
+            print(f"❌ {library_id}: {e}")
+            failed = True
+            continue
+        elapsed = time.perf_counter() - start
+        print(f"   {stats['files']} files ({format_bytes(stats['bytes'])}), {stats['unique_files']} distinct "
+              f"({format_bytes(stats['unique_bytes'])}); {stats['compressed']} newly compressed")
+        print(f"   {stats['archives']} archives built ({format_bytes(stats['archive_bytes'])}) in {elapsed:.1f}s")
+        print(f"   ✓ {index['full']['file']}: {format_bytes(index['full']['bytes'])}, "
+              f"{len(index['products'])} product archives"
+              + (f", deltas from {', '.join(index['deltas'])}" if index['deltas'] else ''))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
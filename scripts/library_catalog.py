@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Content-addressed catalog.json for the product libraries.
+
+api/v1/catalog/version.js serves the version in a library repo's
+catalog.json (and falls back to the current time without one, so every
+client sees a "new" catalog on every request). This builds that file from a
+local checkout of each library in config/libraries.config.json: every
+product folder (a top-level directory named with the library's
+products.folderPrefix, as the sync scripts use) is hashed, so clients can
+compare per-product hashes and fetch only the products that changed.
+
+Hashes are sha256, built like a Merkle tree so anyone can recompute them
+with standard tools:
+
+- a product's hash is the sha256 of its sha256sum-style listing, one
+  "<file sha256> <path relative to the product folder>\\n" line per file in
+  path order (hidden files skipped)
+- the catalog's root_hash is the sha256 of one "<product hash> <folder>\\n"
+  line per product in folder order
+
+catalog.json keeps the integer version the webhook and version.js expect and
+only bumps it (and last_updated) when root_hash changes, so rebuilding an
+unchanged library leaves the file as it was:
+
+    {"version": 8, "root_hash": "...", "last_updated": "...Z",
+     "product_count": 42, "library": "no3d-tools",
+     "products": {"Dojo Bolt Gen": {"hash": "...", "files": 6, "bytes": 48213}}}
+
+File hashes are cached per library (--cache-dir) by path, size and mtime;
+only product folders with a new, removed or changed file are re-hashed, on
+a process pool.
+
+Usage:
+    python3 scripts/library_catalog.py
+    python3 scripts/library_catalog.py --library no3d-tools --force
+    python3 scripts/library_catalog.py --library-dir no3d-tools=../no3d-tools-library --out-dir build/
+    python3 scripts/library_catalog.py --check
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = REPO_DIR / 'config' / 'libraries.config.json'
+CATALOG_FILE = 'catalog.json'
+DEFAULT_CACHE_DIR = REPO_DIR / '.cache' / 'catalog'
+CACHE_VERSION = 1
+# Files whose mtime is this close to the scan are re-hashed next time: they
+# may still change within the same mtime tick (git's "racily clean" entries)
+RACY_WINDOW_NS = 2 * 10**9
+
+
+def load_libraries(path):
+    """The libraries list from a libraries.config.json file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('libraries', [])
+
+
+def select_libraries(libraries, only=None):
+    """Libraries to build: the ones named in only, or every enabled library"""
+    if only:
+        known = {library['id']: library for library in libraries}
+        unknown = [library_id for library_id in only if library_id not in known]
+        if unknown:
+            raise ValueError(f"Unknown library: {', '.join(unknown)}")
+        return [known[library_id] for library_id in dict.fromkeys(only)]
+    return [library for library in libraries if library.get('enabled')]
+
+
+def library_dir(library, overrides=None):
+    """Local checkout of a library: --library-dir, else paths.library in the repo"""
+    if overrides and library['id'] in overrides:
+        return Path(overrides[library['id']])
+    return REPO_DIR / library['paths']['library']
+
+
+def product_folders(root, prefix):
+    """Product folder names in a library checkout, sorted"""
+    return sorted(
+        entry.name for entry in os.scandir(root)
+        if entry.is_dir() and entry.name.startswith(prefix) and not entry.name.startswith('.')
+    )
+
+
+def scan_product(folder):
+    """{relative posix path: (size, mtime_ns)} of the files in a product folder"""
+    files = {}
+    stack = [(folder, '')]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    stack.append((entry.path, f'{prefix}{entry.name}/'))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[prefix + entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def product_hash(file_hashes):
+    """Merkle hash of a product from {relative path: file sha256}"""
+    listing = ''.join(f'{file_hashes[path]} {path}\n' for path in sorted(file_hashes))
+    return hashlib.sha256(listing.encode('utf-8')).hexdigest()
+
+
+def root_hash(products):
+    """Merkle root of a catalog from {folder: {'hash': ...}}"""
+    listing = ''.join(f"{products[name]['hash']} {name}\n" for name in sorted(products))
+    return hashlib.sha256(listing.encode('utf-8')).hexdigest()
+
+
+def hash_product(job):
+    """Hash the changed files of one product folder (runs in a worker process)
+
+    job is (folder path, {path: (size, mtime_ns)}, {path: cached entry});
+    cached entries whose size and mtime still match are reused. Returns
+    {path: [size, mtime_ns, sha256]}.
+    """
+    folder, files, cached = job
+    entries = {}
+    for path, (size, mtime_ns) in files.items():
+        entry = cached.get(path)
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            entry = [size, mtime_ns, file_sha256(os.path.join(folder, path))]
+        entries[path] = entry
+    return entries
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('products', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_json(path, payload):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def load_catalog(path):
+    """A catalog.json, or None if it is missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def hash_library(root, prefix, cache_path=None, workers=None, force=False, update_cache=True):
+    """Hash every file of every product folder in a library checkout
+
+    Returns ({folder: {path: [size, mtime_ns, sha256]}}, folders re-hashed).
+    Product folders whose files all match the cache (by size and mtime) are
+    not read; the others are hashed on a process pool, and the cache is
+    updated unless update_cache is false.
+    """
+    scan_started_ns = time.time_ns()
+    cached_products = {} if force or cache_path is None else load_cache(cache_path)
+    folders = product_folders(root, prefix)
+    file_entries = {}
+    jobs = {}
+    for name in folders:
+        files = scan_product(os.path.join(root, name))
+        cached = cached_products.get(name, {})
+        if cached.keys() == files.keys() and all(
+            cached[path][:2] == list(stat) for path, stat in files.items()
+        ):
+            file_entries[name] = cached
+        else:
+            jobs[name] = (os.path.join(root, name), files, cached)
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        # Imported here: startup (and single-worker runs) do not pay for it
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(hash_product, job): name for name, job in jobs.items()}
+            for future in as_completed(futures):
+                file_entries[futures[future]] = future.result()
+    else:
+        for name, job in jobs.items():
+            file_entries[name] = hash_product(job)
+
+    if cache_path is not None and update_cache:
+        racy_after = scan_started_ns - RACY_WINDOW_NS
+        save_json(cache_path, {
+            'version': CACHE_VERSION,
+            'products': {
+                name: {path: entry for path, entry in entries.items() if entry[1] < racy_after}
+                for name, entries in file_entries.items()
+            },
+        })
+    return {name: file_entries[name] for name in folders}, sorted(jobs)
+
+
+def catalog_from_files(file_entries, previous=None, library_id=None):
+    """catalog.json contents for hash_library's file entries
+
+    previous is the current catalog.json, whose version is kept unless
+    root_hash changed.
+    """
+    products = {}
+    for name, entries in file_entries.items():
+        products[name] = {
+            'hash': product_hash({path: entry[2] for path, entry in entries.items()}),
+            'files': len(entries),
+            'bytes': sum(entry[0] for entry in entries.values()),
+        }
+    catalog_root = root_hash(products)
+    if previous and previous.get('root_hash') == catalog_root:
+        version, last_updated = previous.get('version', 1), previous.get('last_updated')
+    else:
+        # Integer versions only ever go up (the webhook increments the same field)
+        old_version = (previous or {}).get('version')
+        version = old_version + 1 if isinstance(old_version, int) else 1
+        last_updated = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    catalog = {
+        'version': version,
+        'root_hash': catalog_root,
+        'last_updated': last_updated,
+        'product_count': len(products),
+    }
+    if library_id:
+        catalog['library'] = library_id
+    catalog['products'] = products
+    return catalog
+
+
+def build_catalog(root, prefix, cache_path=None, previous=None, workers=None, force=False, library_id=None,
+                  update_cache=True):
+    """Hash a library checkout and return (catalog, stats)
+
+    See hash_library and catalog_from_files. stats has the product names
+    'rehashed', 'added', 'removed' and 'changed' (by hash, against
+    previous).
+    """
+    file_entries, rehashed = hash_library(root, prefix, cache_path, workers, force, update_cache)
+    catalog = catalog_from_files(file_entries, previous, library_id)
+    products = catalog['products']
+    old_products = (previous or {}).get('products') or {}
+    stats = {
+        'rehashed': rehashed,
+        'added': sorted(products.keys() - old_products.keys()),
+        'removed': sorted(old_products.keys() - products.keys()),
+        'changed': sorted(name for name in products.keys() & old_products.keys()
+                          if products[name]['hash'] != old_products[name].get('hash')),
+    }
+    return catalog, stats
+
+
+def parse_library_dir(value):
+    library_id, separator, path = value.partition('=')
+    if not separator or not library_id or not path:
+        raise argparse.ArgumentTypeError(f'expected ID=PATH, got {value!r}')
+    return library_id, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build content-addressed catalog.json files for the product libraries.')
+    parser.add_argument('--config', default=str(DEFAULT_CONFIG),
+                        help='libraries config (default: config/libraries.config.json)')
+    parser.add_argument('--library', action='append', default=[], metavar='ID',
+                        help='build only this library (repeatable; default: every enabled library)')
+    parser.add_argument('--library-dir', type=parse_library_dir, action='append', default=[], metavar='ID=PATH',
+                        help="checkout of a library somewhere other than the config's paths.library")
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='write DIR/<id>/catalog.json instead of catalog.json in each library checkout')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), metavar='DIR',
+                        help='file hash caches, one per library (default: .cache/catalog)')
+    parser.add_argument('--workers', type=int, metavar='N', help='hashing processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='re-hash every file, ignoring the cache')
+    parser.add_argument('--check', action='store_true',
+                        help='write nothing; exit 1 if a catalog.json is missing or out of date')
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    overrides = dict(args.library_dir)
+
+    try:
+        libraries = select_libraries(load_libraries(args.config), args.library or list(overrides) or None)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    stale = []
+    for library in libraries:
+        library_id = library['id']
+        root = library_dir(library, overrides)
+        if not root.is_dir() or not any(root.iterdir()):
+            print(f"⚠️  {library_id}: {root} is missing or not checked out, skipping")
+            continue
+        prefix = (library.get('products') or {}).get('folderPrefix', '')
+        catalog_path = Path(args.out_dir) / library_id / CATALOG_FILE if args.out_dir else root / CATALOG_FILE
+        cache_path = Path(args.cache_dir) / f'{library_id}.json'
+        previous = load_catalog(catalog_path)
+
+        start = time.perf_counter()
+        catalog, stats = build_catalog(root, prefix, cache_path, previous, args.workers, args.force, library_id,
+                                       update_cache=not args.check)
+        elapsed = time.perf_counter() - start
+        changed = previous != catalog
+        print(f"📚 {library_id}: {catalog['product_count']} products, {len(stats['rehashed'])} folders hashed "
+              f"in {elapsed:.1f}s, version {catalog['version']} ({catalog['root_hash'][:12]})")
+        for label in ('added', 'changed', 'removed'):
+            if stats[label]:
+                print(f"   {label}: {', '.join(stats[label])}")
+        if args.check:
+            if changed:
+                print(f"   ✗ {catalog_path} is {'out of date' if previous else 'missing'}")
+                stale.append(library_id)
+        elif changed:
+            save_json(catalog_path, catalog)
+            print(f"   ✓ Wrote {catalog_path}")
+        else:
+            print(f"   ✓ {catalog_path} is up to date")
+    if stale:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
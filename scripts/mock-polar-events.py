@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Publish synthetic Polar product webhook events to product-analysis-daemon.py.
+
+Starts from the same catalog the daemon loaded and sends a seeded mix of
+product.created (new names and new variants of existing names) and
+product.updated events (content and price changes, renames, archiving),
+signed with POLAR_WEBHOOK_SECRET when it is set. Reports event throughput
+and the latency of event delivery and queries; --verify then checks the
+daemon's recommendations against a batch analysis of the final catalog.
+
+Usage:
+    python3 scripts/product-analysis-daemon.py catalog.json &
+    python3 scripts/mock-polar-events.py catalog.json --events 2000 --verify
+"""
+
+import argparse
+import contextlib
+import copy
+import hashlib
+import hmac
+import http.client
+import io
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+from polar_catalog import iter_catalog_items
+from recommendation_writers import NDJSONWriter
+from script_loader import load_script
+from synthetic_catalog import GOOD_DESCRIPTION, PAID_AMOUNTS
+
+DAEMON_URL = 'http://127.0.0.1:8788'
+# Share of each event kind in the generated stream
+EVENT_MIX = (
+    ('update', 0.4),
+    ('create', 0.3),
+    ('archive', 0.15),
+    ('rename', 0.15),
+)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class EventPublisher:
+    """Generates events against a local copy of the catalog and sends them"""
+
+    def __init__(self, items, url=DAEMON_URL, secret=None, seed=0):
+        self.catalog = {item['id']: item for item in items}
+        self.names = list(dict.fromkeys(item['name'] for item in items)) or ['Dojo Tool']
+        self.rng = random.Random(seed)
+        self.secret = secret
+        parsed = urlparse(url)
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        data = response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed: HTTP {response.status} {data[:200]!r}")
+        return data
+
+    def next_event(self):
+        kind = self.rng.choices([k for k, _ in EVENT_MIX], [w for _, w in EVENT_MIX])[0]
+        now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        if kind == 'create' or not self.catalog:
+            name = self.rng.choice(self.names) if self.rng.random() < 0.5 else f'Dojo Mock {uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]}'
+            free = self.rng.random() < 0.5
+            product = {
+                'id': str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+                'name': name,
+                'description': GOOD_DESCRIPTION.format(name=name) if self.rng.random() < 0.5 else '',
+                'is_recurring': False,
+                'is_archived': False,
+                'created_at': now,
+                'modified_at': now,
+                'prices': [{'amount_type': 'free', 'is_archived': False} if free else
+                           {'amount_type': 'fixed', 'price_amount': self.rng.choice(PAID_AMOUNTS),
+                            'price_currency': 'usd', 'is_archived': False}],
+                'medias': [],
+                'benefits': [],
+                'metadata': {},
+            }
+            self.names.append(name)
+            self.catalog[product['id']] = product
+            return {'type': 'product.created', 'data': product}
+
+        product = copy.deepcopy(self.catalog[self.rng.choice(list(self.catalog))])
+        product['modified_at'] = now
+        if kind == 'archive':
+            product['is_archived'] = True
+            del self.catalog[product['id']]
+        elif kind == 'rename':
+            product['name'] = self.rng.choice(self.names)
+            if product['name'] != self.catalog[product['id']]['name']:
+                # The daemon moves a renamed product to the end of its new group
+                del self.catalog[product['id']]
+            self.catalog[product['id']] = product
+        else:
+            product['description'] = GOOD_DESCRIPTION.format(name=product['name'])
+            product['medias'] = [{'id': 'icon', 'mime_type': 'image/png'}] if self.rng.random() < 0.5 else []
+            self.catalog[product['id']] = product
+        return {'type': 'product.updated', 'data': product}
+
+    def send(self, event):
+        body = json.dumps(event).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.secret:
+            digest = hmac.new(self.secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+            headers['X-Polar-Signature'] = f'sha256={digest}'
+        return self.request('POST', '/webhooks/polar', body, headers)
+
+    def expected_report(self):
+        """Rows of a batch analysis of the current catalog, as sorted NDJSON lines"""
+        analyzer = load_script('analyze-product-duplicates.py')
+        out = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer.analyze_products({'items': list(self.catalog.values())}, writer=NDJSONWriter(out))
+        return sorted(out.getvalue().splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send synthetic Polar product webhooks to the analysis daemon.')
+    parser.add_argument('products', help='the catalog the daemon was started with (JSON or NDJSON)')
+    parser.add_argument('--url', default=DAEMON_URL, help=f'daemon base URL (default: {DAEMON_URL})')
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, help='events per second (default: as fast as possible)')
+    parser.add_argument('--verify', action='store_true',
+                        help='compare the daemon report with a batch analysis of the final catalog')
+    args = parser.parse_args()
+
+    publisher = EventPublisher(iter_catalog_items(args.products), args.url,
+                               os.environ.get('POLAR_WEBHOOK_SECRET'), args.seed)
+    print(f"📤 Sending {args.events:,} events to {args.url}...")
+    event_times = []
+    start = time.perf_counter()
+    for i in range(args.events):
+        if args.rate:
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        event = publisher.next_event()
+        sent = time.perf_counter()
+        publisher.send(event)
+        event_times.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+    print(f"   {args.events / elapsed:,.0f} events/s, delivery p50 {percentile(event_times, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(event_times, 99) * 1000:.2f} ms")
+
+    names = list(dict.fromkeys(p['name'] for p in publisher.catalog.values()))
+    for label, paths in (('summary', ['/summary'] * 200),
+                         ('group', [f"/recommendations/{quote(publisher.rng.choice(names), safe='')}" for _ in range(200)])):
+        times = []
+        for path in paths:
+            sent = time.perf_counter()
+            publisher.request('GET', path)
+            times.append(time.perf_counter() - sent)
+        print(f"   GET {label:<8} p50 {percentile(times, 50) * 1000:.3f} ms, p99 {percentile(times, 99) * 1000:.3f} ms")
+
+    summary = json.loads(publisher.request('GET', '/summary'))
+    print(f"   Daemon: {summary['products']:,} products, {summary['groups']:,} groups, "
+          f"{summary['groups_recomputed']:,} groups recomputed")
+
+    if args.verify:
+        actual = sorted(publisher.request('GET', '/recommendations').decode('utf-8').splitlines())
+        expected = publisher.expected_report()
+        if actual != expected:
+            missing = len(set(expected) - set(actual))
+            extra = len(set(actual) - set(expected))
+            print(f"❌ Daemon report differs from a batch analysis ({missing} rows missing, {extra} unexpected)")
+            raise SystemExit(1)
+        print(f"✓ Daemon report matches a batch analysis of the final catalog ({len(actual):,} rows)")
+
+
+if __name__ == '__main__':
+    main()
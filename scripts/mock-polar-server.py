@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Polar products API.
+
+Serves a seeded synthetic catalog (see synthetic_catalog.py) on
+GET /v1/products/ with Polar-style pagination, accepts product updates on
+PATCH /v1/products/{id} (archiving, price lists), and can simulate latency,
+rate limiting (429 + Retry-After) and transient server errors. Use it to test
+the Python Polar tooling offline:
+
+    python3 scripts/mock-polar-server.py --count 50000 --port 8787
+    POLAR_API_URL=http://127.0.0.1:8787 POLAR_API_TOKEN=test \\
+        python3 scripts/analyze-product-duplicates.py --fetch
+    POLAR_API_URL=http://127.0.0.1:8787 POLAR_API_TOKEN=test \\
+        python3 scripts/polar_consolidate.py --fetch --execute
+
+Usage:
+    python3 scripts/mock-polar-server.py [--count N] [--seed S] [--port P]
+                                         [--latency MS] [--rate-limit REQ_PER_S]
+                                         [--error-rate 0-1] [--catalog products.json]
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic_catalog import generate_catalog, parse_count
+
+MAX_PAGE_LIMIT = 100
+NEW_PRICE_TYPES = ('fixed', 'free', 'custom')
+
+
+class InvalidUpdate(Exception):
+    """A product update the API would reject (422)"""
+
+
+class MockPolar:
+    """Catalog state and fault injection shared by all request handlers"""
+
+    def __init__(self, items, latency=0.0, rate_limit=None, error_rate=0.0, seed=0):
+        self.items = items
+        self.by_id = {item['id']: item for item in items}
+        self.index = {item['id']: i for i, item in enumerate(items)}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'updates': 0}
+
+    def admit(self):
+        """None if the request may proceed, else (status, retry_after)"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self.window_start >= 1.0:
+                    self.window_start = now
+                    self.window_requests = 0
+                self.window_requests += 1
+                if self.window_requests > self.rate_limit:
+                    self.stats['rate_limited'] += 1
+                    return 429, max(1, math.ceil(1.0 - (now - self.window_start)))
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 503, None
+        return None
+
+    def list_products(self, query):
+        page = max(1, int(query.get('page', ['1'])[0]))
+        limit = min(MAX_PAGE_LIMIT, max(1, int(query.get('limit', ['10'])[0])))
+        items = self.items
+        archived = query.get('is_archived', [None])[0]
+        if archived is not None:
+            want = archived == 'true'
+            items = [item for item in items if item.get('is_archived', False) == want]
+        start = (page - 1) * limit
+        return {
+            'items': items[start:start + limit],
+            'pagination': {
+                'total_count': len(items),
+                'max_page': max(1, math.ceil(len(items) / limit)),
+            },
+        }
+
+
+    def update_product(self, product_id, update):
+        """Apply a ProductUpdate body; returns the updated product or None if unknown
+
+        Like Polar, a prices list replaces the product's prices: {"id": ...}
+        entries keep an existing price, other entries create new ones, and
+        existing prices left out are archived.
+        """
+        with self.lock:
+            product = self.by_id.get(product_id)
+            if product is None:
+                return None
+            # Replace rather than mutate, so concurrent list responses stay consistent
+            product = dict(product)
+            for key in ('name', 'description', 'is_archived', 'metadata'):
+                if key in update:
+                    product[key] = update[key]
+            if update.get('prices') is not None:
+                existing = {price.get('id'): price for price in product.get('prices') or []}
+                kept = set()
+                prices = []
+                for price in update['prices']:
+                    if 'id' in price:
+                        if price['id'] not in existing:
+                            raise InvalidUpdate(f"Price {price['id']} does not belong to this product")
+                        kept.add(price['id'])
+                        continue
+                    if price.get('amount_type') not in NEW_PRICE_TYPES:
+                        raise InvalidUpdate(f"Unsupported amount_type {price.get('amount_type')!r}")
+                    if price['amount_type'] == 'fixed' and not isinstance(price.get('price_amount'), int):
+                        raise InvalidUpdate('Fixed prices need an integer price_amount')
+                    prices.append(dict(price, id=str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+                                       is_archived=False))
+                product['prices'] = [
+                    dict(price, is_archived=price.get('is_archived', False) or price_id not in kept)
+                    for price_id, price in existing.items()
+                ] + prices
+            product['modified_at'] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            self.by_id[product_id] = product
+            self.items[self.index[product_id]] = product
+            self.stats['updates'] += 1
+            return product
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+    polar = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def guard(self):
+        """Apply auth, latency and fault injection; True if handled"""
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self.send_json(401, {'error': 'Unauthorized', 'detail': 'Missing bearer token'})
+            return True
+        if self.polar.latency:
+            time.sleep(self.polar.latency)
+        rejected = self.polar.admit()
+        if rejected:
+            status, retry_after = rejected
+            headers = {'Retry-After': str(retry_after)} if retry_after else None
+            self.send_json(status, {'error': 'Too Many Requests' if status == 429 else 'Service Unavailable'}, headers)
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if self.guard():
+            return
+        path = url.path.rstrip('/')
+        if path == '/v1/products':
+            self.send_json(200, self.polar.list_products(parse_qs(url.query)))
+        elif path.startswith('/v1/products/'):
+            product = self.polar.by_id.get(path.rsplit('/', 1)[1])
+            if product is None:
+                self.send_json(404, {'error': 'ResourceNotFound'})
+            else:
+                self.send_json(200, product)
+        else:
+            self.send_json(404, {'error': 'NotFound'})
+
+    def do_PATCH(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.guard():
+            return
+        path = url.path.rstrip('/')
+        if not path.startswith('/v1/products/'):
+            self.send_json(404, {'error': 'NotFound'})
+            return
+        try:
+            update = json.loads(body or b'{}')
+            product = self.polar.update_product(path.rsplit('/', 1)[1], update)
+        except (ValueError, InvalidUpdate) as e:
+            self.send_json(422, {'error': 'RequestValidationError', 'detail': str(e)})
+            return
+        if product is None:
+            self.send_json(404, {'error': 'ResourceNotFound'})
+        else:
+            self.send_json(200, product)
+
+
+def serve(polar, host='127.0.0.1', port=8787):
+    """Start the mock server; returns the ThreadingHTTPServer (call shutdown())"""
+    handler = type('MockPolarHandler', (Handler,), {'polar': polar})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='mock-polar', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic catalog through a mock Polar API.')
+    parser.add_argument('--count', type=parse_count, default=1000, help='synthetic products (e.g. 1k, 100k)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--catalog', help='serve the items of this products JSON dump instead')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', type=float, default=0, metavar='MS', help='delay per request')
+    parser.add_argument('--rate-limit', type=int, metavar='REQ_PER_S', help='answer 429 above this rate')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests answered with 503')
+    args = parser.parse_args()
+
+    if args.catalog:
+        with open(args.catalog) as f:
+            items = json.load(f).get('items', [])
+    else:
+        items = generate_catalog(args.count, seed=args.seed)['items']
+
+    polar = MockPolar(items, args.latency / 1000, args.rate_limit, args.error_rate, args.seed)
+    server = serve(polar, args.host, args.port)
+    print(f"🧪 Mock Polar API with {len(items):,} products on http://{args.host}:{server.server_port}")
+    print("   Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"\n   Requests: {polar.stats['requests']}, rate limited: {polar.stats['rate_limited']}, "
+              f"errors: {polar.stats['errors']}, updates: {polar.stats['updates']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Build web-ready variants of the renders in assets/renders.
+
+The renders are 1440x1440 16-bit RGBA PNGs of ~430 KB each, served as-is.
+For every render this writes 8-bit optimized PNG, WebP and AVIF files at a
+ladder of widths (256/512/1024 and the original width by default), with the
+Blender metadata stripped and the alpha channel dropped when the image is
+fully opaque. Renders are processed on a process pool.
+
+A manifest.json in the output directory lists every variant, so pages can
+pick the smallest file in a format the browser supports at the width they
+need (or build srcset/<picture> sources from it):
+
+    {"version": 1, "settings": {...}, "images": {"0001": {
+        "source": "0001.png", "sha256": "...", "bytes": 430061,
+        "width": 1440, "height": 1440, "alpha": true,
+        "variants": [{"format": "avif", "width": 256, "height": 256,
+                      "file": "0001-256.avif", "bytes": 5210}, ...]}}}
+
+Variants are sorted by width, then size. The manifest doubles as the cache:
+a render whose content hash and settings match its manifest entry (and
+whose files are all present) is skipped on the next run.
+
+Usage:
+    python3 scripts/optimize-renders.py
+    python3 scripts/optimize-renders.py --sizes 320,640,1280 --formats webp,avif
+    python3 scripts/optimize-renders.py assets/renders --out-dir website/assets/renders --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    import PIL
+    from PIL import Image, features
+except ImportError:
+    print("Error: Pillow is not installed.")
+    print("Install it with: pip3 install pillow")
+    sys.exit(1)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SOURCE_DIR = REPO_DIR / 'assets' / 'renders'
+DEFAULT_OUT_DIR = REPO_DIR / 'website' / 'assets' / 'renders'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+SOURCE_EXTENSIONS = ('.png',)
+DEFAULT_SIZES = (256, 512, 1024)
+FORMATS = ('png', 'webp', 'avif')
+# Encoder quality per format (PNG is lossless)
+DEFAULT_QUALITY = {'webp': 82, 'avif': 60}
+FILE_EXTENSIONS = {'png': '.png', 'webp': '.webp', 'avif': '.avif'}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_render(path):
+    """Open a render as an 8-bit RGB/RGBA image without its metadata
+
+    Pillow reads 16-bit RGBA PNGs as 8-bit RGBA; 16-bit grayscale is scaled
+    down explicitly. Fully opaque images lose their alpha channel.
+    """
+    with Image.open(path) as source:
+        source.load()
+        image = source
+        if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+            image = image.point(lambda value: value * (1 / 256)).convert('L')
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        if image.mode == 'RGBA' and image.getchannel('A').getextrema() == (255, 255):
+            image = image.convert('RGB')
+        # A copy drops the EXIF, text chunks (Blender file paths) and ICC info
+        image = image.copy()
+        image.info = {}
+        return image
+
+
+def ladder(width, sizes):
+    """Widths to generate for an image: the sizes below its width, and its width"""
+    return sorted({size for size in sizes if size < width} | {width})
+
+
+def encode(image, path, fmt, quality):
+    """Write image to path in fmt, via a temp file renamed into place"""
+    tmp_path = f'{path}.tmp'
+    if fmt == 'png':
+        image.save(tmp_path, 'PNG', optimize=True)
+    elif fmt == 'webp':
+        # method 6 is ~10x slower than 4 for files ~2% smaller
+        image.save(tmp_path, 'WEBP', quality=quality['webp'], method=4)
+    else:
+        image.save(tmp_path, 'AVIF', quality=quality['avif'], speed=6)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def build_variants(job):
+    """Write every variant of one render (runs in a worker process)
+
+    Returns the render's manifest entry.
+    """
+    source_path, out_dir, sha256, settings = job
+    source_path = Path(source_path)
+    image = load_render(source_path)
+    width, height = image.size
+
+    variants = []
+    for size in ladder(width, settings['sizes']):
+        if size == width:
+            resized = image
+        else:
+            resized = image.resize((size, max(1, round(height * size / width))), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in settings['formats']:
+            filename = f'{source_path.stem}-{size}{FILE_EXTENSIONS[fmt]}'
+            size_bytes = encode(resized, os.path.join(out_dir, filename), fmt, settings['quality'])
+            variants.append({
+                'format': fmt,
+                'width': resized.width,
+                'height': resized.height,
+                'file': filename,
+                'bytes': size_bytes,
+            })
+    variants.sort(key=lambda variant: (variant['width'], variant['bytes']))
+    return {
+        'source': source_path.name,
+        'sha256': sha256,
+        'bytes': source_path.stat().st_size,
+        'width': width,
+        'height': height,
+        'alpha': image.mode == 'RGBA',
+        'variants': variants,
+    }
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def save_manifest(path, manifest):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def is_current(entry, sha256, out_dir):
+    """Whether a manifest entry is for this content and all its files exist"""
+    return (entry is not None and entry['sha256'] == sha256
+            and all(os.path.exists(os.path.join(out_dir, variant['file'])) for variant in entry['variants']))
+
+
+def optimize_renders(source_dir, out_dir, settings, workers=None, force=False):
+    """Bring out_dir and its manifest up to date with the renders in source_dir
+
+    Returns (manifest, names of the renders rebuilt, {name: error} for the
+    renders that failed). Renders removed from source_dir lose their files.
+    """
+    source_dir = Path(source_dir)
+    out_dir = Path(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_FILE
+    previous = load_manifest(manifest_path)
+    # Changed settings invalidate every entry
+    old_images = previous['images'] if previous and previous.get('settings') == settings else {}
+
+    sources = sorted(p for p in source_dir.iterdir() if p.suffix.lower() in SOURCE_EXTENSIONS and p.is_file())
+    images = {}
+    jobs = {}
+    for path in sources:
+        sha256 = file_sha256(path)
+        entry = old_images.get(path.stem)
+        if not force and is_current(entry, sha256, out_dir):
+            images[path.stem] = entry
+        else:
+            jobs[path.stem] = (str(path), str(out_dir), sha256, settings)
+
+    errors = {}
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(build_variants, job): name for name, job in jobs.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    images[name] = future.result()
+                except Exception as e:
+                    errors[name] = f'{type(e).__name__}: {e}'
+                print(f"\r   {done}/{len(jobs)} renders", end='', flush=True)
+        print()
+    else:
+        for done, (name, job) in enumerate(jobs.items(), 1):
+            try:
+                images[name] = build_variants(job)
+            except Exception as e:
+                errors[name] = f'{type(e).__name__}: {e}'
+            print(f"\r   {done}/{len(jobs)} renders", end='', flush=True)
+        if jobs:
+            print()
+
+    # A render that failed to rebuild keeps its previous variants until it succeeds
+    for name in errors:
+        if name in old_images:
+            images[name] = old_images[name]
+
+    # Remove the files of variants that are no longer produced
+    if previous:
+        current = {variant['file'] for entry in images.values() for variant in entry['variants']}
+        for entry in previous['images'].values():
+            for variant in entry['variants']:
+                stale = out_dir / variant['file']
+                if variant['file'] not in current and stale.exists():
+                    stale.unlink()
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': settings,
+        'images': {name: images[name] for name in sorted(images)},
+    }
+    save_manifest(manifest_path, manifest)
+    return manifest, list(jobs.keys() - errors.keys()), errors
+
+
+def print_report(manifest, rebuilt, errors, elapsed):
+    images = manifest['images'].values()
+    source_bytes = sum(entry['bytes'] for entry in images)
+    print(f"\n✓ {len(rebuilt)} renders rebuilt, {len(manifest['images']) - len(rebuilt)} unchanged "
+          f"in {elapsed:.1f}s" + (f", ✗ {len(errors)} failed" if errors else ''))
+    for name, error in sorted(errors.items()):
+        print(f"   ✗ {name}: {error}")
+    if not source_bytes:
+        return
+
+    print(f"\n   {'Variant':<12} {'Total':>10} {'vs source':>10}")
+    print(f"   {'source':<12} {source_bytes / 1024:>7,.0f} KB {'':>10}")
+    widths = sorted({variant['width'] for entry in images for variant in entry['variants']})
+    for fmt in manifest['settings']['formats']:
+        for width in widths:
+            total = sum(variant['bytes'] for entry in images for variant in entry['variants']
+                        if variant['format'] == fmt and variant['width'] == width)
+            if total:
+                print(f"   {f'{fmt} {width}':<12} {total / 1024:>7,.0f} KB {total / source_bytes:>10.1%}")
+
+
+def parse_size_list(value):
+    try:
+        sizes = sorted({int(size) for size in value.split(',') if size.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected comma-separated widths, got {value!r}')
+    if not sizes or sizes[0] < 1:
+        raise argparse.ArgumentTypeError('widths must be positive')
+    return sizes
+
+
+def parse_format_list(value):
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"formats must be some of {', '.join(FORMATS)}")
+    return list(dict.fromkeys(formats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate optimized PNG/WebP/AVIF size ladders for the renders.')
+    parser.add_argument('source_dir', nargs='?', default=str(DEFAULT_SOURCE_DIR),
+                        help='directory of PNG renders (default: assets/renders)')
+    parser.add_argument('--out-dir', default=str(DEFAULT_OUT_DIR),
+                        help='where to write the variants and manifest.json (default: website/assets/renders)')
+    parser.add_argument('--sizes', type=parse_size_list, default=list(DEFAULT_SIZES), metavar='W,W,...',
+                        help='widths to generate below the original width (default: 256,512,1024)')
+    parser.add_argument('--formats', type=parse_format_list, default=list(FORMATS), metavar='F,F,...',
+                        help='output formats: png, webp, avif (default: all)')
+    parser.add_argument('--webp-quality', type=int, default=DEFAULT_QUALITY['webp'], metavar='Q')
+    parser.add_argument('--avif-quality', type=int, default=DEFAULT_QUALITY['avif'], metavar='Q')
+    parser.add_argument('--workers', type=int, metavar='N', help='processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='rebuild every render, even if unchanged')
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if not os.path.isdir(args.source_dir):
+        print(f"Error: Renders directory not found: {args.source_dir}")
+        sys.exit(1)
+    for fmt in args.formats:
+        if fmt != 'png' and not features.check(fmt):
+            print(f"Error: this Pillow build cannot write {fmt.upper()} (Pillow {PIL.__version__}).")
+            print("Install a build with it (pip3 install --upgrade pillow) or leave it out of --formats.")
+            sys.exit(1)
+
+    settings = {
+        'sizes': args.sizes,
+        'formats': args.formats,
+        'quality': {'webp': args.webp_quality, 'avif': args.avif_quality},
+        'pillow': PIL.__version__,
+    }
+    print(f"🖼️  Optimizing renders in {args.source_dir} → {args.out_dir}")
+    start = time.perf_counter()
+    manifest, rebuilt, errors = optimize_renders(args.source_dir, args.out_dir, settings, args.workers, args.force)
+    print_report(manifest, rebuilt, errors, time.perf_counter() - start)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Per-phase instrumentation for the Polar product scripts.
+
+Scripts mark their phases with phase() (or the profiled() decorator); while
+no profiler is running that costs one function call. With --profile on
+analyze-product-duplicates.py or format-polar-products.py, every phase
+records, summed over its calls:
+
+    calls, wall_s, cpu_s    perf_counter / process_time
+    net_blocks              net change in live memory blocks (blocks
+                            allocated minus blocks freed, from
+                            sys.getallocatedblocks; not for light phases,
+                            see below)
+    gc_collections          garbage collector runs during the phase
+    peak_rss_kb             process peak RSS when the phase last ended
+                            (top-level phases only)
+    traced_peak_kb          peak traced memory above the phase's starting
+                            point (with --profile-tracemalloc)
+
+Phases nest: a phase entered inside another is reported as "outer/inner"
+and its time is included in the outer one. The report is JSON; compare two
+reports (e.g. tonight's against a saved baseline) with:
+
+    python3 scripts/phase_profiler.py report.json --compare baseline.json
+
+Adding phases to a script:
+
+    from phase_profiler import phase, profiled
+
+    with phase('load'):
+        data = json.load(f)
+
+    for name, group in groups.items():
+        with phase('sort', light=True):
+            group.sort(...)
+
+    @profiled('summary')
+    def format_products_summary(products_data):
+        ...
+
+Allocations are not counted. net_blocks shows what a phase leaves behind,
+so a phase that allocates and frees a million objects reports about 0;
+CPython has no cumulative allocation counter that Python code can read, and
+tracemalloc only tracks live and peak memory. Short-lived allocations show
+up as wall and CPU time, and with --profile-tracemalloc as traced_peak_kb
+when they are alive at the same time.
+
+Use light=True for phases entered once per item (per name group, per
+product): they record calls, wall and CPU time only, because reading
+the live block count walks every memory pool and costs ~0.1 ms on a large heap.
+"""
+
+import argparse
+import cProfile
+import functools
+import gc
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+REPORT_VERSION = 1
+# Wall-time change (in percent) reported as a regression by --compare
+REGRESSION_THRESHOLD = 10.0
+# Phases faster than this (seconds) in the baseline are too noisy to compare
+COMPARE_MIN_WALL = 0.05
+# Allocation sites listed in the report with --profile-tracemalloc
+TRACEMALLOC_TOP = 25
+
+_active = None
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name, light=False):
+    """Context manager timing a phase of the active profiler (no-op without one)"""
+    profiler = _active
+    if profiler is None:
+        return _NULL_PHASE
+    return _Phase(profiler, name, light)
+
+
+def profiled(name=None):
+    """Decorator running the function as a phase (default name: the function's)"""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def active_profiler():
+    return _active
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class PhaseStats:
+    __slots__ = ('calls', 'wall', 'cpu', 'net_blocks', 'gc', 'peak_rss_kb', 'traced_peak')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.net_blocks = None
+        self.gc = 0
+        self.peak_rss_kb = None
+        self.traced_peak = None
+
+    def as_dict(self, name):
+        entry = {
+            'name': name,
+            'calls': self.calls,
+            'wall_s': round(self.wall, 6),
+            'cpu_s': round(self.cpu, 6),
+            'net_blocks': self.net_blocks,
+            'gc_collections': self.gc,
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+        if self.traced_peak is not None:
+            entry['traced_peak_kb'] = self.traced_peak // 1024
+        return entry
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'light', 'stats', 'wall', 'cpu', 'blocks', 'gc', 'traced_start', 'traced_max')
+
+    def __init__(self, profiler, name, light=False):
+        self.profiler = profiler
+        self.name = name
+        self.light = light
+
+    def __enter__(self):
+        profiler = self.profiler
+        parent = profiler.stack[-1]
+        key = (parent.name, self.name)
+        path = profiler.paths.get(key)
+        if path is None:
+            path = profiler.paths[key] = f'{parent.name}/{self.name}' if parent is not profiler.root else self.name
+        self.name = path
+        # Registered on entry, so the report lists parents before their children
+        self.stats = profiler.phases.get(path)
+        if self.stats is None:
+            self.stats = profiler.phases[path] = PhaseStats()
+        profiler.stack.append(self)
+        if profiler.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            parent.traced_max = max(parent.traced_max, peak)
+            tracemalloc.reset_peak()
+            self.traced_start = self.traced_max = current
+        self.gc = profiler.gc_count
+        if not self.light:
+            self.blocks = sys.getallocatedblocks()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        blocks = None if self.light else sys.getallocatedblocks()
+        profiler = self.profiler
+        profiler.stack.pop()
+        stats = self.stats
+        stats.calls += 1
+        stats.wall += wall - self.wall
+        stats.cpu += cpu - self.cpu
+        if blocks is not None:
+            stats.net_blocks = (stats.net_blocks or 0) + blocks - self.blocks
+        stats.gc += profiler.gc_count - self.gc
+        parent = profiler.stack[-1]
+        if parent is profiler.root:
+            # A process-wide high-water mark only means something for top-level phases
+            stats.peak_rss_kb = _peak_rss_kb()
+        if profiler.tracing:
+            self.traced_max = max(self.traced_max, tracemalloc.get_traced_memory()[1])
+            stats.traced_peak = max(stats.traced_peak or 0, self.traced_max - self.traced_start)
+            parent.traced_max = max(parent.traced_max, self.traced_max)
+            tracemalloc.reset_peak()
+        return False
+
+
+class _Root:
+    __slots__ = ('name', 'traced_max')
+
+    def __init__(self):
+        self.name = ''
+        self.traced_max = 0
+
+
+class Profiler:
+    """Collects phase statistics for one run of a script
+
+    start() makes it the active profiler that phase() records into;
+    stop() ends the run. cprofile/tracemalloc are output paths for a
+    cProfile stats dump and a tracemalloc snapshot.
+    """
+
+    def __init__(self, script, cprofile=None, tracemalloc_path=None):
+        self.script = script
+        self.cprofile_path = cprofile
+        self.tracemalloc_path = tracemalloc_path
+        self.tracing = bool(tracemalloc_path)
+        self.root = _Root()
+        self.stack = [self.root]
+        self.paths = {}
+        self.phases = {}
+        self.gc_count = 0
+        self.cprofile = None
+        self.top_allocations = []
+
+    def _on_gc(self, event, info):
+        if event == 'start':
+            self.gc_count += 1
+
+    def start(self):
+        global _active
+        self.started_at = datetime.now(timezone.utc)
+        gc.callbacks.append(self._on_gc)
+        if self.tracing:
+            tracemalloc.start()
+        if self.cprofile_path:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        _active = None
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        if self.tracing:
+            self.root.traced_max = max(self.root.traced_max, tracemalloc.get_traced_memory()[1])
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(self.tracemalloc_path)
+            self.top_allocations = [
+                {'site': str(stat.traceback), 'size_kb': stat.size // 1024, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]
+            ]
+        gc.callbacks.remove(self._on_gc)
+
+    def report(self):
+        report = {
+            'version': REPORT_VERSION,
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'started_at': self.started_at.isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'total': {
+                'wall_s': round(self.wall, 6),
+                'cpu_s': round(self.cpu, 6),
+                'peak_rss_kb': _peak_rss_kb(),
+                'gc_collections': self.gc_count,
+            },
+            'phases': [stats.as_dict(name) for name, stats in self.phases.items()],
+        }
+        if self.tracing:
+            report['total']['traced_peak_kb'] = self.root.traced_max // 1024
+            report['top_allocations'] = self.top_allocations
+        return report
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+    def summary_lines(self):
+        lines = [
+            f"⏱️  Profile: {self.wall:.3f}s wall, {self.cpu:.3f}s CPU, peak RSS {_peak_rss_kb() / 1024:.1f} MB",
+            f"   {'Phase':<36} {'Calls':>9} {'Wall s':>9} {'CPU s':>9} {'% wall':>7} {'Net blocks':>10} {'GC':>5}",
+        ]
+        for name, stats in self.phases.items():
+            share = stats.wall / self.wall * 100 if self.wall else 0.0
+            indent = '  ' * name.count('/')
+            label = indent + name.rsplit('/', 1)[-1]
+            lines.append(f"   {label:<36} {stats.calls:>9,} {stats.wall:>9.3f} {stats.cpu:>9.3f} {share:>6.1f}% "
+                         f"{'-' if stats.net_blocks is None else format(stats.net_blocks, ','):>10} {stats.gc:>5}")
+        return lines
+
+
+def add_profile_arguments(parser):
+    """Add --profile, --profile-cprofile and --profile-tracemalloc to a script's parser"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', metavar='REPORT.json',
+                       help='time each phase (wall, CPU, net memory blocks, memory) and write a JSON report')
+    group.add_argument('--profile-cprofile', metavar='PATH',
+                       help='also dump cProfile stats for the whole run (read with python3 -m pstats)')
+    group.add_argument('--profile-tracemalloc', metavar='PATH',
+                       help='also trace allocations: per-phase peaks, top sites in the report, snapshot dumped to PATH')
+
+
+def start_profiling(args, script):
+    """Start a Profiler if any profiling option is set; returns it or None"""
+    if not (args.profile or args.profile_cprofile or args.profile_tracemalloc):
+        return None
+    return Profiler(script, args.profile_cprofile, args.profile_tracemalloc).start()
+
+
+def finish_profiling(profiler, args, out=None):
+    """Stop the profiler, write the --profile report and print a summary (to stderr)"""
+    if profiler is None:
+        return
+    profiler.stop()
+    if args.profile:
+        profiler.write_report(args.profile)
+    out = out or sys.stderr
+    out.write('\n'.join(profiler.summary_lines()) + '\n')
+    if args.profile:
+        out.write(f"   Report written to {args.profile}\n")
+
+
+def compare_reports(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Lines comparing per-phase wall time, and whether any phase regressed"""
+    before = {entry['name']: entry for entry in baseline.get('phases', [])}
+    before['(total)'] = dict(baseline['total'], name='(total)')
+    lines = [f"   {'Phase':<36} {'Baseline s':>11} {'Now s':>9} {'Change':>8}"]
+    regressed = False
+    for entry in [dict(report['total'], name='(total)')] + report.get('phases', []):
+        old = before.get(entry['name'])
+        if old is None:
+            lines.append(f"   {entry['name']:<36} {'-':>11} {entry['wall_s']:>9.3f}      new")
+            continue
+        if old['wall_s'] < COMPARE_MIN_WALL:
+            continue
+        change = (entry['wall_s'] - old['wall_s']) / old['wall_s'] * 100
+        flag = '⚠️ ' if change > threshold else '  '
+        regressed = regressed or change > threshold
+        lines.append(f"{flag} {entry['name']:<36} {old['wall_s']:>11.3f} {entry['wall_s']:>9.3f} {change:>+7.1f}%")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or compare --profile reports.')
+    parser.add_argument('report', help='JSON report written by --profile')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare wall times against a saved report')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, metavar='PCT',
+                        help=f'slowdown reported as a regression (default: {REGRESSION_THRESHOLD:g}%%)')
+    args = parser.parse_args()
+
+    with open(args.report) as f:
+        report = json.load(f)
+    if not args.compare:
+        print(json.dumps(report, indent=2))
+        return
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    lines, regressed = compare_reports(report, baseline, args.threshold)
+    print(f"📊 {report['script']}: {args.report} vs {args.compare}")
+    print('\n'.join(lines))
+    if regressed:
+        print(f"\n❌ Wall time regressed by more than {args.threshold:g}%")
+        sys.exit(1)
+    print(f"\n✓ No phase regressed by more than {args.threshold:g}%")
+
+
+if __name__ == '__main__':
+    main()
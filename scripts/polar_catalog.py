@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Compact catalog records shared by the Polar product scripts.
+
+Polar's products_list response nests every product as a dict with a list of
+price dicts. The scripts used to re-walk those dicts (prices, is_archived,
+amount_type, price_amount) in every loop. This module parses each raw product
+exactly once into a __slots__ record with typed fields:
+
+- prices as integer cents, an AmountType enum and an archived flag, each
+  with an interned PriceKey (what makes two prices the same offer), so price
+  comparisons are tuple/set operations and strings are only built by
+  format_price() when a report is rendered
+- the index of the first active (non-archived) price
+- the modified/created timestamp as seconds since the epoch
+
+iter_catalog_items() reads large JSON/NDJSON dumps one product at a time;
+product_slug() gives the website ID used to match products across libraries.
+
+Used by analyze-product-duplicates.py and format-polar-products.py:
+
+    from polar_catalog import parse_products, format_price
+"""
+
+import gc
+import json
+import math
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from sys import intern as _intern
+from typing import NamedTuple
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+# generate-polar-mapping.js's rules for turning a name into a website ID
+_SLUG_SPACES = re.compile(r'\s+')
+_SLUG_INVALID = re.compile(r'[^a-z0-9-]')
+_SLUG_DASHES = re.compile(r'-+')
+
+
+class AmountType(str, Enum):
+    """Polar price amount types"""
+    FIXED = 'fixed'
+    FREE = 'free'
+    CUSTOM = 'custom'
+    METERED_UNIT = 'metered_unit'
+    SEAT_BASED = 'seat_based'
+    UNKNOWN = ''
+
+    @classmethod
+    def parse(cls, value):
+        return _AMOUNT_TYPES.get(value, cls.UNKNOWN)
+
+
+_AMOUNT_TYPES = {member.value: member for member in AmountType}
+
+# Symbols shown before fixed amounts; other currencies show only their code
+CURRENCY_SYMBOLS = {
+    'usd': '$',
+    'eur': '€',
+    'gbp': '£',
+    'jpy': '¥',
+    'inr': '₹',
+    'krw': '₩',
+    'brl': 'R$',
+    'cad': 'CA$',
+    'aud': 'A$',
+}
+# Currencies whose amounts are whole units, not cents (ISO 4217 exponent 0)
+ZERO_DECIMAL_CURRENCIES = frozenset({
+    'bif', 'clp', 'djf', 'gnf', 'jpy', 'kmf', 'krw', 'mga',
+    'pyg', 'rwf', 'ugx', 'vnd', 'vuv', 'xaf', 'xof', 'xpf',
+})
+
+
+class PriceKey(NamedTuple):
+    """What makes two prices the same offer
+
+    Fixed prices are keyed by integer amount and lowercase currency; every
+    other amount type has a single key (all FREE prices are alike). Keys
+    sort by amount type, then amount, then currency.
+    """
+    amount_type: str
+    amount: int = 0
+    currency: str = ''
+
+    @property
+    def is_free(self):
+        return self.amount_type == 'free'
+
+    @property
+    def is_paid(self):
+        return self.amount_type == 'fixed' and self.amount > 0
+
+
+_PRICE_KEYS = {}
+
+
+def price_key(amount_type, amount=0, currency=''):
+    """The interned PriceKey for an AmountType, amount in cents and currency"""
+    if amount_type is AmountType.FIXED:
+        key = PriceKey('fixed', int(amount), (currency or 'usd').lower())
+    else:
+        key = PriceKey(amount_type.value)
+    return _PRICE_KEYS.setdefault(key, key)
+
+
+FREE_PRICE = price_key(AmountType.FREE)
+
+
+class Price:
+    """One product price: amount in integer cents"""
+    __slots__ = ('id', 'amount_type', 'amount', 'currency', 'is_archived', 'key')
+
+    def __init__(self, id, amount_type, amount, currency, is_archived):
+        self.id = id
+        self.amount_type = amount_type
+        self.amount = amount
+        self.currency = currency
+        self.is_archived = is_archived
+        self.key = price_key(amount_type, amount, currency)
+
+    @classmethod
+    def from_dict(cls, price):
+        get = price.get
+        return cls(
+            get('id'),
+            _AMOUNT_TYPES.get(get('amount_type'), AmountType.UNKNOWN),
+            get('price_amount') or 0,
+            _intern(get('price_currency') or 'usd'),
+            get('is_archived', False),
+        )
+
+    @property
+    def is_paid(self):
+        return self.amount_type is AmountType.FIXED and self.amount > 0
+
+    @property
+    def is_free(self):
+        return self.amount_type is AmountType.FREE
+
+    def __repr__(self):
+        return f"Price({format_price(self)!r}{', archived' if self.is_archived else ''})"
+
+
+class Clock:
+    """A single reading of "now" shared by a batch of parsed records
+
+    Naive timestamps are compared against local wall-clock time (as
+    datetime.now() does), so they are aligned to the epoch through this
+    reading instead of each record calling datetime.now() itself.
+    """
+    __slots__ = ('epoch', 'naive')
+
+    def __init__(self):
+        self.epoch = time.time()
+        self.naive = datetime.now()
+
+
+def parse_timestamp(value, clock):
+    """Seconds since the epoch for an ISO timestamp, or NaN if unparseable"""
+    if not value:
+        return math.nan
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except Exception:
+        return math.nan
+    if parsed.tzinfo is None:
+        return clock.epoch + (parsed - clock.naive).total_seconds()
+    return parsed.timestamp()
+
+
+class CatalogProduct:
+    """Compact, typed view of one Polar product"""
+    __slots__ = (
+        'id', 'name', 'description', 'is_recurring', 'prices', 'active_price',
+        'media_count', 'benefit_count', 'metadata_size', 'modified_at', 'modified_epoch',
+    )
+
+    def __init__(self, id, name, description, is_recurring, prices, active_price,
+                 media_count, benefit_count, metadata_size, modified_at, modified_epoch):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.is_recurring = is_recurring
+        self.prices = prices
+        self.active_price = active_price
+        self.media_count = media_count
+        self.benefit_count = benefit_count
+        self.metadata_size = metadata_size
+        self.modified_at = modified_at
+        self.modified_epoch = modified_epoch
+
+    @classmethod
+    def from_dict(cls, product, clock=None, _timestamps=None):
+        if clock is None:
+            clock = Clock()
+        get = product.get
+        prices = tuple([Price.from_dict(p) for p in get('prices', ())])
+        active_price = -1
+        for i, price in enumerate(prices):
+            if not price.is_archived:
+                active_price = i
+                break
+
+        timestamp = get('modified_at') or get('created_at')
+        if _timestamps is None:
+            modified_epoch = parse_timestamp(timestamp, clock)
+        else:
+            try:
+                modified_epoch = _timestamps[timestamp]
+            except (KeyError, TypeError):
+                modified_epoch = parse_timestamp(timestamp, clock)
+                if isinstance(timestamp, str):
+                    _timestamps[timestamp] = modified_epoch
+
+        medias = get('medias')
+        benefits = get('benefits')
+        metadata = get('metadata')
+        return cls(
+            get('id'),
+            get('name'),
+            get('description') or '',
+            get('is_recurring', False),
+            prices,
+            active_price,
+            len(medias) if medias else 0,
+            len(benefits) if benefits else 0,
+            len(metadata) if metadata else 0,
+            get('modified_at'),
+            modified_epoch,
+        )
+
+    @property
+    def first_price(self):
+        """The first listed price (archived or not), or None"""
+        return self.prices[0] if self.prices else None
+
+    @property
+    def active(self):
+        """The first non-archived price, or None"""
+        return self.prices[self.active_price] if self.active_price >= 0 else None
+
+    def active_prices(self):
+        return [p for p in self.prices if not p.is_archived]
+
+    def price_keys(self):
+        """PriceKeys of the active prices, in listed order"""
+        return [p.key for p in self.prices if not p.is_archived]
+
+    def __repr__(self):
+        return f"CatalogProduct(id={self.id!r}, name={self.name!r})"
+
+
+@contextmanager
+def bulk_allocation():
+    """Pause the cyclic GC while allocating many records
+
+    Records hold no reference cycles; this skips the collector passes that
+    bulk allocation would otherwise trigger over the whole (large) heap.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def parse_products(items):
+    """Parse raw Polar product dicts into CatalogProduct records"""
+    clock = Clock()
+    timestamps = {}
+    with bulk_allocation():
+        return [CatalogProduct.from_dict(product, clock, timestamps) for product in items]
+
+
+def as_records(products):
+    """Return products as CatalogProduct records, parsing any raw dicts"""
+    if all(isinstance(product, CatalogProduct) for product in products):
+        return products
+    clock = Clock()
+    timestamps = {}
+    with bulk_allocation():
+        return [
+            product if isinstance(product, CatalogProduct) else CatalogProduct.from_dict(product, clock, timestamps)
+            for product in products
+        ]
+
+
+def format_price(price):
+    """Format a PriceKey, Price (or raw price dict) into a readable string"""
+    if not price:
+        return "No price"
+    if isinstance(price, dict):
+        price = Price.from_dict(price)
+    amount_type, amount, currency = price if isinstance(price, PriceKey) else price.key
+
+    if amount_type == 'free':
+        return "FREE"
+    elif amount_type == 'fixed':
+        if currency in ZERO_DECIMAL_CURRENCIES:
+            units = str(amount)
+        else:
+            units = f"{amount // 100}.{amount % 100:02d}"
+        return f"{CURRENCY_SYMBOLS.get(currency, '')}{units} {currency.upper()}"
+    else:
+        return amount_type
+
+
+def product_slug(name):
+    """Website-style ID for a product name, as generate-polar-mapping.js builds it"""
+    slug = _SLUG_INVALID.sub('', _SLUG_SPACES.sub('-', (name or '').lower()))
+    return _SLUG_DASHES.sub('-', slug).strip('-')
+
+
+class _JSONStream:
+    """Incremental reader that decodes one JSON value at a time from a file"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop everything already consumed so the buffer stays small
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character ('' at end of file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in catalog JSON, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the edge of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iter_catalog_items(path, fmt='auto', meta=None):
+    """Yield products one at a time from a JSON or NDJSON catalog dump
+
+    JSON files may be a Polar list response ({"items": [...], ...}) or a bare
+    array of products. NDJSON files hold one product per line; a line holding
+    a whole list response page is expanded into its items. If meta is a dict,
+    the other top-level keys of a JSON list response (e.g. "pagination") are
+    stored in it as they are read.
+    """
+    if fmt == 'auto':
+        fmt = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'json'
+
+    with open(path, 'r') as f:
+        if fmt == 'ndjson':
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict) and isinstance(record.get('items'), list):
+                    yield from record['items']
+                else:
+                    yield record
+            return
+
+        stream = _JSONStream(f)
+        if stream.peek() == '[':
+            yield from stream.array()
+            return
+
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'items':
+                yield from stream.array()
+            elif meta is not None:
+                meta[key] = stream.value()
+            else:
+                stream.value()
+            if stream.peek() == ',':
+                stream.pos += 1
+                continue
+            stream.expect('}')
+            return
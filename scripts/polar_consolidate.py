@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Carry out the consolidation recommendations of analyze-product-duplicates.py.
+
+Turns the CONSOLIDATE and ARCHIVE DUPLICATES recommendations into an ordered
+plan of Polar API updates:
+
+    add_prices  PATCH the kept product's price list with the active prices of
+                its variants that it is missing (FREE or paid)
+    archive     PATCH a duplicate with is_archived: true; variants of a
+                consolidated group only once their kept product has its prices
+
+Without --execute the plan is only shown as a per-product diff. With
+--execute, operations run in batches (price updates first, then archives),
+each batch concurrently under a shared request rate limit, with retries and
+Retry-After handling from polar_fetch.py. Every finished operation is
+appended to a checkpoint file, so an interrupted run picks up where it
+stopped when started again with the same plan. The checkpoint starts with a
+digest of the plan and is refused for any other plan; by default its name
+includes the digest. A plan built from a products file or --fetch is saved
+before executing (to --plan-out, or next to the checkpoint), because the
+catalog changes as operations run and analyzing it again gives a new plan;
+the resume command printed after an interruption or failure uses it.
+
+Usage:
+    python3 scripts/polar_consolidate.py products.json
+    python3 scripts/polar_consolidate.py products.json --plan-out plan.json
+    POLAR_API_TOKEN=xxx python3 scripts/polar_consolidate.py --plan plan.json --execute
+    POLAR_API_TOKEN=xxx POLAR_ORG_ID=xxx python3 scripts/polar_consolidate.py --fetch --execute
+
+Test it offline against mock-polar-server.py (POLAR_API_URL=http://127.0.0.1:8787).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shlex
+import sys
+import time
+
+from polar_catalog import AmountType, Price, format_price, iter_catalog_items
+from polar_snapshot import CatalogSnapshot, is_snapshot
+from script_loader import load_script
+
+PLAN_VERSION = 1
+BATCH_SIZE = 50
+CONCURRENCY = 8
+# Requests per second across all workers; Polar answers 429 above its limit
+REQUEST_RATE = 10.0
+# Default checkpoint; {plan} is replaced with the start of the plan digest
+CHECKPOINT_PATH = 'consolidation-checkpoint-{plan}.jsonl'
+# Where --execute saves a plan it built, without --plan-out
+PLAN_PATH = 'consolidation-plan-{plan}.json'
+
+
+def new_price(price):
+    """Price create body reproducing a Price on another product, or None"""
+    if price.amount_type is AmountType.FIXED:
+        return {'amount_type': 'fixed', 'price_amount': price.amount, 'price_currency': price.currency}
+    if price.amount_type is AmountType.FREE:
+        return {'amount_type': 'free'}
+    if price.amount_type is AmountType.CUSTOM:
+        return {'amount_type': 'custom', 'price_currency': price.currency}
+    # Metered and seat-based prices need settings the catalog does not carry
+    return None
+
+
+def build_plan(recommendations):
+    """Ordered operations for the consolidate and archive recommendations"""
+    add_prices = []
+    archives = []
+    for item in sorted(recommendations['consolidate'], key=lambda x: x['name'] or ''):
+        keep = item['keep']
+        current = set(keep.price_keys())
+        prices = {}
+        for product in item['archive']:
+            for price in product.active_prices():
+                body = new_price(price)
+                if price.key not in current and price.key not in prices and body is not None:
+                    prices[price.key] = body
+        after = None
+        if prices:
+            after = f'add_prices:{keep.id}'
+            add_prices.append({
+                'id': after,
+                'action': 'add_prices',
+                'product_id': keep.id,
+                'name': item['name'],
+                'current_prices': [format_price(key) for key in sorted(current)],
+                'prices': [{'label': format_price(key), 'price': body} for key, body in prices.items()],
+            })
+        for product in item['archive']:
+            archives.append({
+                'id': f'archive:{product.id}',
+                'action': 'archive',
+                'product_id': product.id,
+                'name': product.name,
+                'price': format_price(product.first_price),
+                'after': after,
+            })
+    for product in sorted(recommendations['archive'], key=lambda p: p.name or ''):
+        archives.append({
+            'id': f'archive:{product.id}',
+            'action': 'archive',
+            'product_id': product.id,
+            'name': product.name,
+            'price': format_price(product.first_price),
+            'after': None,
+        })
+    return {'version': PLAN_VERSION, 'operations': add_prices + archives}
+
+
+def load_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"{path} is not a version {PLAN_VERSION} consolidation plan")
+    return plan
+
+
+def plan_digest(plan):
+    """sha256 of the plan's ordered operations, bodies included"""
+    encoded = json.dumps(plan['operations'], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def plan_batches(operations, batch_size=BATCH_SIZE):
+    """Split operations into batches; price updates never share a batch with archives"""
+    batches = []
+    for action in ('add_prices', 'archive'):
+        ops = [op for op in operations if op['action'] == action]
+        batches.extend(ops[i:i + batch_size] for i in range(0, len(ops), batch_size))
+    return batches
+
+
+def render_diff(operations):
+    """The plan as lines of a per-product diff"""
+    lines = []
+    for op in operations:
+        short_id = f"{op['product_id'][:8]}..."
+        if op['action'] == 'add_prices':
+            lines.append(f"~ {op['name']}  {short_id}")
+            lines.append(f"      prices: {', '.join(op['current_prices']) or 'none'}")
+            for price in op['prices']:
+                lines.append(f"    + {price['label']}")
+        else:
+            lines.append(f"- {op['name']}  {short_id}  {op['price']}  → archived")
+    return lines
+
+
+class Checkpoint:
+    """Append-only log of finished operations, for resuming an interrupted run
+
+    The first line records the digest of the plan (see plan_digest). Operation
+    ids only name a product, so a log written for another plan would skip
+    operations that were never run; opening one raises ValueError.
+    """
+
+    def __init__(self, path, digest):
+        self.path = path
+        self.status = {}
+        header = None
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path) as f:
+                try:
+                    header = json.loads(f.readline()).get('plan')
+                except ValueError:
+                    pass
+                if header != digest:
+                    raise ValueError(f"{path} is the checkpoint of another plan; "
+                                     f"use a different --checkpoint or delete it to start over")
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line from an interrupted write
+                        continue
+                    self.status[entry['id']] = entry['status']
+        self.file = open(path, 'a')
+        if header is None:
+            self.file.write(json.dumps({'plan': digest}) + '\n')
+            self.sync()
+
+    def finished(self, op_id):
+        return self.status.get(op_id) in ('done', 'unchanged')
+
+    def record(self, op_id, status, error=None):
+        self.status[op_id] = status
+        entry = {'id': op_id, 'status': status}
+        if error:
+            entry['error'] = error
+        self.file.write(json.dumps(entry) + '\n')
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+async def execute_plan(plan, token, api_url, checkpoint, concurrency=CONCURRENCY, rate=REQUEST_RATE,
+                       batch_size=BATCH_SIZE, retries=None, on_batch=None):
+    """Apply the plan's operations; returns counts by outcome and the failures
+
+    Outcomes: done, unchanged (nothing left to do), failed, blocked (the
+    kept product's price update did not succeed) and resumed (finished in an
+    earlier run according to the checkpoint).
+    """
+    from polar_fetch import MAX_RETRIES, PolarAPIError, RateLimiter, polar_request, polar_session
+
+    retries = MAX_RETRIES if retries is None else retries
+    base_url = f"{api_url.rstrip('/')}/v1/products/"
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    counts = {'done': 0, 'unchanged': 0, 'failed': 0, 'blocked': 0, 'resumed': 0}
+    failures = []
+
+    async with polar_session(token, concurrency) as session:
+
+        async def request(method, product_id, **kwargs):
+            return await polar_request(session, method, base_url + product_id, semaphore, retries, limiter, **kwargs)
+
+        async def add_prices(op):
+            # Compare against the live price list, so a resumed or repeated run adds nothing twice
+            product = await request('GET', op['product_id'])
+            active = [p for p in product.get('prices') or [] if not p.get('is_archived')]
+            have = {Price.from_dict(p).key for p in active}
+            missing = [p['price'] for p in op['prices'] if Price.from_dict(p['price']).key not in have]
+            if not missing:
+                return 'unchanged'
+            # The list replaces the product's prices: keep the active ones by id
+            await request('PATCH', op['product_id'], json={'prices': [{'id': p['id']} for p in active] + missing})
+            return 'done'
+
+        async def archive(op):
+            await request('PATCH', op['product_id'], json={'is_archived': True})
+            return 'done'
+
+        async def run(op):
+            if op.get('after') and not checkpoint.finished(op['after']):
+                counts['blocked'] += 1
+                return
+            try:
+                status = await (add_prices(op) if op['action'] == 'add_prices' else archive(op))
+                error = None
+            except PolarAPIError as e:
+                status = 'failed'
+                error = str(e)
+                failures.append((op, error))
+            counts[status] += 1
+            checkpoint.record(op['id'], status, error)
+
+        batches = plan_batches(plan['operations'], batch_size)
+        for number, batch in enumerate(batches, 1):
+            pending = [op for op in batch if not checkpoint.finished(op['id'])]
+            counts['resumed'] += len(batch) - len(pending)
+            await asyncio.gather(*(run(op) for op in pending))
+            checkpoint.sync()
+            if on_batch is not None:
+                on_batch(number, len(batches), counts)
+    return counts, failures
+
+
+def analyze(args):
+    """Recommendations for the products file or the Polar API"""
+    analyzer = load_script('analyze-product-duplicates.py')
+    similarity = args.similarity_threshold if args.similar else None
+    if args.fetch:
+        from polar_fetch import POLAR_API_URL, iter_polar_products
+
+        print(f"🌐 Fetching products from {args.api_url or POLAR_API_URL}...")
+        products = iter_polar_products(args.token, os.environ.get('POLAR_ORG_ID'),
+                                       api_url=args.api_url or POLAR_API_URL, concurrency=args.concurrency)
+        return analyzer.analyze_product_stream(products, similarity)
+    if is_snapshot(args.products):
+        with CatalogSnapshot(args.products) as snapshot:
+            return analyzer.analyze_products(snapshot, similarity)
+    return analyzer.analyze_product_stream(iter_catalog_items(args.products, args.format), similarity)
+
+
+def resume_command(args):
+    """Command line that resumes this run's plan from its checkpoint"""
+    command = ['python3', sys.argv[0], '--plan', args.plan or args.plan_out, '--execute',
+               '--checkpoint', args.checkpoint]
+    if args.api_url:
+        command += ['--api-url', args.api_url]
+    return shlex.join(command)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply consolidation recommendations through the Polar API.')
+    parser.add_argument('products', nargs='?',
+                        help='products JSON/NDJSON dump or polar_snapshot.py snapshot to analyze')
+    parser.add_argument('--format', choices=['auto', 'json', 'ndjson'], default='auto')
+    parser.add_argument('--fetch', action='store_true', help='analyze the live catalog from the Polar API')
+    parser.add_argument('--plan', metavar='PATH', help='use a plan saved with --plan-out instead of analyzing')
+    parser.add_argument('--plan-out', metavar='PATH', help='save the plan as JSON (e.g. to review before executing)')
+    parser.add_argument('--similar', action='store_true', help='also consolidate near-duplicate names')
+    parser.add_argument('--similarity-threshold', type=float, default=0.5, metavar='J')
+    parser.add_argument('--execute', action='store_true', help='apply the plan (default: dry run, show the diff)')
+    parser.add_argument('--api-url', default=os.environ.get('POLAR_API_URL'),
+                        help='Polar API base URL (default: $POLAR_API_URL or https://api.polar.sh)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, metavar='N',
+                        help=f'requests in flight (default: {CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=REQUEST_RATE, metavar='REQ_PER_S',
+                        help=f'request rate limit, 0 for none (default: {REQUEST_RATE:g})')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, metavar='N',
+                        help=f'operations per checkpointed batch (default: {BATCH_SIZE})')
+    parser.add_argument('--retries', type=int, metavar='N', help='retries per request (default: 5)')
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help=f"progress log used to resume (default: {CHECKPOINT_PATH.format(plan='<plan digest>')})")
+    args = parser.parse_args()
+    if sum(map(bool, (args.products, args.fetch, args.plan))) != 1:
+        parser.error('pass one of a products file, --fetch or --plan')
+    if args.concurrency < 1 or args.batch_size < 1 or args.rate < 0:
+        parser.error('--concurrency and --batch-size must be at least 1, --rate at least 0')
+
+    args.token = os.environ.get('POLAR_API_TOKEN')
+    if (args.fetch or args.execute) and not args.token:
+        print("❌ Error: Missing required environment variables: POLAR_API_TOKEN")
+        sys.exit(1)
+    if args.fetch or args.execute:
+        # Checked up front: the API client is only imported where it is used
+        try:
+            import polar_fetch
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+
+    if args.plan:
+        plan = load_plan(args.plan)
+    else:
+        plan = build_plan(analyze(args))
+    digest = plan_digest(plan)
+    if args.execute and not args.plan and not args.plan_out:
+        # Resuming must reuse this plan: the catalog changes as it runs
+        args.plan_out = PLAN_PATH.format(plan=digest[:12])
+    if args.plan_out:
+        with open(args.plan_out, 'w') as f:
+            json.dump(plan, f, indent=2)
+        print(f"✓ Wrote plan to {args.plan_out}")
+
+    operations = plan['operations']
+    price_updates = sum(op['action'] == 'add_prices' for op in operations)
+    archives = len(operations) - price_updates
+    batches = plan_batches(operations, args.batch_size)
+    summary = f"{price_updates} price updates, {archives} archives in {len(batches)} batches"
+
+    if not args.execute:
+        print('🔍 DRY RUN - no changes will be made (pass --execute to apply)\n')
+        lines = render_diff(operations)
+        sys.stdout.write('\n'.join(lines) + '\n' if lines else '   Nothing to change.\n')
+        print(f"\nPlan: {summary}")
+        return
+
+    from polar_fetch import POLAR_API_URL, mask_token
+
+    api_url = args.api_url or POLAR_API_URL
+    print(f"🔑 POLAR_API_TOKEN: {mask_token(args.token)}")
+    print(f"🚀 Applying {summary} on {api_url} "
+          f"({args.concurrency} concurrent, {args.rate:g} req/s)...")
+
+    def on_batch(number, total, counts):
+        finished = counts['done'] + counts['unchanged'] + counts['resumed']
+        print(f"   Batch {number}/{total}: {finished}/{len(operations)} finished, "
+              f"{counts['failed']} failed, {counts['blocked']} blocked")
+
+    args.checkpoint = args.checkpoint or CHECKPOINT_PATH.format(plan=digest[:12])
+    try:
+        checkpoint = Checkpoint(args.checkpoint, digest)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    start = time.perf_counter()
+    try:
+        counts, failures = asyncio.run(execute_plan(plan, args.token, api_url, checkpoint, args.concurrency,
+                                                    args.rate, args.batch_size, args.retries, on_batch))
+    except KeyboardInterrupt:
+        print(f"\n⚠️  Interrupted; to resume, run:\n   {resume_command(args)}")
+        sys.exit(130)
+    finally:
+        checkpoint.close()
+
+    print(f"\n✓ {counts['done']} changed, {counts['unchanged']} already up to date, "
+          f"{counts['resumed']} done in an earlier run, in {time.perf_counter() - start:.1f}s")
+    if failures or counts['blocked']:
+        for op, error in failures:
+            print(f"   ❌ {op['action']} {op['name']} ({op['product_id'][:8]}...): {error}")
+        if counts['blocked']:
+            print(f"   ⏸️  {counts['blocked']} archives skipped because their kept product's prices were not updated")
+        print(f"   Fix the cause and retry with:\n   {resume_command(args)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
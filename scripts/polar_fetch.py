@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Concurrent, paginated Polar product fetcher.
+
+Reads the first page of GET /v1/products/ to learn pagination.total_count,
+then requests the remaining pages concurrently over one pooled HTTP session
+with bounded concurrency, retries with exponential backoff, and 429
+Retry-After handling. Pages are handed on in page order as soon as every
+earlier page has arrived, so the analysis can start before the whole catalog
+is downloaded.
+
+Used by analyze-product-duplicates.py --fetch; polar_consolidate.py sends its
+product updates through the same polar_request/RateLimiter. Point POLAR_API_URL (or
+--api-url) at mock-polar-server.py to run it without a real Polar account.
+
+Environment:
+    POLAR_API_TOKEN  Polar organization access token
+    POLAR_ORG_ID     Organization to list products for
+    POLAR_API_URL    API base URL (default: https://api.polar.sh)
+"""
+
+import asyncio
+import inspect
+import math
+import queue
+import random
+import threading
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("aiohttp is not installed. Install it with: pip3 install aiohttp") from e
+
+POLAR_API_URL = 'https://api.polar.sh'
+PAGE_LIMIT = 100
+CONCURRENCY = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = 60
+# Pages buffered between the fetcher thread and a slow consumer
+QUEUE_PAGES = 64
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PolarAPIError(Exception):
+    """A request failed with a non-retryable status or after all retries"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class PolarFetchError(PolarAPIError):
+    """A page could not be fetched after all retries"""
+
+
+class _ConsumerStopped(Exception):
+    """The consumer of iter_polar_products went away"""
+
+
+class RateLimiter:
+    """Token bucket shared by concurrent requests: at most rate requests per second"""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self.next_at = None
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self.next_at is None or self.next_at < now - self.interval * (self.burst - 1):
+            self.next_at = now - self.interval * (self.burst - 1)
+        at = self.next_at
+        self.next_at += self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+def mask_token(token):
+    """Show only the first/last 4 characters (like scripts/utils/security.js)"""
+    if not token or len(token) <= 8:
+        return '****'
+    return f'{token[:4]}...{token[-4:]}'
+
+
+def _retry_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def polar_request(session, method, url, semaphore, retries=MAX_RETRIES, limiter=None, label=None, **kwargs):
+    """Send one request and return its JSON body
+
+    Retries rate limits (honouring Retry-After), server errors and timeouts
+    with exponential backoff; raises PolarAPIError otherwise. kwargs go to
+    session.request (params, json, ...).
+    """
+    label = label or f"{method} {url}"
+    for attempt in range(retries + 1):
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    if 200 <= response.status < 300:
+                        return await response.json()
+                    body = await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        raise PolarAPIError(f"{label} failed: HTTP {response.status} {body[:200]}", response.status)
+                    retry_after = response.headers.get('Retry-After')
+                    status = response.status
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retry_after = None
+                status = None
+                error = f"{type(e).__name__}: {e}"
+        if attempt == retries:
+            raise PolarAPIError(f"{label} failed after {retries + 1} attempts ({error})", status)
+        # Sleep outside the semaphore so other requests keep flowing
+        await asyncio.sleep(_retry_delay(attempt, retry_after))
+
+
+def polar_session(token, concurrency=CONCURRENCY):
+    """aiohttp session authenticated with token, pooling up to concurrency connections"""
+    headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    return aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout)
+
+
+async def fetch_page(session, url, params, semaphore, retries=MAX_RETRIES):
+    """GET one page, retrying on rate limits, server errors and timeouts"""
+    try:
+        return await polar_request(session, 'GET', url, semaphore, retries,
+                                   label=f"GET {url} page {params['page']}", params=params)
+    except PolarAPIError as e:
+        raise PolarFetchError(str(e), e.status) from None
+
+
+async def fetch_product_pages(on_page, token, organization_id=None, api_url=POLAR_API_URL,
+                              limit=PAGE_LIMIT, concurrency=CONCURRENCY, retries=MAX_RETRIES,
+                              include_archived=False, window=None):
+    """Fetch every product page and call on_page(page_number, page) in order
+
+    on_page may be a coroutine function; it is awaited before the next page
+    is handed on. At most window pages (default concurrency + QUEUE_PAGES)
+    past the last one handed on are requested or held for re-ordering, so a
+    slow on_page stops the fetching instead of buffering the catalog.
+    Returns pagination.total_count from the first page.
+    """
+    url = f"{api_url.rstrip('/')}/v1/products/"
+    base_params = {'limit': limit}
+    if organization_id:
+        base_params['organization_id'] = organization_id
+    if not include_archived:
+        base_params['is_archived'] = 'false'
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with polar_session(token, concurrency) as session:
+        first = await fetch_page(session, url, dict(base_params, page=1), semaphore, retries)
+        pagination = first.get('pagination', {})
+        total_count = pagination.get('total_count', len(first.get('items', [])))
+        max_page = pagination.get('max_page') or max(1, math.ceil(total_count / limit))
+        window = window or concurrency + QUEUE_PAGES
+
+        async def deliver(page, page_data):
+            result = on_page(page, page_data)
+            if inspect.isawaitable(result):
+                await result
+
+        async def fetch_numbered(page):
+            return page, await fetch_page(session, url, dict(base_params, page=page), semaphore, retries)
+
+        await deliver(1, first)
+        # Re-order pages so on_page always sees them in page order
+        pending = {}
+        running = set()
+        next_page = next_request = 2
+        try:
+            while next_page <= max_page:
+                while next_request <= max_page and next_request - next_page < window:
+                    running.add(asyncio.create_task(fetch_numbered(next_request)))
+                    next_request += 1
+                finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    page, page_data = task.result()
+                    pending[page] = page_data
+                while next_page in pending:
+                    await deliver(next_page, pending.pop(next_page))
+                    next_page += 1
+        finally:
+            for task in running:
+                task.cancel()
+        return total_count
+
+
+def iter_polar_products(token, organization_id=None, **options):
+    """Yield products as pages arrive, running the async fetcher in a thread
+
+    A bounded queue sits between the fetcher and the consumer, so a slow
+    analysis applies backpressure instead of buffering the whole catalog.
+    """
+    pages = queue.Queue(maxsize=QUEUE_PAGES)
+    done = object()
+    stop = threading.Event()
+
+    def put(items):
+        while not stop.is_set():
+            try:
+                pages.put(items, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _ConsumerStopped()
+
+    async def on_page(page_number, page):
+        # Wait for queue space on an executor thread, so the event loop keeps
+        # the other page requests going meanwhile
+        await asyncio.get_running_loop().run_in_executor(None, put, page.get('items', []))
+
+    def run():
+        try:
+            asyncio.run(fetch_product_pages(on_page, token, organization_id, **options))
+            result = done
+        except BaseException as e:
+            result = e
+        if not stop.is_set():
+            pages.put(result)
+
+    thread = threading.Thread(target=run, name='polar-fetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+    finally:
+        stop.set()
+        thread.join(timeout=5)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped columnar snapshots of a Polar catalog.
+
+Parsing the raw products_list JSON dominates every run of the Polar scripts.
+A snapshot converts the dump once into a compact binary file that later runs
+memory-map instead of parsing:
+
+- fixed-width numeric columns (native byte order), one per field, 8-byte
+  aligned so they can be viewed in place (memoryview / numpy.frombuffer)
+- an interned string table (each distinct id/name/description/currency is
+  stored once; index 0 stands for None)
+- prices in their own columns, addressed per product through price_start
+
+The scoring inputs used by analyze-product-duplicates.py (description
+length, active paid/free price flags, counts, timestamp) are stored as
+columns too, so scoring reads the mapped pages directly. The file is opened
+read-only and shared, so concurrent processes analyzing the same snapshot
+share its pages through the OS page cache.
+
+Usage:
+    python3 scripts/polar_snapshot.py products.json catalog.snap
+    python3 scripts/analyze-product-duplicates.py catalog.snap
+    python3 scripts/format-polar-products.py catalog.snap
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from polar_catalog import (
+    AmountType,
+    CatalogProduct,
+    Price,
+    bulk_allocation,
+    iter_catalog_items,
+    parse_products,
+)
+
+SNAPSHOT_MAGIC = b'POLARSNP'
+SNAPSHOT_VERSION = 1
+# Products parsed per batch while writing
+SNAPSHOT_BATCH_SIZE = 10000
+
+# (section, array typecode) in file order; product columns, then prices, then strings
+SECTIONS = (
+    ('id', 'I'),
+    ('name', 'I'),
+    ('description', 'I'),
+    ('modified_at', 'I'),
+    ('is_recurring', 'b'),
+    ('media_count', 'q'),
+    ('benefit_count', 'q'),
+    ('metadata_size', 'q'),
+    ('desc_len', 'q'),
+    ('desc_blender', 'b'),
+    ('has_paid', 'b'),
+    ('has_free', 'b'),
+    ('modified_epoch', 'd'),
+    ('active_price', 'i'),
+    ('price_start', 'I'),
+    ('price_id', 'I'),
+    ('amount_type', 'B'),
+    ('amount', 'q'),
+    ('currency', 'I'),
+    ('is_archived', 'b'),
+    ('string_offsets', 'Q'),
+    ('string_data', 'B'),
+)
+# magic, version, byte order (0 little, 1 big), products, prices, strings, total_count
+_HEADER = struct.Struct('<8sHHQQQq')
+_SECTION = struct.Struct('<QQ')
+_DATA_START = _HEADER.size + _SECTION.size * len(SECTIONS)
+_BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+_AMOUNT_TYPES = list(AmountType)
+_AMOUNT_TYPE_CODES = {member: code for code, member in enumerate(_AMOUNT_TYPES)}
+
+# Columns consumed by the analyzer's score_columns()
+SCORE_COLUMNS = (
+    'media_count', 'desc_len', 'desc_blender', 'has_paid', 'has_free',
+    'benefit_count', 'modified_epoch', 'metadata_size',
+)
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this version can read"""
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.offsets = array('Q', [0, 0])
+        self.data = bytearray()
+
+    def add(self, value):
+        if value is None:
+            return 0
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.offsets) - 1
+            self.data += value.encode('utf-8', 'surrogatepass')
+            self.offsets.append(len(self.data))
+        return i
+
+
+def write_snapshot(products, path, meta=None):
+    """Write an iterable of raw Polar product dicts as a snapshot file
+
+    meta holds the other top-level keys of the list response, as filled in
+    by iter_catalog_items(); it is read once products are exhausted, for
+    pagination.total_count. Returns (product_count, price_count, string_count).
+    """
+    columns = {name: array(typecode) for name, typecode in SECTIONS}
+    strings = _StringTable()
+    columns['price_start'].append(0)
+
+    def add_records(records):
+        for product in records:
+            columns['id'].append(strings.add(product.id))
+            columns['name'].append(strings.add(product.name))
+            columns['description'].append(strings.add(product.description))
+            columns['modified_at'].append(strings.add(product.modified_at))
+            columns['is_recurring'].append(bool(product.is_recurring))
+            columns['media_count'].append(product.media_count)
+            columns['benefit_count'].append(product.benefit_count)
+            columns['metadata_size'].append(product.metadata_size)
+            columns['desc_len'].append(len(product.description))
+            columns['desc_blender'].append(product.description.startswith('Blender asset:'))
+            paid = free = False
+            for price in product.prices:
+                columns['price_id'].append(strings.add(price.id))
+                columns['amount_type'].append(_AMOUNT_TYPE_CODES[price.amount_type])
+                columns['amount'].append(int(price.amount))
+                columns['currency'].append(strings.add(price.currency))
+                columns['is_archived'].append(bool(price.is_archived))
+                if not price.is_archived:
+                    if price.amount_type is AmountType.FIXED and price.amount > 0:
+                        paid = True
+                    elif price.amount_type is AmountType.FREE:
+                        free = True
+            columns['has_paid'].append(paid)
+            columns['has_free'].append(free)
+            columns['modified_epoch'].append(product.modified_epoch)
+            columns['active_price'].append(product.active_price)
+            columns['price_start'].append(len(columns['price_id']))
+
+    batch = []
+    for product in products:
+        batch.append(product)
+        if len(batch) >= SNAPSHOT_BATCH_SIZE:
+            add_records(parse_products(batch))
+            batch.clear()
+    add_records(parse_products(batch))
+
+    columns['string_offsets'] = strings.offsets
+    columns['string_data'] = array('B', bytes(strings.data))
+    product_count = len(columns['id'])
+    price_count = len(columns['price_id'])
+    string_count = len(strings.offsets) - 1
+
+    total_count = ((meta or {}).get('pagination') or {}).get('total_count') or 0
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * _DATA_START)
+        sections = []
+        for name, _ in SECTIONS:
+            # 8-byte alignment keeps every column viewable in place
+            f.write(b'\0' * (-f.tell() % 8))
+            offset = f.tell()
+            columns[name].tofile(f)
+            sections.append((offset, f.tell() - offset))
+        f.seek(0)
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER,
+                             product_count, price_count, string_count, total_count))
+        for section in sections:
+            f.write(_SECTION.pack(*section))
+    os.replace(tmp_path, path)
+    return product_count, price_count, string_count
+
+
+def is_snapshot(path):
+    """True if path is a snapshot file (checks the magic bytes)"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    except OSError:
+        return False
+
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped view of a snapshot file
+
+    Columns are memoryviews over the shared mapping; nothing is copied until
+    records() builds CatalogProduct objects.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        try:
+            if len(view) < _DATA_START:
+                raise SnapshotError(f"{path} is not a catalog snapshot")
+            magic, version, byte_order, products, prices, strings, total_count = _HEADER.unpack_from(view)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is not a catalog snapshot")
+            if version != SNAPSHOT_VERSION or byte_order != _BYTE_ORDER:
+                raise SnapshotError(f"{path} was written by another snapshot version or platform; "
+                                    "recreate it with polar_snapshot.py")
+            self.product_count = products
+            self.price_count = prices
+            self.string_count = strings
+            self.total_count = total_count
+            self._columns = {}
+            for i, (name, typecode) in enumerate(SECTIONS):
+                offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+                self._columns[name] = view[offset:offset + length].cast(typecode)
+        except BaseException:
+            view.release()
+            self._mmap.close()
+            raise
+        self._view = view
+        self._strings = None
+
+    def __len__(self):
+        return self.product_count
+
+    def column(self, name):
+        return self._columns[name]
+
+    def score_columns(self):
+        """The column set the analyzer's score_columns() expects, without copying"""
+        columns = {name: self._columns[name] for name in SCORE_COLUMNS}
+        columns['now_epoch'] = time.time()
+        return columns
+
+    def strings(self):
+        """The decoded string table (index 0 is None)"""
+        if self._strings is None:
+            data = bytes(self._columns['string_data'])
+            offsets = self._columns['string_offsets'].tolist()
+            strings = [data[start:end].decode('utf-8', 'surrogatepass')
+                       for start, end in zip(offsets, offsets[1:])]
+            strings[0] = None
+            self._strings = strings
+        return self._strings
+
+    def records(self):
+        """All products as CatalogProduct records, in catalog order"""
+        strings = self.strings()
+        c = {name: column.tolist() for name, column in self._columns.items()
+             if name not in ('string_offsets', 'string_data')}
+        with bulk_allocation():
+            prices = [
+                Price(strings[price_id], _AMOUNT_TYPES[amount_type], amount, strings[currency], bool(archived))
+                for price_id, amount_type, amount, currency, archived in zip(
+                    c['price_id'], c['amount_type'], c['amount'], c['currency'], c['is_archived'])
+            ]
+            starts = c['price_start']
+            return [
+                CatalogProduct(strings[product_id], strings[name], strings[description], bool(recurring),
+                               tuple(prices[start:end]), active_price, media, benefits, metadata,
+                               strings[modified_at], epoch)
+                for product_id, name, description, modified_at, recurring, media, benefits, metadata,
+                    epoch, active_price, start, end in zip(
+                    c['id'], c['name'], c['description'], c['modified_at'], c['is_recurring'],
+                    c['media_count'], c['benefit_count'], c['metadata_size'], c['modified_epoch'],
+                    c['active_price'], starts, starts[1:])
+            ]
+
+    def close(self):
+        for column in self._columns.values():
+            column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a Polar products dump into a memory-mapped snapshot.')
+    parser.add_argument('products', help='polar_products_list JSON dump or NDJSON file')
+    parser.add_argument('snapshot', help='snapshot file to write (e.g. catalog.snap)')
+    parser.add_argument('--format', choices=['auto', 'json', 'ndjson'], default='auto',
+                        help='input format (default: by file extension)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = {}
+    items = iter_catalog_items(args.products, args.format, meta)
+    products, prices, strings = write_snapshot(items, args.snapshot, meta)
+    size = os.path.getsize(args.snapshot)
+    print(f"✓ Wrote {args.snapshot}: {products:,} products, {prices:,} prices, {strings:,} strings, "
+          f"{size / 1024 / 1024:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Long-running duplicate analysis service fed by Polar webhooks.
+
+Loads the catalog once, keeps products, name groups, scores and each group's
+recommendation in memory, and applies Polar product webhook events as they
+arrive: only the name groups an event touches are re-scored and
+re-recommended. Each group's report rows are serialized when the group
+changes, so queries are answered from ready-made bytes.
+
+Events (POST /webhooks/polar, signed like api/v1/webhooks/polar.js when
+POLAR_WEBHOOK_SECRET is set):
+    product.created   add the product to its name group
+    product.updated   update it in place, move it to its new name group, or
+                      drop it when data.is_archived is true
+
+Queries:
+    GET /recommendations        every group's rows as NDJSON (same rows as
+                                analyze-product-duplicates.py --output-format ndjson)
+    GET /recommendations/NAME   one name group's rows (NAME URL-encoded)
+    GET /summary                product/group/recommendation counts
+    GET /health
+
+Usage:
+    python3 scripts/product-analysis-daemon.py products.json
+    python3 scripts/product-analysis-daemon.py catalog.snap --port 8788
+    POLAR_API_TOKEN=xxx POLAR_ORG_ID=xxx python3 scripts/product-analysis-daemon.py --fetch
+
+Test it offline with scripts/mock-polar-events.py.
+"""
+
+import argparse
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from polar_catalog import CatalogProduct, iter_catalog_items, parse_products
+from polar_snapshot import CatalogSnapshot, is_snapshot
+from recommendation_writers import recommendation_rows
+from script_loader import load_script
+
+analyzer = load_script('analyze-product-duplicates.py')
+
+DEFAULT_PORT = 8788
+PRODUCT_EVENTS = ('product.created', 'product.updated')
+# Products parsed per batch while loading
+LOAD_BATCH_SIZE = 10000
+# Largest webhook body accepted
+MAX_EVENT_BYTES = 1024 * 1024
+
+
+class CatalogState:
+    """Products, name groups and per-group recommendations kept in memory"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products = {}
+        # name -> {product id: None}, an insertion-ordered set
+        self.groups = {}
+        self.results = {}
+        # name -> the group's report rows as NDJSON bytes
+        self.fragments = {}
+        self.counts = {'keep': 0, 'consolidate': 0, 'archive': 0}
+        # (epoch a group's "recently updated" bonus expires, name)
+        self.expiries = []
+        self.report = None
+        self.stats = {'events': 0, 'ignored': 0, 'stale': 0, 'groups_recomputed': 0, 'last_event_at': None}
+
+    def load(self, records):
+        """Add CatalogProduct records and recommend every group once"""
+        with self.lock:
+            for product in records:
+                self.products[product.id] = product
+                self.groups.setdefault(product.name, {})[product.id] = None
+            self._recompute(list(self.groups))
+
+    def _recompute(self, names):
+        """Re-score and re-recommend the given name groups in one batch"""
+        members = [(name, [self.products[i] for i in self.groups.get(name, ())]) for name in names]
+        scores = analyzer.score_products([p for _, records in members for p in records])
+        now = time.time()
+        start = 0
+        for name, records in members:
+            old = self.results.pop(name, None)
+            if old is not None:
+                for key in self.counts:
+                    self.counts[key] -= len(old[key])
+            self.fragments.pop(name, None)
+            if not records:
+                self.groups.pop(name, None)
+                continue
+
+            scored_variants = [
+                {'product': product, 'score': score, 'reasons': reasons}
+                for product, (score, reasons) in zip(records, scores[start:start + len(records)])
+            ]
+            start += len(records)
+            scored_variants.sort(key=lambda x: x['score'], reverse=True)
+            result = {'keep': [], 'consolidate': [], 'archive': []}
+            analyzer.recommend_group(name, scored_variants, result)
+            self.results[name] = result
+            for key in self.counts:
+                self.counts[key] += len(result[key])
+            self.fragments[name] = ''.join(
+                json.dumps(row, ensure_ascii=False) + '\n' for row in recommendation_rows(result)
+            ).encode('utf-8')
+
+            recent = [p.modified_epoch for p in records if now - p.modified_epoch < analyzer.RECENT_SECONDS]
+            if recent:
+                heapq.heappush(self.expiries, (min(recent) + analyzer.RECENT_SECONDS, name))
+        self.report = None
+        self.stats['groups_recomputed'] += len(names)
+
+    def _refresh_expired(self):
+        """Recompute groups whose "recently updated" bonus has run out"""
+        now = time.time()
+        expired = set()
+        while self.expiries and self.expiries[0][0] <= now:
+            expired.add(heapq.heappop(self.expiries)[1])
+        expired &= self.groups.keys()
+        if expired:
+            self._recompute(list(expired))
+
+    def apply_event(self, event):
+        """Apply one webhook event; returns the recomputed group names"""
+        data = event.get('data') or {}
+        product_id = data.get('id')
+        with self.lock:
+            self.stats['events'] += 1
+            self.stats['last_event_at'] = time.time()
+            if event.get('type') not in PRODUCT_EVENTS or not product_id:
+                self.stats['ignored'] += 1
+                return []
+
+            old = self.products.get(product_id)
+            record = CatalogProduct.from_dict(data)
+            # Webhooks can arrive out of order; never replace a newer version
+            if old is not None and record.modified_epoch < old.modified_epoch:
+                self.stats['stale'] += 1
+                return []
+
+            affected = []
+            if old is not None and (data.get('is_archived') or old.name != record.name):
+                del self.products[product_id]
+                del self.groups[old.name][product_id]
+                affected.append(old.name)
+            if not data.get('is_archived'):
+                # An update within the same group keeps the product's position
+                self.products[product_id] = record
+                self.groups.setdefault(record.name, {})[product_id] = None
+                if record.name not in affected:
+                    affected.append(record.name)
+            self._recompute(affected)
+            return affected
+
+    def report_bytes(self):
+        with self.lock:
+            self._refresh_expired()
+            if self.report is None:
+                self.report = b''.join(self.fragments.values())
+            return self.report
+
+    def group_bytes(self, name):
+        with self.lock:
+            self._refresh_expired()
+            return self.fragments.get(name)
+
+    def summary(self):
+        with self.lock:
+            self._refresh_expired()
+            return dict(
+                self.stats,
+                products=len(self.products),
+                groups=len(self.groups),
+                **self.counts,
+            )
+
+
+def verify_signature(payload, signature, secret):
+    """Check an X-Polar-Signature header (sha256=<hex HMAC of the body>)"""
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), payload, hashlib.sha256).hexdigest()
+    return hmac.compare_digest((signature or '').encode('utf-8'), expected.encode('utf-8'))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+    state = None
+    secret = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload).encode('utf-8'))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/recommendations':
+            self.send_body(200, self.state.report_bytes(), 'application/x-ndjson')
+        elif path.startswith('/recommendations/'):
+            body = self.state.group_bytes(unquote(path[len('/recommendations/'):]))
+            if body is None:
+                self.send_json(404, {'error': 'Unknown product name'})
+            else:
+                self.send_body(200, body, 'application/x-ndjson')
+        elif path == '/summary':
+            self.send_json(200, self.state.summary())
+        elif path == '/health':
+            self.send_json(200, {'ok': True})
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/webhooks/polar':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_EVENT_BYTES:
+            self.send_json(413, {'error': 'Event too large'})
+            return
+        payload = self.rfile.read(length)
+        if self.secret and not verify_signature(payload, self.headers.get('X-Polar-Signature'), self.secret):
+            self.send_json(401, {'error': 'Invalid signature'})
+            return
+        try:
+            event = json.loads(payload)
+            recomputed = self.state.apply_event(event)
+        except (ValueError, AttributeError, TypeError) as e:
+            self.send_json(400, {'error': 'Invalid event', 'message': str(e)})
+            return
+        self.send_json(200, {'received': True, 'recomputed': recomputed})
+
+
+def serve(state, host='127.0.0.1', port=DEFAULT_PORT, secret=None):
+    """Start the service; returns the ThreadingHTTPServer (call shutdown())"""
+    handler = type('AnalysisHandler', (Handler,), {'state': state, 'secret': secret})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='analysis-daemon', daemon=True)
+    thread.start()
+    return server
+
+
+def load_records(args):
+    """CatalogProduct records from a snapshot, a dump or the Polar API"""
+    if args.fetch:
+        try:
+            from polar_fetch import POLAR_API_URL, iter_polar_products, mask_token
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+
+        token = os.environ.get('POLAR_API_TOKEN')
+        if not token:
+            print("❌ Error: Missing required environment variables: POLAR_API_TOKEN")
+            sys.exit(1)
+        print(f"🔑 POLAR_API_TOKEN: {mask_token(token)}")
+        items = iter_polar_products(token, os.environ.get('POLAR_ORG_ID'), api_url=args.api_url or POLAR_API_URL)
+    elif is_snapshot(args.products):
+        with CatalogSnapshot(args.products) as snapshot:
+            return snapshot.records()
+    else:
+        items = iter_catalog_items(args.products, args.format)
+
+    records = []
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= LOAD_BATCH_SIZE:
+            records.extend(parse_products(batch))
+            batch.clear()
+    records.extend(parse_products(batch))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve duplicate analysis kept up to date by Polar webhooks.')
+    parser.add_argument('products', nargs='?', help='products JSON/NDJSON dump or polar_snapshot.py snapshot')
+    parser.add_argument('--format', choices=['auto', 'json', 'ndjson'], default='auto')
+    parser.add_argument('--fetch', action='store_true', help='load the catalog from the Polar API instead')
+    parser.add_argument('--api-url', default=os.environ.get('POLAR_API_URL'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    if bool(args.fetch) == bool(args.products):
+        parser.error('pass a products file or --fetch')
+
+    start = time.perf_counter()
+    state = CatalogState()
+    state.load(load_records(args))
+    summary = state.summary()
+    print(f"📊 Loaded {summary['products']:,} products in {summary['groups']:,} name groups "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    secret = os.environ.get('POLAR_WEBHOOK_SECRET')
+    if not secret:
+        print("⚠️  POLAR_WEBHOOK_SECRET not set, skipping signature verification")
+    server = serve(state, args.host, args.port, secret)
+    print(f"🚀 Listening on http://{args.host}:{server.server_port} (POST /webhooks/polar, GET /recommendations)")
+    print("   Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        summary = state.summary()
+        print(f"\n   Events: {summary['events']}, groups recomputed: {summary['groups_recomputed']}")
+
+
+if __name__ == '__main__':
+    main()
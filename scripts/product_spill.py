@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Disk-backed grouping of catalog products by name.
+
+For catalogs that do not fit in memory (e.g. merged historical exports from
+every library), the Polar scripts spill products to a temporary SQLite table
+instead of collecting them in a dict, then read them back one name group at
+a time. Only the current group and SQLite's page cache are held in memory.
+
+    with ProductSpill() as spill:
+        for product in iter_catalog_items('products.ndjson'):
+            spill.add(product.get('name'), product)
+        for name, products in spill.groups():
+            ...
+
+Values are stored as JSON, so anything json.dumps accepts can be spilled.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from itertools import groupby
+
+# Rows inserted per executemany call
+SPILL_BATCH_SIZE = 10000
+# SQLite page cache per spill, in KB
+SPILL_CACHE_KB = 64 * 1024
+
+
+class ProductSpill:
+    """Temporary SQLite table of (name, value) rows, read back grouped by name"""
+
+    def __init__(self, directory=None, cache_kb=SPILL_CACHE_KB):
+        fd, self.path = tempfile.mkstemp(prefix='product-spill-', suffix='.db', dir=directory)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        # Scratch data: no journal, no fsync, sorts spill to files too
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA temp_store = FILE')
+        self.conn.execute(f'PRAGMA cache_size = -{int(cache_kb)}')
+        self.conn.execute('CREATE TABLE products (seq INTEGER PRIMARY KEY, name TEXT, value TEXT NOT NULL)')
+        self.count = 0
+        self._batch = []
+        self._indexed = False
+
+    def add(self, name, value):
+        """Spill one value under a group name (None is a group of its own)"""
+        self._batch.append((self.count, name, json.dumps(value, separators=(',', ':'))))
+        self.count += 1
+        if len(self._batch) >= SPILL_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._batch:
+            self.conn.executemany('INSERT INTO products VALUES (?, ?, ?)', self._batch)
+            self._batch.clear()
+            self._indexed = False
+
+    def _ready(self):
+        self._flush()
+        if not self._indexed:
+            # Built once after loading, which is much faster than maintaining it per insert
+            self.conn.execute('CREATE INDEX IF NOT EXISTS products_name ON products (name, seq)')
+            self._indexed = True
+
+    def __len__(self):
+        return self.count
+
+    def group_count(self):
+        """Number of distinct names"""
+        self._ready()
+        return self.conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM products GROUP BY name)').fetchone()[0]
+
+    def first_seen(self):
+        """Yield (name, first value) per name, in order of first appearance"""
+        self._ready()
+        cursor = self.conn.execute(
+            'SELECT name, value FROM products WHERE seq IN (SELECT MIN(seq) FROM products GROUP BY name) ORDER BY seq'
+        )
+        for name, value in cursor:
+            yield name, json.loads(value)
+
+    def group(self, name):
+        """All values spilled under name, in insertion order"""
+        self._ready()
+        cursor = self.conn.execute('SELECT value FROM products WHERE name IS ? ORDER BY seq', (name,))
+        return [json.loads(value) for value, in cursor]
+
+    def groups(self, order='first_seen'):
+        """Yield (name, values) one group at a time
+
+        order='first_seen' yields groups in order of first appearance (like
+        a dict filled while reading); order='name' yields them sorted by
+        name, which matches Python's str ordering.
+        """
+        self._ready()
+        if order == 'name':
+            cursor = self.conn.execute('SELECT name, value FROM products ORDER BY name, seq')
+            for name, rows in groupby(cursor, key=lambda row: row[0]):
+                yield name, [json.loads(value) for _, value in rows]
+            return
+        names = self.conn.execute('SELECT name, MIN(seq) AS first FROM products GROUP BY name ORDER BY first')
+        for name, _ in names:
+            yield name, self.group(name)
+
+    def close(self):
+        self.conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Machine-readable output backends for analyze-product-duplicates.py.
+
+Each writer receives recommendations one name group at a time, as soon as the
+group has been decided, and writes them straight out instead of collecting
+and sorting the whole report first. Every recommendation becomes one row:
+
+    action          keep | consolidate | archive
+    name            product name (the group name for keep/consolidate)
+    product_id      product to keep, or to archive
+    score           completeness score (keep/consolidate)
+    price           formatted first price (keep/archive)
+    reasons         scoring reasons
+    current_prices  active prices of the kept product (consolidate)
+    prices_to_add   prices to add to the kept product (consolidate)
+    archive_ids     variants to archive after consolidating (consolidate)
+    similar_names   names merged into the group by --similar
+
+analyze-libraries.py adds LIBRARY_COLUMNS in front of these (the library a
+row comes from, and the other libraries that have a product with the same
+name slug).
+
+Formats: ndjson (one JSON object per line), csv (list columns joined with
+"|") and parquet (columnar, needs pyarrow; opening a parquet writer without
+it raises ImportError with the install hint).
+
+    from recommendation_writers import open_writer
+    with open_writer('ndjson', sys.stdout) as writer:
+        analyze_products(products_data, writer=writer)
+"""
+
+import csv
+import json
+
+from polar_catalog import format_price
+
+COLUMNS = (
+    'action',
+    'name',
+    'product_id',
+    'score',
+    'price',
+    'reasons',
+    'current_prices',
+    'prices_to_add',
+    'archive_ids',
+    'similar_names',
+)
+LIBRARY_COLUMNS = ('library', 'also_in')
+LIST_COLUMNS = ('reasons', 'current_prices', 'prices_to_add', 'archive_ids', 'similar_names', 'also_in')
+CSV_LIST_SEPARATOR = '|'
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+def recommendation_rows(recommendations):
+    """Flatten one group's keep/consolidate/archive lists into output rows"""
+    for item in recommendations['keep']:
+        yield {
+            'action': 'keep',
+            'name': item['name'],
+            'product_id': item['product'].id,
+            'score': item['score'],
+            'price': format_price(item['price']),
+            'reasons': item['reasons'],
+            'current_prices': [],
+            'prices_to_add': [],
+            'archive_ids': [],
+            'similar_names': item.get('similar_names', []),
+        }
+    for item in recommendations['consolidate']:
+        yield {
+            'action': 'consolidate',
+            'name': item['name'],
+            'product_id': item['keep'].id,
+            'score': item['keep_score'],
+            'price': None,
+            'reasons': item['keep_reasons'],
+            'current_prices': [format_price(p) for p in item['current_prices']],
+            'prices_to_add': [format_price(p) for p in item['all_prices'] if p not in item['current_prices']],
+            'archive_ids': [p.id for p in item['archive']],
+            'similar_names': item.get('similar_names', []),
+        }
+    for product in recommendations['archive']:
+        yield {
+            'action': 'archive',
+            'name': product.name,
+            'product_id': product.id,
+            'score': None,
+            'price': format_price(product.first_price),
+            'reasons': [],
+            'current_prices': [],
+            'prices_to_add': [],
+            'archive_ids': [],
+            'similar_names': [],
+        }
+
+
+class RecommendationWriter:
+    """Base class: counts recommendations and hands rows to write_row"""
+
+    def __init__(self, out, columns=COLUMNS):
+        self.out = out
+        self.columns = columns
+        self.counts = {'keep': 0, 'consolidate': 0, 'archive': 0}
+
+    def write_recommendations(self, recommendations, annotate=None):
+        """Write one group's recommendations and empty its lists
+
+        annotate(row), if given, fills in any extra columns of each row.
+        """
+        for row in recommendation_rows(recommendations):
+            if annotate is not None:
+                annotate(row)
+            self.write_row(row)
+        for key, items in recommendations.items():
+            self.counts[key] += len(items)
+            items.clear()
+
+    def write_row(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        self.out.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONWriter(RecommendationWriter):
+    def write_row(self, row):
+        self.out.write(json.dumps(row, ensure_ascii=False))
+        self.out.write('\n')
+
+
+class CSVWriter(RecommendationWriter):
+    def __init__(self, out, columns=COLUMNS):
+        super().__init__(out, columns)
+        self.list_columns = [column for column in columns if column in LIST_COLUMNS]
+        self.writer = csv.writer(out)
+        self.writer.writerow(columns)
+
+    def write_row(self, row):
+        for column in self.list_columns:
+            row[column] = CSV_LIST_SEPARATOR.join(row[column])
+        self.writer.writerow([row[column] for column in self.columns])
+
+
+class ParquetWriter(RecommendationWriter):
+    """Columnar output; rows are flushed as one row group per PARQUET_ROW_GROUP_SIZE"""
+
+    def __init__(self, out, columns=COLUMNS, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("pyarrow is not installed. Install it with: pip3 install pyarrow") from e
+        super().__init__(out, columns)
+        self.pa = pa
+        self.row_group_size = row_group_size
+        strings = pa.list_(pa.string())
+        types = {
+            'library': pa.dictionary(pa.int8(), pa.string()),
+            'action': pa.dictionary(pa.int8(), pa.string()),
+            'name': pa.string(),
+            'product_id': pa.string(),
+            'score': pa.int16(),
+            'price': pa.string(),
+        }
+        self.schema = pa.schema([(column, types.get(column, strings)) for column in columns])
+        self.writer = pq.ParquetWriter(out, self.schema, compression='zstd')
+        self.buffers = {column: [] for column in columns}
+
+    def write_row(self, row):
+        for column, values in self.buffers.items():
+            values.append(row[column])
+        if len(self.buffers['action']) >= self.row_group_size:
+            self.flush_rows()
+
+    def flush_rows(self):
+        if not self.buffers['action']:
+            return
+        self.writer.write_table(self.pa.Table.from_pydict(self.buffers, schema=self.schema))
+        for values in self.buffers.values():
+            values.clear()
+
+    def close(self):
+        self.flush_rows()
+        self.writer.close()
+
+
+WRITERS = {
+    'ndjson': NDJSONWriter,
+    'csv': CSVWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def open_writer(fmt, out, columns=COLUMNS):
+    """Writer for fmt ('ndjson', 'csv' or 'parquet') on an open file
+
+    Parquet needs a binary file; the other formats a text file. columns sets
+    the CSV/Parquet columns (NDJSON writes every field of a row).
+    """
+    return WRITERS[fmt](out, columns)
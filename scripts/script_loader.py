@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Import helpers for the hyphenated Python scripts in this directory.
+
+Scripts such as analyze-product-duplicates.py cannot be imported with a plain
+import statement. load_script() loads one by file name and registers it in
+sys.modules so its functions can be pickled for process pools.
+
+    from script_loader import load_script
+    analyzer = load_script('analyze-product-duplicates.py')
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+def load_script(filename):
+    """Import a script from the scripts directory by file name (cached)"""
+    module_name = Path(filename).stem.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    path = SCRIPTS_DIR / filename
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
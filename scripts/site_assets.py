@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Integrity check for the static site trees (website/ by default).
+
+utils/verify-visitor-font.py checks the header of one font and looks for a
+few strings in index.html and styles.css. This checks every file of a site:
+
+- every file is hashed (sha256, read through mmap on a thread pool) and
+  checked against the format its extension promises: magic bytes for
+  images, fonts, GLB models, KTX2 textures and media, and the declared
+  length of GLB/WOFF/WOFF2 files, so truncated uploads are caught
+- references are collected from HTML (src, href, srcset, poster, inline
+  styles and scripts), CSS (url(), @import), JS string literals that name
+  an asset by path, and glTF/GLB buffer and image URIs. Local references
+  must resolve to a file of the site, case-sensitively as on the deploy
+  host (/page also matches page.html, and dir/ matches dir/index.html)
+- assets (images, fonts, models, media) that nothing references are
+  reported as unused; --ignore silences paths that are only built at
+  runtime (e.g. 'assets/icon_*.png')
+
+Results go into a manifest per site (--manifest, default
+.cache/site-assets/<site>.json) with the size, mtime, sha256, problems and
+references of every file, plus the dangling references and unused assets.
+A rerun stats every file but only re-reads the ones whose size or mtime
+changed, so checking an unchanged site takes milliseconds.
+
+Usage:
+    python3 scripts/site_assets.py
+    python3 scripts/site_assets.py website solvet-whitepaper-site/website
+    python3 scripts/site_assets.py --ignore 'assets/icon_*' --strict
+    python3 scripts/site_assets.py --force --workers 8
+
+Exits 1 on invalid files or dangling references (with --strict, also on
+unused assets).
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import posixpath
+import re
+import struct
+import sys
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+
+from library_catalog import RACY_WINDOW_NS, REPO_DIR, save_json
+
+DEFAULT_SITES = ['website']
+DEFAULT_MANIFEST_DIR = REPO_DIR / '.cache' / 'site-assets'
+MANIFEST_VERSION = 1
+SKIP_DIRS = {'node_modules', '__pycache__'}
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico')
+FONT_EXTENSIONS = ('.woff2', '.woff', '.ttf', '.otf')
+MODEL_EXTENSIONS = ('.glb', '.gltf', '.bin', '.ktx2')
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mp3', '.ogg', '.wav')
+ASSET_EXTENSIONS = IMAGE_EXTENSIONS + FONT_EXTENSIONS + MODEL_EXTENSIONS + MEDIA_EXTENSIONS
+TEXT_EXTENSIONS = ('.html', '.htm', '.css', '.js', '.mjs', '.svg', '.gltf', '.json')
+# Requested by browsers without a reference, never reported as unused
+IMPLICIT_FILES = {'favicon.ico', 'apple-touch-icon.png'}
+
+# extension: alternatives, each a tuple of (offset, bytes) that must all match
+SIGNATURES = {
+    '.png': [((0, b'\x89PNG\r\n\x1a\n'),)],
+    '.jpg': [((0, b'\xff\xd8\xff'),)],
+    '.jpeg': [((0, b'\xff\xd8\xff'),)],
+    '.gif': [((0, b'GIF87a'),), ((0, b'GIF89a'),)],
+    '.webp': [((0, b'RIFF'), (8, b'WEBP'))],
+    '.avif': [((4, b'ftypavif'),), ((4, b'ftypavis'),)],
+    # Browsers also accept a PNG saved as .ico
+    '.ico': [((0, b'\x00\x00\x01\x00'),), ((0, b'\x89PNG\r\n\x1a\n'),)],
+    '.woff2': [((0, b'wOF2'),)],
+    '.woff': [((0, b'wOFF'),)],
+    '.ttf': [((0, b'\x00\x01\x00\x00'),), ((0, b'true'),)],
+    '.otf': [((0, b'OTTO'),), ((0, b'\x00\x01\x00\x00'),)],
+    '.glb': [((0, b'glTF'),)],
+    '.ktx2': [((0, b'\xabKTX 20\xbb\r\n\x1a\n'),)],
+    '.mp4': [((4, b'ftyp'),)],
+    '.webm': [((0, b'\x1a\x45\xdf\xa3'),)],
+    '.mp3': [((0, b'ID3'),), ((0, b'\xff\xfb'),), ((0, b'\xff\xf3'),), ((0, b'\xff\xf2'),)],
+    '.ogg': [((0, b'OggS'),)],
+    '.wav': [((0, b'RIFF'), (8, b'WAVE'))],
+}
+# extension: (offset, struct format) of the total file length in the header
+LENGTH_FIELDS = {
+    '.glb': (8, '<I'),
+    '.woff': (8, '>I'),
+    '.woff2': (8, '>I'),
+}
+
+URL_ATTRIBUTES = {'src', 'href', 'poster', 'data'}
+SRCSET_ATTRIBUTES = {'srcset', 'imagesrcset'}
+CSS_REFERENCE = re.compile(
+    r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]*))\s*\)|@import\s+(?:"([^"]*)"|'([^']*)')''',
+    re.IGNORECASE)
+# Quoted paths with a directory part and an asset extension; template
+# literals with ${...} are built at runtime and cannot be checked
+JS_REFERENCE = re.compile(
+    r'''(['"`])([^'"`\s<>(){}$]*/[^'"`\s<>(){}$]*\.(?:%s))\1'''
+    % '|'.join(ext[1:] for ext in ASSET_EXTENSIONS),
+    re.IGNORECASE)
+
+
+def _with_lines(text, matches):
+    """(reference, line) for (position, reference) pairs in text order"""
+    line, last = 1, 0
+    for position, reference in matches:
+        line += text.count('\n', last, position)
+        last = position
+        yield reference, line
+
+
+def css_references(text):
+    return _with_lines(text, (
+        (match.start(), next(group for group in match.groups() if group is not None))
+        for match in CSS_REFERENCE.finditer(text)
+    ))
+
+
+def js_references(text):
+    return _with_lines(text, ((match.start(2), match.group(2)) for match in JS_REFERENCE.finditer(text)))
+
+
+class ReferenceParser(HTMLParser):
+    """Collects [reference, line] pairs from an HTML document"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs = []
+        self._raw_tag = None
+
+    def handle_starttag(self, tag, attrs):
+        line = self.getpos()[0]
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in URL_ATTRIBUTES:
+                self.refs.append([value.strip(), line])
+            elif name in SRCSET_ATTRIBUTES:
+                for candidate in value.split(','):
+                    if candidate.strip():
+                        self.refs.append([candidate.split()[0], line])
+            elif name == 'style':
+                self.refs.extend([ref, line + offset - 1] for ref, offset in css_references(value))
+        if tag in ('script', 'style'):
+            self._raw_tag = tag
+
+    def handle_endtag(self, tag):
+        if tag == self._raw_tag:
+            self._raw_tag = None
+
+    def handle_data(self, data):
+        if self._raw_tag is None:
+            return
+        scan = css_references if self._raw_tag == 'style' else js_references
+        line = self.getpos()[0]
+        self.refs.extend([ref, line + offset - 1] for ref, offset in scan(data))
+
+
+def gltf_references(document):
+    """buffer and image URIs of a glTF JSON document"""
+    return [
+        [item['uri'], 1]
+        for key in ('buffers', 'images')
+        for item in document.get(key, [])
+        if isinstance(item, dict) and isinstance(item.get('uri'), str)
+    ]
+
+
+def format_problems(ext, data, size):
+    """Problems with a file's header for its extension (data is the mapped file)"""
+    alternatives = SIGNATURES.get(ext)
+    if alternatives and not any(
+        all(data[offset:offset + len(magic)] == magic for offset, magic in alternative)
+        for alternative in alternatives
+    ):
+        return [f'not a valid {ext[1:].upper()} file (header {bytes(data[:8])!r})']
+    if ext in LENGTH_FIELDS:
+        offset, fmt = LENGTH_FIELDS[ext]
+        if size < offset + struct.calcsize(fmt):
+            return ['truncated header']
+        declared = struct.unpack_from(fmt, data, offset)[0]
+        if declared != size:
+            return [f'declared length {declared:,} bytes, file is {size:,} bytes (truncated or padded)']
+    return []
+
+
+def glb_json(data, size):
+    """The JSON chunk of a GLB file, or raise ValueError"""
+    if size < 20:
+        raise ValueError('truncated header')
+    chunk_length, chunk_type = struct.unpack_from('<II', data, 12)
+    if chunk_type != 0x4E4F534A or 20 + chunk_length > size:
+        raise ValueError('first chunk is not a complete JSON chunk')
+    return json.loads(bytes(data[20:20 + chunk_length]))
+
+
+def check_file(job):
+    """Hash and check one file (runs on a thread)
+
+    job is (absolute path, site path, size, mtime_ns). Returns the manifest
+    entry: {size, mtime_ns, sha256[, problems][, refs]}, where refs are the
+    local references as [reference, line].
+    """
+    path, site_path, size, mtime_ns = job
+    ext = os.path.splitext(site_path)[1].lower()
+    entry = {'size': size, 'mtime_ns': mtime_ns}
+    problems, refs = [], []
+    try:
+        with open(path, 'rb') as f:
+            if size == 0:
+                data = b''
+                entry['sha256'] = hashlib.sha256().hexdigest()
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if size:
+                    # hashlib releases the GIL on large buffers, so threads hash in parallel
+                    entry['sha256'] = hashlib.sha256(data).hexdigest()
+                if size == 0 and ext in ASSET_EXTENSIONS:
+                    problems.append('empty file')
+                elif ext in SIGNATURES or ext in LENGTH_FIELDS:
+                    problems.extend(format_problems(ext, data, size))
+                if ext == '.glb' and not problems:
+                    refs = gltf_references(glb_json(data, size))
+                elif ext in TEXT_EXTENSIONS:
+                    text = bytes(data).decode('utf-8')
+                    if ext in ('.html', '.htm'):
+                        parser = ReferenceParser()
+                        parser.feed(text)
+                        parser.close()
+                        refs = parser.refs
+                    elif ext == '.css':
+                        refs = [list(ref) for ref in css_references(text)]
+                    elif ext in ('.js', '.mjs'):
+                        refs = [list(ref) for ref in js_references(text)]
+                    elif ext == '.svg' and '<svg' not in text[:4096]:
+                        problems.append('no <svg> element at the start')
+                    elif ext == '.gltf':
+                        refs = gltf_references(json.loads(text))
+                    elif ext == '.json':
+                        json.loads(text)
+            finally:
+                if size:
+                    data.close()
+    except UnicodeDecodeError:
+        problems.append('not valid UTF-8')
+    except (ValueError, struct.error) as e:
+        problems.append(f'invalid {ext[1:].upper()}: {e}')
+    except OSError as e:
+        problems.append(f'unreadable: {e.strerror or e}')
+    if problems:
+        entry['problems'] = problems
+    refs = [ref for ref in refs if is_local(ref[0])]
+    if refs:
+        entry['refs'] = refs
+    return entry
+
+
+def scan_site(root):
+    """{site path: (size, mtime_ns)} of every file in a site tree"""
+    files = {}
+    stack = [(str(root), '')]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name in SKIP_DIRS:
+                    continue
+                if entry.is_dir():
+                    stack.append((entry.path, f'{prefix}{entry.name}/'))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[prefix + entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def is_local(reference):
+    """Whether a reference points into the site (not a URL with a scheme, a fragment or a template)"""
+    if not reference or reference.startswith(('#', '//', '?')) or '{{' in reference or '${' in reference:
+        return False
+    return not urllib.parse.urlsplit(reference).scheme
+
+
+def resolve_reference(reference, source, files):
+    """Site path a local reference from source points to, or None when nothing matches"""
+    path = urllib.parse.unquote(urllib.parse.urlsplit(reference).path)
+    base = '' if path.startswith('/') else posixpath.dirname(source)
+    target = posixpath.normpath(posixpath.join(base, path.lstrip('/')))
+    if target == '.' or path.endswith('/'):
+        candidates = [posixpath.join('' if target == '.' else target, 'index.html')]
+    else:
+        candidates = [target, f'{target}.html', f'{target}/index.html']
+    return next((candidate for candidate in candidates if candidate in files), None)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def check_site(root, manifest_path, workers=None, force=False, ignore=()):
+    """Check a site tree and write its manifest
+
+    Returns the manifest and the number of files read. Files whose size and
+    mtime match the previous manifest (and were not modified within
+    RACY_WINDOW_NS of its scan) keep their entry without being read.
+    """
+    scan_started_ns = time.time_ns()
+    previous = None if force else load_manifest(manifest_path)
+    previous_files = previous['files'] if previous else {}
+    racy_after = (previous or {}).get('scanned_ns', 0) - RACY_WINDOW_NS
+
+    files = scan_site(root)
+    entries, jobs = {}, []
+    for site_path, (size, mtime_ns) in files.items():
+        entry = previous_files.get(site_path)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns and mtime_ns < racy_after:
+            entries[site_path] = entry
+        else:
+            jobs.append((os.path.join(root, site_path), site_path, size, mtime_ns))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        # Imported here: startup (and single-worker runs) do not pay for it
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for job, entry in zip(jobs, pool.map(check_file, jobs)):
+                entries[job[1]] = entry
+    else:
+        for job in jobs:
+            entries[job[1]] = check_file(job)
+
+    lowercase = {site_path.lower(): site_path for site_path in files}
+    used, dangling = set(), []
+    for source in sorted(entries):
+        for reference, line in entries[source].get('refs', ()):
+            target = resolve_reference(reference, source, files)
+            if target is not None:
+                used.add(target)
+                continue
+            if any(fnmatch.fnmatch(reference, pattern) for pattern in ignore):
+                continue
+            problem = {'source': source, 'line': line, 'reference': reference}
+            guess = resolve_reference(reference.lower(), source.lower(), lowercase)
+            if guess is not None:
+                problem['hint'] = f'{lowercase[guess]} differs only in case'
+            dangling.append(problem)
+    unused = [
+        site_path for site_path in sorted(files)
+        if site_path.lower().endswith(ASSET_EXTENSIONS) and site_path not in used
+        and site_path not in IMPLICIT_FILES
+        and not any(fnmatch.fnmatch(site_path, pattern) for pattern in ignore)
+    ]
+
+    if (previous and not jobs and previous_files.keys() == entries.keys()
+            and previous['dangling'] == dangling and previous['unused'] == unused):
+        # Nothing changed: leave the manifest (and its scan time) as it is
+        return previous, 0
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'site': str(root),
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+        'scanned_ns': scan_started_ns,
+        'files': {site_path: entries[site_path] for site_path in sorted(entries)},
+        'dangling': dangling,
+        'unused': unused,
+    }
+    save_json(manifest_path, manifest)
+    return manifest, len(jobs)
+
+
+def manifest_name(root):
+    """Manifest file name for a site: its path in the repo, e.g. website.json"""
+    try:
+        name = root.relative_to(REPO_DIR).as_posix()
+    except ValueError:
+        name = root.name
+    return name.replace('/', '-') + '.json'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the files and references of the static site trees.')
+    parser.add_argument('sites', nargs='*', default=DEFAULT_SITES,
+                        help=f"site directories (default: {', '.join(DEFAULT_SITES)})")
+    parser.add_argument('--manifest', metavar='PATH', help='manifest file (one site only)')
+    parser.add_argument('--manifest-dir', default=str(DEFAULT_MANIFEST_DIR), metavar='DIR',
+                        help='directory for the per-site manifests (default: .cache/site-assets)')
+    parser.add_argument('--ignore', action='append', default=[], metavar='GLOB',
+                        help='site paths/references not reported as dangling or unused (repeatable)')
+    parser.add_argument('--strict', action='store_true', help='also exit 1 when assets are unused')
+    parser.add_argument('--workers', type=int, metavar='N', help='hashing threads (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='re-read every file, ignoring the manifest')
+    args = parser.parse_args()
+    if args.manifest and len(args.sites) > 1:
+        parser.error('--manifest needs a single site')
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    start = time.perf_counter()
+    totals = {'files': 0, 'invalid': 0, 'dangling': 0, 'unused': 0}
+    for site in args.sites:
+        root = Path(site).resolve()
+        if not root.is_dir():
+            print(f"❌ Error: {site} is not a directory")
+            sys.exit(1)
+        manifest_path = args.manifest or os.path.join(args.manifest_dir, manifest_name(root))
+        site_start = time.perf_counter()
+        manifest, checked = check_site(root, manifest_path, args.workers, args.force, args.ignore)
+        files = manifest['files']
+        print(f"🔍 {site}: {len(files)} files, {checked} checked ({time.perf_counter() - site_start:.2f}s)")
+        for site_path, entry in files.items():
+            for problem in entry.get('problems', ()):
+                print(f"   ✗ {site_path}: {problem}")
+        for problem in manifest['dangling']:
+            hint = f" ({problem['hint']})" if 'hint' in problem else ''
+            print(f"   ✗ {problem['source']}:{problem['line']} → {problem['reference']} not found{hint}")
+        for site_path in manifest['unused']:
+            print(f"   ⚠️  unused: {site_path} ({files[site_path]['size'] / 1024:.1f} KB)")
+        totals['files'] += len(files)
+        totals['invalid'] += sum(1 for entry in files.values() if entry.get('problems'))
+        totals['dangling'] += len(manifest['dangling'])
+        totals['unused'] += len(manifest['unused'])
+
+    print(f"\n✓ {totals['files']} files, ✗ {totals['invalid']} invalid, ✗ {totals['dangling']} dangling references, "
+          f"⚠️  {totals['unused']} unused assets ({time.perf_counter() - start:.2f}s)")
+    if totals['invalid'] or totals['dangling'] or (args.strict and totals['unused']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+One entry point for the Python tooling.
+
+Every command is one of the existing scripts, run as if it had been started
+directly: same options, output and exit code (`solvet.py analyze ...` is
+`analyze-product-duplicates.py ...`). Nothing is imported up front: a
+command's script, and whatever it imports (NumPy, fontTools, Playwright),
+are loaded only when that command runs, so the analysis commands never pay
+for the font or browser tooling. Scripts run from cached bytecode in
+__pycache__, which `python3 script.py` does not use for the script itself.
+
+`import-times` keeps it that way: it starts every command (`<command>
+--help`) in a fresh interpreter, reports the startup time and the slowest
+imports, and exits 1 when a command is over its startup budget.
+
+Usage:
+    python3 scripts/solvet.py                     # list the commands
+    python3 scripts/solvet.py analyze polar_products.json --workers 4
+    python3 scripts/solvet.py fonts --batch website/fonts
+    python3 scripts/solvet.py import-times
+    python3 scripts/solvet.py import-times analyze format --top 10 --json startup.json
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (script relative to the repository, startup budget in ms or None, summary)
+COMMANDS = {
+    'analyze': ('scripts/analyze-product-duplicates.py', 100, 'recommend how to consolidate duplicate Polar products'),
+    'format': ('scripts/format-polar-products.py', 100, 'print a Polar products list as a summary table'),
+    'libraries': ('scripts/analyze-libraries.py', 100, 'duplicate analysis for every product library'),
+    'catalog': ('scripts/library_catalog.py', 100, "build the libraries' content-addressed catalog.json"),
+    'bundles': ('scripts/library_bundles.py', None, 'package the libraries into download bundles'),
+    'images': ('scripts/image_index.py', None, 'perceptual-hash index of product renders and media'),
+    'renders': ('scripts/optimize-renders.py', None, 'build web-ready variants of the renders'),
+    'bench': ('scripts/benchmark-product-analysis.py', None, 'benchmark the product analysis scripts'),
+    'fonts': ('scripts/utils/convert-visitor-to-woff2.py', None, 'convert (and subset) fonts to WOFF2'),
+    'verify': ('scripts/site_assets.py', 100, "check the site's files, references and unused assets"),
+    'inspect': ('tests/inspect-glb.py', None, 'check GLB/glTF models against performance budgets'),
+    'viewer': ('tests/viewer-benchmark.py', None, 'benchmark the 3D viewer pages in headless Chromium'),
+}
+IMPORT_TIMES_TOP = 5
+
+
+def usage(out=sys.stdout):
+    width = len('import-times') + 2
+    lines = ['usage: solvet.py <command> [options]', '', 'commands:']
+    lines += [f'  {name:<{width}}{summary}' for name, (_, _, summary) in COMMANDS.items()]
+    lines += [f"  {'import-times':<{width}}measure each command's startup and slowest imports",
+              '', 'Run `solvet.py <command> --help` for the options of a command.']
+    out.write('\n'.join(lines) + '\n')
+
+
+def run_script(path, argv):
+    """Run a script as __main__, the way `python3 path argv...` would, from cached bytecode"""
+    import importlib.util
+
+    sys.argv = [path] + argv
+    sys.path[0] = os.path.dirname(path)
+    spec = importlib.util.spec_from_file_location('__main__', path)
+    module = importlib.util.module_from_spec(spec)
+    # As for a script started directly: spawned worker processes then re-run
+    # it by path (as __mp_main__) instead of looking it up by module name
+    module.__spec__ = None
+    sys.modules['__main__'] = module
+    spec.loader.exec_module(module)
+
+
+def parse_importtime(stderr, baseline=()):
+    """Top-level imports from `python -X importtime` output: [(module, cumulative_us)]"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; their time is in their parent's cumulative
+        if not name.startswith('  ') and name.strip() not in baseline:
+            imports.append((name.strip(), int(cumulative)))
+    return sorted(imports, key=lambda item: -item[1])
+
+
+def measure_startup(name, repeat):
+    """Fastest wall time of `solvet.py name --help` in ms, its exit code and its imports"""
+    import subprocess
+    import time
+
+    command = [sys.executable, os.path.abspath(__file__), name, '--help']
+    # The first run compiles the bytecode caches; it is not timed
+    subprocess.run(command, capture_output=True)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    traced = subprocess.run(command[:1] + ['-X', 'importtime'] + command[1:], capture_output=True, text=True)
+    return best, result.returncode, traced.stderr
+
+
+def import_times(argv):
+    import argparse
+    import json
+    import subprocess
+
+    parser = argparse.ArgumentParser(
+        prog='solvet.py import-times',
+        description="Measure each command's startup (`<command> --help` in a fresh interpreter) and slowest imports.")
+    parser.add_argument('commands', nargs='*', help='commands to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='startups per command; the fastest is kept (default: 5)')
+    parser.add_argument('--top', type=int, default=IMPORT_TIMES_TOP,
+                        help=f'slowest imports listed per command (default: {IMPORT_TIMES_TOP})')
+    parser.add_argument('--json', metavar='PATH', help='also write the measurements as JSON')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.commands if name not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command {', '.join(unknown)} (choose from {', '.join(COMMANDS)})")
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+
+    # Modules every interpreter imports before running anything are not the command's
+    baseline = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                              capture_output=True, text=True).stderr
+    baseline = {name for name, _ in parse_importtime(baseline)}
+
+    print(f"⏱️  Startup of `solvet.py <command> --help` (fastest of {args.repeat}):\n")
+    report, over = {}, []
+    for name in args.commands or COMMANDS:
+        budget = COMMANDS[name][1]
+        elapsed, returncode, stderr = measure_startup(name, args.repeat)
+        imports = parse_importtime(stderr, baseline)
+        report[name] = {'startup_ms': round(elapsed, 1), 'budget_ms': budget, 'exit_code': returncode,
+                        'imports_ms': {module: round(us / 1000, 1) for module, us in imports}}
+        if budget is not None and elapsed > budget:
+            status = f'⚠️  over the {budget} ms budget'
+            over.append(name)
+        elif budget is not None:
+            status = f'✓ within the {budget} ms budget'
+        else:
+            status = ''
+        if returncode:
+            status += f' (exits {returncode})'
+        print(f"   {name:<12} {elapsed:7.1f} ms  {status}")
+        for module, us in imports[:args.top]:
+            print(f"      {us / 1000:7.1f} ms  {module}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'commands': report}, f, indent=2)
+        print(f"\n✓ Measurements written to {args.json}")
+    if over:
+        print(f"\n❌ Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        usage()
+        return
+    name, argv = sys.argv[1], sys.argv[2:]
+    if name == 'import-times':
+        import_times(argv)
+    elif name in COMMANDS:
+        run_script(os.path.join(REPO_DIR, COMMANDS[name][0]), argv)
+    else:
+        sys.stderr.write(f"solvet.py: error: unknown command '{name}'\n\n")
+        usage(sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Generate seeded synthetic Polar catalogs for benchmarks and tests.
+
+Produces products shaped like the polar_products_list response (items with
+prices, medias, benefits, metadata, timestamps). The same seed always yields
+the same catalog.
+
+Usage:
+    python3 scripts/synthetic_catalog.py --count 100000 --out catalog.json
+    python3 scripts/synthetic_catalog.py --count 1000000 --format ndjson --out catalog.ndjson
+    python3 scripts/synthetic_catalog.py --count 1000 --duplicate-ratio 0.7 --free-ratio 0.3 --currencies usd,eur
+"""
+
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+NAME_PREFIXES = ['Dojo', 'NO3D', 'Node', 'Geo', 'Mesh', 'Shader', 'Bolt', 'Print']
+NAME_WORDS = [
+    'Bolt', 'Gen', 'Array', 'Bevel', 'Curve', 'Scatter', 'Grid', 'Noise', 'Tile',
+    'Pipe', 'Wire', 'Panel', 'Cable', 'Rock', 'Tree', 'Glass', 'Metal', 'Wood',
+    'Fabric', 'Voxel', 'Remesh', 'Slice', 'Extrude', 'Twist', 'Bend', 'Lattice',
+]
+GOOD_DESCRIPTION = ('{name} is a procedural Blender tool with adjustable parameters, '
+                    'presets and documentation for production use.')
+BASIC_DESCRIPTION = '{name} for Blender scenes.'
+TEMPLATE_DESCRIPTION = 'Blender asset: {name} imported from the product library folder.'
+PAID_AMOUNTS = [199, 499, 900, 1299, 1999, 4900]
+
+
+def product_names(count, rng):
+    """count distinct product names"""
+    names = []
+    seen = set()
+    while len(names) < count:
+        words = rng.sample(NAME_WORDS, rng.randint(1, 3))
+        name = ' '.join([rng.choice(NAME_PREFIXES)] + words)
+        if name in seen:
+            name = f'{name} {len(names)}'
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def generate_products(count, seed=0, duplicate_ratio=0.5, free_ratio=0.5,
+                      currencies=('usd',), archived_ratio=0.05, now=None):
+    """Yield count synthetic Polar products
+
+    duplicate_ratio is the share of products that are extra variants of an
+    existing name; free_ratio is the share of variants priced FREE (the rest
+    get a fixed price in one of currencies).
+    """
+    rng = random.Random(seed)
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    unique = max(1, round(count * (1 - duplicate_ratio)))
+    names = product_names(unique, rng)
+
+    used = 0
+    for i in range(count):
+        # New names are drawn at the rate that uses all of them by the end,
+        # so duplicates are spread through the catalog like real exports
+        if used == 0 or (used < unique and rng.random() < (unique - used) / (count - i)):
+            name = names[used]
+            used += 1
+        else:
+            name = names[rng.randrange(used)]
+            # Occasionally add a trailing space like real duplicates
+            if rng.random() < 0.05:
+                name = name + ' '
+
+        prices = []
+        if rng.random() < free_ratio:
+            prices.append({'amount_type': 'free'})
+        else:
+            prices.append({
+                'amount_type': 'fixed',
+                'price_amount': rng.choice(PAID_AMOUNTS),
+                'price_currency': rng.choice(currencies),
+            })
+        if rng.random() < archived_ratio:
+            prices.insert(0, {'amount_type': 'fixed', 'price_amount': rng.choice(PAID_AMOUNTS),
+                              'price_currency': currencies[0], 'is_archived': True})
+        for price in prices:
+            price.setdefault('is_archived', False)
+            price['id'] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            price['type'] = 'one_time'
+
+        description = rng.choice([GOOD_DESCRIPTION, BASIC_DESCRIPTION, TEMPLATE_DESCRIPTION, ''])
+        created = now - timedelta(days=rng.randint(30, 720), seconds=rng.randint(0, 86399))
+        modified = created + timedelta(days=rng.randint(0, 700)) if rng.random() < 0.8 else None
+        if modified is not None and modified > now:
+            modified = now - timedelta(days=rng.randint(0, 60))
+
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': name,
+            'description': description.format(name=name.strip()),
+            'is_recurring': rng.random() < 0.05,
+            'is_archived': False,
+            'created_at': created.isoformat().replace('+00:00', 'Z'),
+            'modified_at': modified.isoformat().replace('+00:00', 'Z') if modified else None,
+            'prices': prices,
+            'medias': [{'id': str(i), 'mime_type': 'image/png'}] if rng.random() < 0.6 else [],
+            'benefits': [{'id': f'b{i}', 'type': 'downloadables'}] if rng.random() < 0.5 else [],
+            'metadata': {'sku': f'SKU-{i:07d}'} if rng.random() < 0.4 else {},
+        }
+
+
+def generate_catalog(count, **options):
+    """A polar_products_list-shaped response with count items"""
+    items = list(generate_products(count, **options))
+    return {
+        'items': items,
+        'pagination': {'total_count': count, 'max_page': 1},
+    }
+
+
+def write_catalog(out, count, fmt='json', **options):
+    """Write a catalog to a file object without holding it all in memory"""
+    products = generate_products(count, **options)
+    if fmt == 'ndjson':
+        for product in products:
+            out.write(json.dumps(product))
+            out.write('\n')
+        return
+    out.write('{"items": [')
+    for i, product in enumerate(products):
+        if i:
+            out.write(', ')
+        out.write(json.dumps(product))
+    out.write(f'], "pagination": {{"total_count": {count}, "max_page": 1}}}}\n')
+
+
+def parse_count(value):
+    """Accept 1000, 1k, 100k or 1M"""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Polar product catalog.')
+    parser.add_argument('--count', type=parse_count, default=1000, help='number of products (e.g. 1k, 100k, 1M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5,
+                        help='share of products that duplicate an existing name (default: 0.5)')
+    parser.add_argument('--free-ratio', type=float, default=0.5,
+                        help='share of variants priced FREE (default: 0.5)')
+    parser.add_argument('--currencies', default='usd', help='comma-separated currencies for paid prices')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json')
+    parser.add_argument('--out', help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    options = {
+        'seed': args.seed,
+        'duplicate_ratio': args.duplicate_ratio,
+        'free_ratio': args.free_ratio,
+        'currencies': tuple(c.strip() for c in args.currencies.split(',') if c.strip()),
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            write_catalog(f, args.count, args.format, **options)
+        print(f"✓ Wrote {args.count:,} products to {args.out}", file=sys.stderr)
+    else:
+        write_catalog(sys.stdout, args.count, args.format, **options)
+
+
+if __name__ == '__main__':
+    main()
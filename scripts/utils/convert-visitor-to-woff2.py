@@ -7,33 +7,85 @@ Visitor font can be downloaded from: https://www.dafont.com/visitor.font
 
 Usage:
     python3 convert-visitor-to-woff2.py [input.ttf] [output.woff2]
+    python3 convert-visitor-to-woff2.py --batch website/fonts [--subset-from website]
 
 If no arguments provided, it will look for fonts/visitor.ttf and create fonts/visitor.woff2
+
+Batch mode converts every TTF/OTF under a fonts directory on a process pool
+and writes the WOFF2 files next to them (or under --out-dir). Inputs whose
+content (and subset) has not changed since the last run are skipped, using a
+hash cache stored in the output directory. With --subset-from, each font is
+cut down to the characters the site's HTML/CSS/JS files use, plus printable
+ASCII for text that only arrives at runtime (product names, prices).
 """
 
-import sys
+import argparse
+import hashlib
+import html
+import json
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
+    import fontTools
+    from fontTools import subset
     from fontTools.ttLib import TTFont
 except ImportError:
     print("Error: fonttools is not installed.")
     print("Install it with: pip3 install fonttools[woff]")
     sys.exit(1)
 
+FONT_EXTENSIONS = ('.ttf', '.otf')
+# Files --subset-from scans for the characters the site uses
+TEXT_EXTENSIONS = ('.html', '.htm', '.css', '.js')
+SKIP_DIRS = {'node_modules', '.git'}
+# Always kept when subsetting: text loaded at runtime is not in the sources
+BASE_CHARACTERS = ''.join(chr(c) for c in range(0x20, 0x7f))
+CACHE_FILE = '.woff2-cache.json'
+# \2192 in CSS; \u2192 and \u{1F600} in JS
+CSS_ESCAPE = re.compile(r'\\([0-9a-fA-F]{1,6})')
+JS_ESCAPE = re.compile(r'\\u\{([0-9a-fA-F]{1,6})\}|\\u([0-9a-fA-F]{4})')
+
+
+def subset_font(font, text):
+    """Drop every glyph not needed to render text (kerning/ligatures kept)"""
+    options = subset.Options()
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+
 
-def convert_ttf_to_woff2(input_path, output_path):
+def write_woff2(font, output_path, text=None):
+    """Save a TTFont as WOFF2, optionally subset to the characters in text
+    
+    The file is written next to output_path and renamed into place, so an
+    interrupted run never leaves a truncated font behind.
+    """
+    if text is not None:
+        subset_font(font, text)
+    font.flavor = 'woff2'
+    tmp_path = f'{output_path}.tmp'
+    font.save(tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def convert_ttf_to_woff2(input_path, output_path, text=None):
     """Convert TTF font to WOFF2 format"""
     try:
         print(f"Reading font file: {input_path}")
         font = TTFont(input_path)
         
+        if text is not None:
+            print(f"Subsetting to {len(text)} characters...")
         print(f"Converting to WOFF2 format...")
-        font.flavor = 'woff2'
-        
         print(f"Saving to: {output_path}")
-        font.save(output_path)
+        write_woff2(font, output_path, text)
         
         # Check file size
         size = os.path.getsize(output_path)
@@ -46,21 +98,200 @@ def convert_ttf_to_woff2(input_path, output_path):
         return False
 
 
+def iter_files(root, extensions):
+    """Files under root with one of extensions, skipping node_modules/.git"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extensions):
+                yield Path(dirpath) / filename
+
+
+def escaped_characters(pattern, text):
+    """Characters written as escape sequences (pattern's matched group is the hex code)"""
+    for match in pattern.finditer(text):
+        codepoint = int(match.group(match.lastindex), 16)
+        if codepoint <= sys.maxunicode:
+            yield chr(codepoint)
+
+
+def scan_characters(roots):
+    """Sorted string of the printable characters used in HTML/CSS/JS files
+    under roots (entities and escape sequences decoded), plus BASE_CHARACTERS"""
+    chars = set(BASE_CHARACTERS)
+    for root in roots:
+        for path in iter_files(root, TEXT_EXTENSIONS):
+            text = path.read_text(encoding='utf-8', errors='ignore')
+            if path.suffix.lower() == '.css':
+                chars.update(escaped_characters(CSS_ESCAPE, text))
+            else:
+                chars.update(escaped_characters(JS_ESCAPE, text))
+                if path.suffix.lower() in ('.html', '.htm'):
+                    text = html.unescape(text)
+            chars.update(text)
+    return ''.join(sorted(c for c in chars if c.isprintable()))
+
+
+def content_key(input_path, text):
+    """Cache key: the font's bytes, the subset and the fontTools version"""
+    digest = hashlib.sha256()
+    with open(input_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(b'\0' + (text.encode('utf-8') if text is not None else b'full'))
+    digest.update(b'\0' + fontTools.version.encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _convert_job(job):
+    """Convert one batch entry (runs in a worker process); returns the WOFF2 size"""
+    input_path, output_path, text = job
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_woff2(TTFont(input_path), output_path, text)
+    return os.path.getsize(output_path)
+
+
+def batch_convert(fonts_dir, out_dir=None, text=None, workers=None, use_cache=True, force=False):
+    """Convert every font under fonts_dir to WOFF2
+    
+    Returns one (relative path, input bytes, output bytes or None, status)
+    row per font, status being 'converted', 'cached' or the error message.
+    """
+    fonts_dir = Path(fonts_dir)
+    out_dir = Path(out_dir) if out_dir else fonts_dir
+    cache_path = out_dir / CACHE_FILE
+    cache = load_cache(cache_path) if use_cache else {}
+    
+    rows = {}
+    jobs = []
+    for input_path in iter_files(fonts_dir, FONT_EXTENSIONS):
+        relative = input_path.relative_to(fonts_dir).as_posix()
+        output_path = out_dir / Path(relative).with_suffix('.woff2')
+        key = content_key(input_path, text)
+        entry = cache.get(relative)
+        input_size = input_path.stat().st_size
+        if (not force and entry and entry['key'] == key and output_path.exists()
+                and output_path.stat().st_size == entry['output_bytes']):
+            rows[relative] = (relative, input_size, entry['output_bytes'], 'cached')
+        else:
+            jobs.append((relative, key, input_size, (str(input_path), str(output_path), text)))
+    
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_convert_job, job) for _, _, _, job in jobs]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+    else:
+        outcomes = []
+        for _, _, _, job in jobs:
+            try:
+                outcomes.append(_convert_job(job))
+            except Exception as e:
+                outcomes.append(e)
+    
+    for (relative, key, input_size, _), outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            cache.pop(relative, None)
+            rows[relative] = (relative, input_size, None, f'{type(outcome).__name__}: {outcome}')
+        else:
+            cache[relative] = {'key': key, 'input_bytes': input_size, 'output_bytes': outcome}
+            rows[relative] = (relative, input_size, outcome, 'converted')
+    
+    if use_cache and rows:
+        os.makedirs(out_dir, exist_ok=True)
+        save_cache(cache_path, {relative: cache[relative] for relative in rows if relative in cache})
+    return [rows[relative] for relative in sorted(rows)]
+
+
+def print_batch_report(rows):
+    """Size before (TTF/OTF) and after (WOFF2) for every font, then totals"""
+    width = max([len(row[0]) for row in rows] + [4])
+    print(f"\n  {'Font':<{width}}  {'Input':>10}  {'WOFF2':>10}  {'Saved':>6}")
+    total_in = total_out = 0
+    for relative, input_size, output_size, status in rows:
+        if output_size is None:
+            print(f"  {relative:<{width}}  {input_size / 1024:>7.1f} KB  {'-':>10}  {'-':>6}  ✗ {status}")
+            continue
+        total_in += input_size
+        total_out += output_size
+        saved = 1 - output_size / input_size if input_size else 0
+        note = '  (unchanged, skipped)' if status == 'cached' else ''
+        print(f"  {relative:<{width}}  {input_size / 1024:>7.1f} KB  {output_size / 1024:>7.1f} KB  {saved:>6.0%}{note}")
+    if total_in:
+        print(f"  {'Total':<{width}}  {total_in / 1024:>7.1f} KB  {total_out / 1024:>7.1f} KB  "
+              f"{1 - total_out / total_in:>6.0%}")
+
+
+def batch_main(args):
+    if not os.path.isdir(args.batch):
+        print(f"Error: Fonts directory not found: {args.batch}")
+        sys.exit(1)
+    
+    text = None
+    if args.subset_from:
+        text = scan_characters(args.subset_from)
+        print(f"Subsetting to {len(text)} characters used in {', '.join(args.subset_from)}")
+    
+    rows = batch_convert(args.batch, args.out_dir, text, args.workers, not args.no_cache, args.force)
+    if not rows:
+        print(f"No {'/'.join(FONT_EXTENSIONS)} fonts found in {args.batch}")
+        return
+    converted = sum(1 for row in rows if row[3] == 'converted')
+    cached = sum(1 for row in rows if row[3] == 'cached')
+    failed = len(rows) - converted - cached
+    print(f"✓ {converted} converted, {cached} unchanged" + (f", ✗ {failed} failed" if failed else ''))
+    print_batch_report(rows)
+    if failed:
+        sys.exit(1)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Convert TTF/OTF fonts to WOFF2.')
+    parser.add_argument('input', nargs='?', help='font to convert (default: fonts/visitor.ttf)')
+    parser.add_argument('output', nargs='?', help='WOFF2 file to write (default: fonts/visitor.woff2)')
+    parser.add_argument('--batch', metavar='DIR', help='convert every TTF/OTF font under DIR')
+    parser.add_argument('--out-dir', metavar='DIR', help='where --batch writes the WOFF2 files (default: next to the fonts)')
+    parser.add_argument('--subset-from', action='append', metavar='DIR',
+                        help='subset to the characters used by the HTML/CSS/JS files under DIR (repeatable)')
+    parser.add_argument('--workers', type=int, metavar='N', help='processes for --batch (default: one per CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write the --batch hash cache')
+    parser.add_argument('--force', action='store_true', help='convert every font, even if unchanged')
+    args = parser.parse_args()
+    if args.batch and (args.input or args.output):
+        parser.error('--batch does not take input/output files')
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.batch:
+        batch_main(args)
+        return
+    
     # Default paths
     script_dir = Path(__file__).parent
     workspace_dir = script_dir.parent
     fonts_dir = workspace_dir / 'fonts'
     
-    if len(sys.argv) >= 3:
-        input_path = sys.argv[1]
-        output_path = sys.argv[2]
-    elif len(sys.argv) == 2:
-        input_path = sys.argv[1]
-        output_path = str(fonts_dir / 'visitor.woff2')
-    else:
-        input_path = str(fonts_dir / 'visitor.ttf')
-        output_path = str(fonts_dir / 'visitor.woff2')
+    input_path = args.input or str(fonts_dir / 'visitor.ttf')
+    output_path = args.output or str(fonts_dir / 'visitor.woff2')
     
     # Check if input file exists
     if not os.path.exists(input_path):
@@ -80,7 +311,8 @@ def main():
         print(f"Created directory: {output_dir}")
     
     # Convert font
-    success = convert_ttf_to_woff2(input_path, output_path)
+    text = scan_characters(args.subset_from) if args.subset_from else None
+    success = convert_ttf_to_woff2(input_path, output_path, text)
     
     if success:
         print(f"\n✓ Font conversion complete!")
@@ -2,6 +2,9 @@
 """
 Verify Visitor font setup
 Checks that visitor.woff2 exists and is valid
+
+To check every font, image, model and reference of the site, use
+scripts/site_assets.py.
 """
 
 import os
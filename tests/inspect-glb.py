@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Inspect GLB/glTF models and check them against performance budgets.
+
+check-glb-error.py finds out whether a model loads by opening the viewer in
+Chromium; this reads the files directly, no browser involved. For every
+model it reports per-mesh vertex/index/triangle counts and an estimate of
+the draw calls it costs (one per primitive per node instance), buffer and
+texture sizes (including an estimate of the GPU memory the textures take
+once decoded), and flags:
+
+- problems: a broken container, missing or out-of-range buffers, buffer
+  views and accessors, references to meshes/accessors/images that do not
+  exist
+- budgets: totals above the limits (DEFAULT_BUDGETS, --budget, --budgets)
+
+GLB files and external .bin buffers are memory-mapped and read through
+memoryview slices, so the binary data is never copied into Python: only
+the JSON chunk is decoded, and texture sizes come from the first bytes of
+each PNG/JPEG/WebP/KTX2 image. Models are inspected on a process pool.
+
+Usage:
+    python3 tests/inspect-glb.py model.glb
+    python3 tests/inspect-glb.py models/ --details
+    python3 tests/inspect-glb.py models/ --budget triangles=200000 --budget texture_memory=32MB
+    python3 tests/inspect-glb.py models/ --budgets budgets.json --json report.json
+
+Exits 1 when a model has problems or is over budget.
+"""
+
+import argparse
+import base64
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+GLB_MAGIC = b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+MODEL_EXTENSIONS = ('.glb', '.gltf')
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_COMPONENTS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+MODE_TRIANGLES, MODE_TRIANGLE_STRIP, MODE_TRIANGLE_FAN = 4, 5, 6
+# Decoded RGBA8 texture plus its mipmap chain (+1/3)
+TEXTURE_BYTES_PER_PIXEL = 4 * 4 / 3
+MB = 1024 * 1024
+DEFAULT_BUDGETS = {
+    'file_bytes': 20 * MB,
+    'triangles': 500_000,
+    'vertices': 500_000,
+    'draw_calls': 100,
+    'texture_memory': 64 * MB,
+    'texture_dimension': 4096,
+}
+# Every total in a report; any of them can be given a budget
+TOTAL_NAMES = (
+    'file_bytes', 'buffer_bytes', 'meshes', 'primitives', 'vertices', 'triangles', 'draw_calls',
+    'materials', 'textures', 'texture_bytes', 'texture_memory', 'texture_dimension',
+)
+SIZE_SUFFIXES = {'KB': 1024, 'MB': MB, 'GB': 1024 * MB}
+
+
+class ModelError(Exception):
+    """The file is not a readable glTF asset at all"""
+
+
+def image_size(data):
+    """(width, height) from the header of a PNG, JPEG, WebP or KTX2 image, or None"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack_from('>II', data, 16)
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_size(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = bytes(data[12:16])
+        if chunk == b'VP8 ':
+            width, height = struct.unpack_from('<HH', data, 26)
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    if data[:12] == b'\xabKTX 20\xbb\r\n\x1a\n' and len(data) >= 28:
+        return struct.unpack_from('<II', data, 20)
+    return None
+
+
+def _jpeg_size(data):
+    # Walk the marker segments up to the first start-of-frame
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        (length,) = struct.unpack_from('>H', data, offset + 2)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return width, height
+        offset += 2 + length
+    return None
+
+
+class ModelFiles:
+    """Memory maps of a model's files; views handed out stay valid until close()"""
+
+    def __init__(self):
+        self.maps = []
+        self.views = []
+
+    def map(self, path):
+        """memoryview of the whole file (read-only, not copied)"""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'')
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.append(mapped)
+        return self.view(mapped)
+
+    def view(self, data):
+        view = memoryview(data)
+        self.views.append(view)
+        return view
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        for mapped in self.maps:
+            mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_glb(files, path):
+    """(glTF JSON, BIN chunk view or None) of a GLB file"""
+    data = files.map(path)
+    if len(data) < 12 or data[:4] != GLB_MAGIC:
+        raise ModelError('not a GLB file (bad magic)')
+    version, length = struct.unpack_from('<II', data, 4)
+    if version != 2:
+        raise ModelError(f'unsupported GLB version {version}')
+    if length > len(data):
+        raise ModelError(f'truncated: header says {length} bytes, file has {len(data)}')
+    gltf = binary = None
+    offset = 12
+    while offset + 8 <= length:
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        start = offset + 8
+        if start + chunk_length > length:
+            raise ModelError(f'truncated chunk at byte {offset}')
+        if chunk_type == CHUNK_JSON and gltf is None:
+            # The only copy: the JSON chunk has to be decoded anyway
+            gltf = json.loads(bytes(data[start:start + chunk_length]))
+        elif chunk_type == CHUNK_BIN and binary is None:
+            binary = files.view(data[start:start + chunk_length])
+        offset = start + ((chunk_length + 3) & ~3)
+    if gltf is None:
+        raise ModelError('no JSON chunk')
+    return gltf, binary
+
+
+def load_uri(files, base_dir, uri):
+    """(view of the data, bytes read from disk) for a buffer/image URI"""
+    if uri.startswith('data:'):
+        header, _, payload = uri.partition(',')
+        if header.endswith(';base64'):
+            return files.view(base64.b64decode(payload)), 0
+        return files.view(urllib.parse.unquote_to_bytes(payload)), 0
+    path = base_dir / urllib.parse.unquote(uri)
+    data = files.map(path)
+    return data, len(data)
+
+
+def scene_instances(gltf, problems):
+    """{mesh index: (node instances, GPU instances)} for the default scene
+
+    Without scenes every mesh counts once. EXT_mesh_gpu_instancing nodes are
+    one draw call per primitive but draw the mesh once per instance.
+    """
+    nodes = gltf.get('nodes', [])
+    scenes = gltf.get('scenes', [])
+    if not scenes:
+        return {mesh: (1, 1) for mesh in range(len(gltf.get('meshes', [])))}
+    scene = gltf.get('scene', 0)
+    if not 0 <= scene < len(scenes):
+        problems.append(f'default scene {scene} does not exist')
+        return {}
+    instances = {}
+    stack = list(scenes[scene].get('nodes', []))
+    seen = set()
+    while stack:
+        index = stack.pop()
+        if index in seen or not 0 <= index < len(nodes):
+            problems.append(f'scene refers to missing or repeated node {index}')
+            continue
+        seen.add(index)
+        node = nodes[index]
+        stack.extend(node.get('children', []))
+        if 'mesh' not in node:
+            continue
+        gpu = 1
+        instancing = node.get('extensions', {}).get('EXT_mesh_gpu_instancing')
+        if instancing:
+            accessors = gltf.get('accessors', [])
+            counts = [accessors[a]['count'] for a in instancing.get('attributes', {}).values()
+                      if 0 <= a < len(accessors)]
+            gpu = max(counts, default=1)
+        draws, drawn = instances.get(node['mesh'], (0, 0))
+        instances[node['mesh']] = (draws + 1, drawn + gpu)
+    return instances
+
+
+def check_views(gltf, buffers, problems):
+    """Flag buffer views and accessors that do not fit their data"""
+    buffer_views = gltf.get('bufferViews', [])
+    for index, view in enumerate(buffer_views):
+        buffer = view.get('buffer', -1)
+        if not 0 <= buffer < len(buffers) or buffers[buffer] is None:
+            problems.append(f'bufferView {index}: buffer {buffer} is missing')
+            continue
+        end = view.get('byteOffset', 0) + view.get('byteLength', 0)
+        if end > len(buffers[buffer]):
+            problems.append(f'bufferView {index}: ends at byte {end}, buffer {buffer} has {len(buffers[buffer])}')
+    for index, accessor in enumerate(gltf.get('accessors', [])):
+        if 'bufferView' not in accessor:
+            # Sparse-only or compressed (e.g. Draco): nothing to bounds-check
+            continue
+        view_index = accessor['bufferView']
+        if not 0 <= view_index < len(buffer_views):
+            problems.append(f'accessor {index}: bufferView {view_index} is missing')
+            continue
+        element = COMPONENT_SIZES.get(accessor.get('componentType'), 0) * TYPE_COMPONENTS.get(accessor.get('type'), 0)
+        if not element:
+            problems.append(f'accessor {index}: unknown componentType/type')
+            continue
+        view = buffer_views[view_index]
+        stride = view.get('byteStride') or element
+        count = accessor.get('count', 0)
+        end = accessor.get('byteOffset', 0) + (count - 1) * stride + element if count else 0
+        if end > view.get('byteLength', 0):
+            problems.append(f'accessor {index}: needs {end} bytes, bufferView {view_index} has {view.get("byteLength", 0)}')
+
+
+def mesh_stats(gltf, instances, problems):
+    accessors = gltf.get('accessors', [])
+
+    def count(index, what):
+        if index is None:
+            return None
+        if not 0 <= index < len(accessors):
+            problems.append(f'{what}: accessor {index} is missing')
+            return 0
+        return accessors[index].get('count', 0)
+
+    meshes = []
+    for index, mesh in enumerate(gltf.get('meshes', [])):
+        draws, drawn = instances.get(index, (0, 0))
+        stats = {
+            'name': mesh.get('name') or f'mesh {index}',
+            'primitives': len(mesh.get('primitives', [])),
+            'instances': drawn,
+            'vertices': 0,
+            'indices': 0,
+            'triangles': 0,
+            'morph_targets': 0,
+            'draw_calls': draws * len(mesh.get('primitives', [])),
+        }
+        for number, primitive in enumerate(mesh.get('primitives', [])):
+            where = f'mesh {index} primitive {number}'
+            vertices = count(primitive.get('attributes', {}).get('POSITION'), where) or 0
+            indices = count(primitive.get('indices'), where)
+            elements = vertices if indices is None else indices
+            mode = primitive.get('mode', MODE_TRIANGLES)
+            if mode == MODE_TRIANGLES:
+                triangles = elements // 3
+            elif mode in (MODE_TRIANGLE_STRIP, MODE_TRIANGLE_FAN):
+                triangles = max(elements - 2, 0)
+            else:
+                triangles = 0
+            stats['vertices'] += vertices
+            stats['indices'] += indices or 0
+            stats['triangles'] += triangles
+            stats['morph_targets'] = max(stats['morph_targets'], len(primitive.get('targets', [])))
+        meshes.append(stats)
+    for node in gltf.get('nodes', []):
+        if 'mesh' in node and not 0 <= node['mesh'] < len(meshes):
+            problems.append(f'node refers to missing mesh {node["mesh"]}')
+    return meshes
+
+
+def texture_stats(gltf, files, base_dir, buffers, problems):
+    """(per-image stats, bytes of the image files next to a .gltf)"""
+    buffer_views = gltf.get('bufferViews', [])
+    textures = []
+    disk_bytes = 0
+    for index, image in enumerate(gltf.get('images', [])):
+        uri = image.get('uri', '')
+        name = image.get('name') or (uri if uri and not uri.startswith('data:') else f'image {index}')
+        stats = {'name': name,
+                 'mime_type': image.get('mimeType'), 'bytes': 0, 'width': None, 'height': None}
+        data = None
+        try:
+            if 'bufferView' in image:
+                view = buffer_views[image['bufferView']]
+                buffer = buffers[view['buffer']]
+                start = view.get('byteOffset', 0)
+                data = files.view(buffer[start:start + view['byteLength']])
+            elif 'uri' in image:
+                data, read = load_uri(files, base_dir, image['uri'])
+                disk_bytes += read
+        except (IndexError, KeyError, TypeError, OSError) as e:
+            problems.append(f'image {index}: cannot read its data ({type(e).__name__}: {e})')
+        if data is not None:
+            stats['bytes'] = len(data)
+            size = image_size(data)
+            if size:
+                stats['width'], stats['height'] = size
+            elif len(data):
+                problems.append(f'image {index}: unrecognized image format')
+        textures.append(stats)
+    return textures, disk_bytes
+
+
+def inspect_model(path):
+    """Report dict for one .glb/.gltf file (runs in a worker process)"""
+    path = Path(path)
+    problems = []
+    with ModelFiles() as files:
+        buffers = []
+        if path.suffix.lower() == '.glb':
+            gltf, binary = read_glb(files, path)
+        else:
+            with open(path, 'rb') as f:
+                gltf = json.load(f)
+            binary = None
+        file_bytes = path.stat().st_size
+        for index, buffer in enumerate(gltf.get('buffers', [])):
+            data = None
+            try:
+                if 'uri' in buffer:
+                    data, read = load_uri(files, path.parent, buffer['uri'])
+                    file_bytes += read
+                elif index == 0 and binary is not None:
+                    data = binary
+                else:
+                    problems.append(f'buffer {index}: no uri and no GLB BIN chunk')
+            except (OSError, ValueError) as e:
+                problems.append(f'buffer {index}: {type(e).__name__}: {e}')
+            if data is not None and len(data) < buffer.get('byteLength', 0):
+                problems.append(f'buffer {index}: declares {buffer["byteLength"]} bytes, has {len(data)}')
+            buffers.append(data)
+        check_views(gltf, buffers, problems)
+        meshes = mesh_stats(gltf, scene_instances(gltf, problems), problems)
+        textures, image_bytes = texture_stats(gltf, files, path.parent, buffers, problems)
+        file_bytes += image_bytes
+        sized = [t for t in textures if t['width']]
+        totals = {
+            'file_bytes': file_bytes,
+            'buffer_bytes': sum(buffer.get('byteLength', 0) for buffer in gltf.get('buffers', [])),
+            'meshes': len(meshes),
+            'primitives': sum(mesh['primitives'] for mesh in meshes),
+            'vertices': sum(mesh['vertices'] * mesh['instances'] for mesh in meshes),
+            'triangles': sum(mesh['triangles'] * mesh['instances'] for mesh in meshes),
+            'draw_calls': sum(mesh['draw_calls'] for mesh in meshes),
+            'materials': len(gltf.get('materials', [])),
+            'textures': len(textures),
+            'texture_bytes': sum(texture['bytes'] for texture in textures),
+            'texture_memory': int(sum(t['width'] * t['height'] for t in sized) * TEXTURE_BYTES_PER_PIXEL),
+            'texture_dimension': max((max(t['width'], t['height']) for t in sized), default=0),
+        }
+    return {
+        'path': str(path),
+        'generator': gltf.get('asset', {}).get('generator'),
+        'extensions': gltf.get('extensionsUsed', []),
+        'totals': totals,
+        'meshes': meshes,
+        'textures': textures,
+        'problems': problems,
+    }
+
+
+def over_budget(totals, budgets):
+    """[(name, value, limit)] for every total above its budget"""
+    return [(name, totals[name], limit) for name, limit in budgets.items()
+            if limit is not None and totals.get(name, 0) > limit]
+
+
+def _inspect_job(job):
+    path, budgets = job
+    try:
+        report = inspect_model(path)
+    except ModelError as e:
+        return {'path': path, 'error': str(e)}
+    except Exception as e:
+        return {'path': path, 'error': f'{type(e).__name__}: {e}'}
+    report['over_budget'] = [
+        {'budget': name, 'value': value, 'limit': limit}
+        for name, value, limit in over_budget(report['totals'], budgets)
+    ]
+    return report
+
+
+def iter_model_files(paths):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for child in sorted(path.rglob('*')):
+                if child.suffix.lower() in MODEL_EXTENSIONS and child.is_file():
+                    yield child
+        else:
+            yield path
+
+
+def inspect_models(paths, budgets, workers=None):
+    """Reports for every model, in the order given"""
+    jobs = [(str(path), budgets) for path in paths]
+    if not jobs:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers == 1:
+        return [_inspect_job(job) for job in jobs]
+    reports = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_inspect_job, job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            reports[futures[future]] = future.result()
+    return reports
+
+
+def format_bytes(value):
+    if value >= MB:
+        return f'{value / MB:.1f} MB'
+    return f'{value / 1024:.0f} KB'
+
+
+def print_report(reports, details=False):
+    print(f"\n   {'Model':<32} {'Triangles':>10} {'Vertices':>10} {'Draws':>6} {'Tex mem':>9} {'File':>9}")
+    for report in reports:
+        name = Path(report['path']).name
+        if 'error' in report:
+            print(f"✗  {name:<32} {report['error']}")
+            continue
+        totals = report['totals']
+        status = '✗ ' if report['problems'] else '⚠️ ' if report['over_budget'] else '✓ '
+        print(f"{status} {name:<32} {totals['triangles']:>10,} {totals['vertices']:>10,} {totals['draw_calls']:>6} "
+              f"{format_bytes(totals['texture_memory']):>9} {format_bytes(totals['file_bytes']):>9}")
+        for item in report['over_budget']:
+            if item['budget'] in ('file_bytes', 'texture_memory', 'buffer_bytes', 'texture_bytes'):
+                value, limit = format_bytes(item['value']), format_bytes(item['limit'])
+            else:
+                value, limit = f"{item['value']:,}", f"{item['limit']:,}"
+            print(f"      over budget: {item['budget']} {value} > {limit}")
+        for problem in report['problems']:
+            print(f"      problem: {problem}")
+        if details:
+            for mesh in report['meshes']:
+                instanced = f" x{mesh['instances']}" if mesh['instances'] != 1 else ''
+                print(f"      • {mesh['name'][:30]:<30}{instanced:<6} {mesh['triangles']:>10,} {mesh['vertices']:>10,} "
+                      f"{mesh['draw_calls']:>6}  ({mesh['primitives']} primitives, {mesh['indices']:,} indices)")
+            for texture in report['textures']:
+                size = f"{texture['width']}x{texture['height']}" if texture['width'] else 'unknown size'
+                print(f"      ▪ {texture['name'][:30]:<30} {size:>11}  {format_bytes(texture['bytes'])} "
+                      f"{texture['mime_type'] or ''}")
+
+
+def parse_budget_value(value):
+    value = value.strip().replace('_', '')
+    for suffix, factor in SIZE_SUFFIXES.items():
+        if value.upper().endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+
+def parse_budget(value):
+    name, separator, limit = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f'expected NAME=LIMIT, got {value!r}')
+    try:
+        return name.strip(), parse_budget_value(limit)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{name}: limit must be a number (optionally with KB/MB/GB), got {limit!r}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect GLB/glTF models and check them against performance budgets.')
+    parser.add_argument('paths', nargs='+', help='.glb/.gltf files or directories to search')
+    parser.add_argument('--budgets', metavar='FILE',
+                        help='JSON object of budgets, e.g. {"triangles": 200000, "texture_memory": "32MB"}')
+    parser.add_argument('--budget', type=parse_budget, action='append', default=[], metavar='NAME=LIMIT',
+                        help=f"override one budget (repeatable; names: {', '.join(TOTAL_NAMES)})")
+    parser.add_argument('--details', action='store_true', help='list every mesh and texture')
+    parser.add_argument('--json', metavar='PATH', help="also write the full reports as JSON ('-' for stdout)")
+    parser.add_argument('--workers', type=int, metavar='N', help='processes (default: one per CPU)')
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    budgets = dict(DEFAULT_BUDGETS)
+    if args.budgets:
+        with open(args.budgets, 'r', encoding='utf-8') as f:
+            for name, limit in json.load(f).items():
+                budgets[name] = None if limit is None else parse_budget_value(str(limit))
+    budgets.update(args.budget)
+    unknown = sorted(set(budgets) - set(TOTAL_NAMES))
+    if unknown:
+        parser.error(f"unknown budget {', '.join(unknown)} (choose from {', '.join(TOTAL_NAMES)})")
+
+    paths = list(iter_model_files(args.paths))
+    if not paths:
+        print("Error: No .glb/.gltf files found.")
+        sys.exit(1)
+    print(f"🔍 Inspecting {len(paths)} models...")
+    start = time.perf_counter()
+    reports = inspect_models(paths, budgets, args.workers)
+    elapsed = time.perf_counter() - start
+    print_report(reports, args.details)
+
+    failed = [r for r in reports if 'error' in r or r['problems']]
+    over = [r for r in reports if 'error' not in r and not r['problems'] and r['over_budget']]
+    print(f"\n✓ {len(reports) - len(failed) - len(over)} within budget, ⚠️  {len(over)} over budget, "
+          f"✗ {len(failed)} with problems ({elapsed:.2f}s)")
+    if args.json:
+        payload = json.dumps({'budgets': budgets, 'models': reports}, indent=2)
+        if args.json == '-':
+            print(payload)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(payload + '\n')
+    if failed or over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
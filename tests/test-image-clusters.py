@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Checks for the image clustering behind `image_index.py --clusters-out` and
+`analyze-product-duplicates.py --image-clusters`:
+1. A chain of images, each within --max-distance of the next, is not merged
+   end to end when the two ends are far apart
+2. Image clusters stop growing at max_size images
+3. Name groups are merged only with the first group of a shared image
+   cluster, not chained through groups that share different clusters
+
+Usage:
+    python tests/test-image-clusters.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import image_index
+from script_loader import load_script
+
+analyzer = load_script('analyze-product-duplicates.py')
+
+
+def chain_index(length, step=4):
+    """Images a, b, c, ... whose hashes each differ from the previous one in step bits"""
+    index = image_index.ImageIndex('phash')
+    for i in range(length):
+        key = chr(ord('a') + i)
+        index.add(key, {'phash': (1 << (i * step)) - 1, 'products': []})
+    return index
+
+
+def test_chain_is_not_merged():
+    index = chain_index(6)
+    assert image_index.hamming(index.images['a']['phash'], index.images['b']['phash']) <= image_index.MAX_DISTANCE
+    assert image_index.hamming(index.images['a']['phash'], index.images['f']['phash']) > image_index.MAX_DISTANCE
+
+    clusters = index.clusters()
+    assert clusters == [['a', 'b'], ['c', 'd'], ['e', 'f']], clusters
+
+
+def test_cluster_size_is_capped():
+    index = image_index.ImageIndex('phash')
+    for i in range(10):
+        index.add(f'render-{i}', {'phash': 0, 'products': []})
+    clusters = index.clusters(max_size=4)
+    assert [len(cluster) for cluster in clusters] == [4, 4, 2], clusters
+
+
+def test_groups_are_not_chained():
+    # Group A shares image cluster 0 with B, B shares cluster 1 with C
+    groups = {'A': [{'id': 'a1'}], 'B': [{'id': 'b1'}, {'id': 'b2'}], 'C': [{'id': 'c1'}]}
+    image_clusters = {'a1': 0, 'b1': 0, 'b2': 1, 'c1': 1}
+    merged = analyzer.merge_image_groups(groups, image_clusters, lambda variant: variant['id'])
+    assert {name: [v['id'] for v in variants] for name, variants in merged.items()} == {
+        'A': ['a1', 'b1', 'b2'],
+        'C': ['c1'],
+    }, merged
+
+    groups = {f'name {i}': [{'id': str(i)}] for i in range(10)}
+    merged = analyzer.merge_image_groups(groups, {str(i): 0 for i in range(10)}, lambda v: v['id'], max_size=4)
+    assert [len(variants) for variants in merged.values()] == [4, 4, 2], merged
+
+
+def main():
+    tests = [test_chain_is_not_merged, test_cluster_size_is_capped, test_groups_are_not_chained]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASSED: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAILED: {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
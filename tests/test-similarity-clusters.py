@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Checks for the near-duplicate clustering behind `analyze-product-duplicates.py --similar`:
+1. A chain A~B~C where A and C are not similar is not merged into one cluster
+2. Clusters stop growing at max_size keys
+3. Non-Latin names are compared by their own letters, and names without any
+   letters or digits are never reported as similar
+
+Usage:
+    python tests/test-similarity-clusters.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from script_loader import load_script
+
+analyzer = load_script('analyze-product-duplicates.py')
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+def test_chain_is_not_merged():
+    # A~B and B~C are 0.6 similar, A and C only 0.33
+    a = {f's{i}' for i in range(0, 100)}
+    b = {f's{i}' for i in range(25, 125)}
+    c = {f's{i}' for i in range(50, 150)}
+    assert jaccard(a, b) >= analyzer.SIMILARITY_THRESHOLD > jaccard(a, c)
+
+    index = analyzer.MinHashIndex()
+    for key, shingles in (('A', a), ('B', b), ('C', c)):
+        index.add(key, shingles)
+    clusters = index.clusters()
+    assert clusters == [['A', 'B'], ['C']], clusters
+
+
+def test_cluster_size_is_capped():
+    index = analyzer.MinHashIndex()
+    for i in range(10):
+        index.add(f'Bolt Gen {i}', analyzer.similarity_shingles('Bolt Gen'))
+    clusters = index.clusters(max_size=4)
+    assert [len(cluster) for cluster in clusters] == [4, 4, 2], clusters
+
+
+def test_unicode_names():
+    names = [('日本語', None), ('製品', None), ('!!', None), ('??', None),
+             ('Ｂｏｌｔ Ｇｅｎ', None), ('bolt gen', None)]
+    clusters = analyzer.similar_name_clusters(names, analyzer.SIMILARITY_THRESHOLD)
+    assert clusters == [['日本語'], ['製品'], ['!!'], ['??'], ['Ｂｏｌｔ Ｇｅｎ', 'bolt gen']], clusters
+    assert analyzer.similarity_shingles('!!') == set()
+
+
+def main():
+    tests = [test_chain_is_not_merged, test_cluster_size_is_capped, test_unicode_names]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASSED: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAILED: {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
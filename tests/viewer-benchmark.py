@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Benchmark the 3D viewer pages in headless Chromium.
+
+check-glb-error.py and test-embed-generation.py open one page in one browser
+and sleep for fixed amounts of time. This launches a single headless
+Chromium and runs a matrix of viewer pages x models in concurrent browser
+contexts (each context is fresh, so every load is a cold load). Nothing
+sleeps: each step waits for a signal from the page, bounded by --timeout.
+
+For every run it records:
+
+- page_ready_ms: navigation start until the viewer is ready (--ready,
+  default window.gltfLoaderReady)
+- load_ms: from calling the load function (--load, default loadSample)
+  until the model is in the scene (--loaded, default currentModelURL is the
+  model's URL)
+- first_frame_ms: from calling the load function until the first WebGL
+  draw call after the model is in the scene
+- draw_calls: WebGL draw calls in that first frame
+- js_heap_used_bytes / js_heap_total_bytes: JS heap after a forced GC,
+  script_ms: time spent running scripts (Chrome DevTools Protocol metrics)
+- page errors (uncaught exceptions fail the run) and console errors
+
+The pages and models are served by a built-in static server: --root
+(default: the repository root, so pages live under
+no3d-tools-website/3d-viewer/) is served as is, and every model is mounted
+under /__bench__/models/. Runs are summarized per page and model (median
+of --runs) and can be saved with --output and compared with --compare.
+
+Needs Playwright: pip3 install playwright && playwright install chromium
+
+Usage:
+    python3 tests/viewer-benchmark.py models/
+    python3 tests/viewer-benchmark.py models/ --page no3d-tools-website/3d-viewer/simple-test.html --runs 5
+    python3 tests/viewer-benchmark.py models/ --concurrency 4 --output viewer-bench.json
+    python3 tests/viewer-benchmark.py models/ --compare viewer-bench.json
+
+Exits 1 when a run fails (timeout, page error) or --compare finds a regression.
+"""
+
+import argparse
+import asyncio
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    from playwright.async_api import Error as PlaywrightError
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    from playwright.async_api import async_playwright
+except ImportError:
+    print("Error: playwright is not installed.")
+    print("Install it with: pip3 install playwright && playwright install chromium")
+    sys.exit(1)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+VIEWER_DIR = 'no3d-tools-website/3d-viewer'
+DEFAULT_PAGES = [f'{VIEWER_DIR}/model-viewer-test.html', f'{VIEWER_DIR}/simple-test.html']
+MODEL_EXTENSIONS = ('.glb', '.gltf')
+MODEL_MOUNT = '/__bench__/models/'
+
+# Page-side expressions; `url` and `name` are the model being loaded
+DEFAULT_READY = 'window.gltfLoaderReady === true'
+DEFAULT_LOAD = 'loadSample(url, name)'
+DEFAULT_LOADED = "typeof currentModelURL !== 'undefined' && currentModelURL === url"
+DEFAULT_TIMEOUT = 30.0
+# Headless Chromium has no GPU; let WebGL fall back to SwiftShader
+CHROMIUM_ARGS = ['--enable-unsafe-swiftshader', '--ignore-gpu-blocklist']
+
+METRICS = [
+    'page_ready_ms',
+    'dom_content_loaded_ms',
+    'load_ms',
+    'first_frame_ms',
+    'draw_calls',
+    'js_heap_used_bytes',
+    'js_heap_total_bytes',
+    'script_ms',
+]
+# Metrics checked by --compare and the change (in percent) reported as a regression
+COMPARED_METRICS = ['load_ms', 'first_frame_ms', 'js_heap_used_bytes']
+REGRESSION_THRESHOLD = 20.0
+
+# Injected before any page script runs: counts WebGL draw calls and records
+# the first one issued after the model is in the scene (loadedAt).
+INSTRUMENT_JS = """
+(() => {
+  const bench = window.__viewerBench = {
+    draws: 0, loadedAt: null, firstDraw: null, firstFrameDraws: null,
+  };
+  const wrap = (proto) => {
+    for (const name of ['drawArrays', 'drawElements', 'drawArraysInstanced',
+                        'drawElementsInstanced', 'drawRangeElements']) {
+      const original = proto[name];
+      if (typeof original !== 'function') continue;
+      proto[name] = function (...args) {
+        bench.draws++;
+        if (bench.loadedAt !== null && bench.firstDraw === null) {
+          bench.firstDraw = performance.now();
+          const before = bench.draws - 1;
+          // The rest of the frame runs in this task; count it once it is done
+          setTimeout(() => { bench.firstFrameDraws = bench.draws - before; }, 0);
+        }
+        return original.apply(this, args);
+      };
+    }
+  };
+  if (window.WebGLRenderingContext) wrap(WebGLRenderingContext.prototype);
+  if (window.WebGL2RenderingContext) wrap(WebGL2RenderingContext.prototype);
+})();
+"""
+
+
+class BenchmarkHandler(SimpleHTTPRequestHandler):
+    """Static files from the server's root, models from their mount points"""
+
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        '.glb': 'model/gltf-binary',
+        '.gltf': 'model/gltf+json',
+        '.wasm': 'application/wasm',
+        '.ktx2': 'image/ktx2',
+    }
+
+    def translate_path(self, path):
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(path).path)
+        if url_path.startswith(MODEL_MOUNT):
+            mount, _, rest = url_path[len(MODEL_MOUNT):].partition('/')
+            model_dirs = self.server.model_dirs
+            if mount.isdigit() and int(mount) < len(model_dirs) and rest:
+                base = model_dirs[int(mount)]
+                target = os.path.normpath(os.path.join(base, rest))
+                if target.startswith(base + os.sep):
+                    return target
+            return os.path.join(self.directory, '__missing__')
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(root, model_dirs, port=0):
+    """Serve root on 127.0.0.1 in a background thread; return (server, base_url)"""
+    handler = lambda *args, **kwargs: BenchmarkHandler(*args, directory=str(root), **kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.model_dirs = [os.path.abspath(d) for d in model_dirs]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def iter_model_files(paths):
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob('*') if p.suffix.lower() in MODEL_EXTENSIONS)
+        elif path.is_file():
+            yield path
+
+
+def mount_models(paths):
+    """Model URLs on the benchmark server: [(label, url_path)], mounted dirs"""
+    model_dirs, models = [], []
+    for path in paths:
+        directory = str(path.resolve().parent)
+        if directory not in model_dirs:
+            model_dirs.append(directory)
+        url = f'{MODEL_MOUNT}{model_dirs.index(directory)}/{urllib.parse.quote(path.name)}'
+        models.append((str(path), url))
+    return models, model_dirs
+
+
+async def wait_for(page, step, expression, arg, timeout_ms):
+    """Poll `expression` every animation frame until it is truthy; return its value"""
+    try:
+        handle = await page.wait_for_function(f'([url, name]) => ({expression})', arg=arg,
+                                              polling='raf', timeout=timeout_ms)
+    except PlaywrightTimeoutError:
+        raise RuntimeError(f'timed out waiting for {step} ({expression})') from None
+    return await handle.json_value()
+
+
+async def run_one(browser, semaphore, job, options):
+    page_path, model_label, model_url, run = job
+    result = {'page': page_path, 'model': model_label, 'run': run, 'ok': False,
+              'page_errors': [], 'console_errors': []}
+    timeout_ms = options['timeout'] * 1000
+    arg = [model_url, model_url.rsplit('/', 1)[-1]]
+    async with semaphore:
+        context = await browser.new_context(viewport={'width': 1280, 'height': 800})
+        try:
+            await context.add_init_script(INSTRUMENT_JS)
+            page = await context.new_page()
+            page.on('pageerror', lambda err: result['page_errors'].append(str(err)))
+
+            def on_console(msg):
+                if msg.type == 'error':
+                    result['console_errors'].append(msg.text)
+            page.on('console', on_console)
+            cdp = await context.new_cdp_session(page)
+            await cdp.send('Performance.enable')
+
+            await page.goto(options['base_url'] + urllib.parse.quote(page_path),
+                            wait_until='domcontentloaded', timeout=timeout_ms)
+            result['page_ready_ms'] = await wait_for(
+                page, 'the viewer', f'({options["ready"]}) && performance.now()', arg, timeout_ms)
+            navigation = await page.evaluate(
+                "() => performance.getEntriesByType('navigation')[0]?.toJSON() || {}")
+            result['dom_content_loaded_ms'] = navigation.get('domContentLoadedEventEnd')
+
+            started = await page.evaluate('() => performance.now()')
+            try:
+                await asyncio.wait_for(
+                    page.evaluate(f'async ([url, name]) => {{ await ({options["load"]}); }}', arg),
+                    options['timeout'])
+            except asyncio.TimeoutError:
+                raise RuntimeError(f'timed out in {options["load"]}') from None
+            loaded_at = await wait_for(
+                page, 'the model', f'({options["loaded"]}) && '
+                '(window.__viewerBench.loadedAt ??= performance.now())', arg, timeout_ms)
+            first_draw = await wait_for(
+                page, 'the first frame', 'window.__viewerBench.firstFrameDraws !== null '
+                '&& window.__viewerBench.firstDraw', arg, timeout_ms)
+            result['load_ms'] = loaded_at - started
+            result['first_frame_ms'] = first_draw - started
+            result['draw_calls'] = await page.evaluate('() => window.__viewerBench.firstFrameDraws')
+
+            await cdp.send('HeapProfiler.collectGarbage')
+            metrics = {m['name']: m['value'] for m in (await cdp.send('Performance.getMetrics'))['metrics']}
+            result['js_heap_used_bytes'] = int(metrics.get('JSHeapUsedSize', 0))
+            result['js_heap_total_bytes'] = int(metrics.get('JSHeapTotalSize', 0))
+            result['script_ms'] = metrics.get('ScriptDuration', 0.0) * 1000
+            result['ok'] = not result['page_errors']
+            if result['page_errors']:
+                result['error'] = f"{len(result['page_errors'])} page errors"
+        except (RuntimeError, PlaywrightError) as e:
+            result['error'] = str(e).splitlines()[0]
+        finally:
+            await context.close()
+    return result
+
+
+async def run_benchmarks(jobs, options):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+        options['browser'] = browser.version
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        results = []
+        try:
+            tasks = [asyncio.ensure_future(run_one(browser, semaphore, job, options)) for job in jobs]
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                results.append(result)
+                status = '✓' if result['ok'] else '✗'
+                detail = (f"{result['load_ms']:8.0f} ms load {result['first_frame_ms']:8.0f} ms first frame"
+                          if result['ok'] else result.get('error', ''))
+                print(f"   {status} [{len(results)}/{len(jobs)}] {result['page']} {result['model']} "
+                      f"#{result['run'] + 1}: {detail}")
+        finally:
+            await browser.close()
+    return sorted(results, key=lambda r: (r['page'], r['model'], r['run']))
+
+
+def summarize(runs):
+    """Median of each metric over the successful runs, per page and model"""
+    results = {}
+    for run in runs:
+        entry = results.setdefault(run['page'], {}).setdefault(run['model'], {'runs': 0, 'failed': 0})
+        entry['runs'] += 1
+        if not run['ok']:
+            entry['failed'] += 1
+    for page, models in results.items():
+        for model, entry in models.items():
+            ok = [r for r in runs if r['page'] == page and r['model'] == model and r['ok']]
+            for metric in METRICS:
+                values = [r[metric] for r in ok if r.get(metric) is not None]
+                entry[metric] = statistics.median(values) if values else None
+    return results
+
+
+def print_summary(results):
+    print(f"\n{'page / model':<60} {'ready':>8} {'load':>8} {'frame':>8} {'draws':>6} {'heap':>9}")
+    for page, models in results.items():
+        print(page)
+        for model, entry in models.items():
+            if entry['load_ms'] is None:
+                print(f"  {model:<58} {'failed':>8}")
+                continue
+            failed = f" ({entry['failed']}/{entry['runs']} failed)" if entry['failed'] else ''
+            print(f"  {model:<58} {entry['page_ready_ms']:6.0f}ms {entry['load_ms']:6.0f}ms "
+                  f"{entry['first_frame_ms']:6.0f}ms {entry['draw_calls'] or 0:>6.0f} "
+                  f"{entry['js_heap_used_bytes'] / 1024 / 1024:7.1f}MB{failed}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=REPO_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print metric changes against a baseline report; return regressions"""
+    regressions = []
+    print(f"\n📊 Compared with baseline {baseline['meta'].get('commit') or ''} ({baseline['meta'].get('date', '?')}):")
+    for page, models in report['results'].items():
+        for model, entry in models.items():
+            base = baseline.get('results', {}).get(page, {}).get(model)
+            if not base:
+                continue
+            for metric in COMPARED_METRICS:
+                if not base.get(metric) or entry.get(metric) is None:
+                    continue
+                change = (entry[metric] - base[metric]) / base[metric] * 100
+                flag = '⚠️ ' if change > REGRESSION_THRESHOLD else '  '
+                print(f" {flag}{page} {model} {metric:<20} {base[metric]:>12,.0f} → {entry[metric]:>12,.0f} "
+                      f"({change:+.1f}%)")
+                if change > REGRESSION_THRESHOLD:
+                    regressions.append((page, model, metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the 3D viewer pages in headless Chromium.')
+    parser.add_argument('models', nargs='+', help='.glb/.gltf files or directories to search')
+    parser.add_argument('--page', action='append', metavar='PATH',
+                        help=f"viewer page relative to --root (repeatable; default: {', '.join(DEFAULT_PAGES)})")
+    parser.add_argument('--root', default=str(REPO_DIR), help='directory served to the browser (default: repo root)')
+    parser.add_argument('--port', type=int, default=0, help='static server port (default: any free port)')
+    parser.add_argument('--runs', type=int, default=3, help='runs per page and model (default: 3)')
+    parser.add_argument('--concurrency', type=int, metavar='N',
+                        help='browser contexts at a time (default: one per CPU)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'seconds to wait for each signal (default: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--ready', default=DEFAULT_READY, help=f'JS expression true once the viewer is ready (default: {DEFAULT_READY})')
+    parser.add_argument('--load', default=DEFAULT_LOAD, help=f'JS expression that loads the model `url` (default: {DEFAULT_LOAD})')
+    parser.add_argument('--loaded', default=DEFAULT_LOADED, help='JS expression true once the model is in the scene')
+    parser.add_argument('--output', help='write the report as JSON (use as a baseline later)')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against a saved report')
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error('--runs must be at least 1')
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+
+    root = Path(args.root).resolve()
+    pages = args.page or DEFAULT_PAGES
+    missing = [p for p in pages if not (root / p).is_file()]
+    if missing:
+        print(f"Error: Viewer page not found under {root}: {', '.join(missing)}")
+        if any(p.startswith('no3d-tools-website/') for p in missing):
+            print("Check out the website with: git submodule update --init no3d-tools-website")
+        sys.exit(1)
+    models, model_dirs = mount_models(list(iter_model_files(args.models)))
+    if not models:
+        print("Error: No .glb/.gltf files found.")
+        sys.exit(1)
+
+    jobs = [(page, label, url, run) for run in range(args.runs) for page in pages for label, url in models]
+    concurrency = min(args.concurrency or os.cpu_count() or 1, len(jobs))
+    server, base_url = start_server(root, model_dirs, args.port)
+    options = {'base_url': base_url, 'timeout': args.timeout, 'concurrency': concurrency,
+               'ready': args.ready, 'load': args.load, 'loaded': args.loaded}
+    print(f"🌐 Serving {root} at {base_url}")
+    print(f"🚀 {len(jobs)} runs ({len(pages)} pages x {len(models)} models x {args.runs}), "
+          f"{concurrency} at a time...")
+    start = time.perf_counter()
+    try:
+        runs = asyncio.run(run_benchmarks(jobs, options))
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'playwright': importlib.metadata.version('playwright'),
+            'browser': options['browser'],
+            'runs': args.runs,
+            'concurrency': concurrency,
+            'ready': args.ready,
+            'load': args.load,
+            'loaded': args.loaded,
+        },
+        'results': summarize(runs),
+        'runs': runs,
+    }
+    print_summary(report['results'])
+    failed = [r for r in runs if not r['ok']]
+    print(f"\n✓ {len(runs) - len(failed)} runs, ✗ {len(failed)} failed ({elapsed:.1f}s)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()